@@ -0,0 +1,80 @@
+"""
+Drill-down lookup benchmark: query latency as the transcript grows.
+
+    python benchmarks/bench_drill_index.py
+
+Grows a synthetic transcript through post_to_history, so DrillIndex indexes
+each specialist sentence once as it is posted, and reports the median cost of
+posting a turn and the p50/p95 of find_drill_down_target at each size. Both
+should stay roughly flat as the transcript grows. Sessions are written to a
+temporary data directory, removed at exit.
+"""
+
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ["LYCEUM_DATA_DIR"] = tempfile.mkdtemp(prefix="lyceum-bench-")   # never touch real sessions
+logging.disable(logging.WARNING)   # importing the app outside `streamlit run` warns on every st call
+
+import streamlit as st  # noqa: E402
+import lyceum_streamlit as app  # noqa: E402
+
+SIZES = [10, 100, 1000, 2500, 5000]
+QUERIES = 50
+
+
+def synthetic_turn(rng: random.Random, vocabulary: list[str]) -> str:
+    sentences = []
+    for _ in range(rng.randint(3, 5)):
+        words = rng.choices(vocabulary, k=rng.randint(12, 22))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def timed_ms(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    rng = random.Random(7)
+    vocabulary = [f"term{i}" for i in range(4000)] + [
+        "foxp2", "heritability", "attractor", "phase", "transition", "prediction",
+        "error", "precision", "vocabulary", "spurt", "synaptic", "pruning",
+    ]
+    st.session_state.history = []
+    st.session_state.drill_index = None
+    st.session_state.llm = None
+
+    print(f"{'turns':>6} {'sentences':>9} {'append ms':>9} {'lookup p50':>10} {'lookup p95':>10}")
+    for size in SIZES:
+        append_times = []
+        while len(st.session_state.history) < size:
+            spec = 'human' if len(st.session_state.history) % 2 == 0 else rng.choice(app.SPECIALIST_SEQUENCE)
+            append_times.append(timed_ms(app.post_to_history, spec, synthetic_turn(rng, vocabulary)))
+
+        specialist_turns = [item['text'] for item in st.session_state.history if item['spec'] in app.SPECIALIST_SEQUENCE]
+        queries = [" ".join(rng.choice(specialist_turns).split()[:10]) for _ in range(QUERIES)]
+
+        lookup_times = sorted(timed_ms(app.find_drill_down_target, q) for q in queries)
+        print(
+            f"{size:>6} {len(app.get_drill_index().rows):>9} "
+            f"{statistics.median(append_times):>9.3f} "
+            f"{statistics.median(lookup_times):>10.3f} {lookup_times[int(0.95 * len(lookup_times)) - 1]:>10.3f}"
+        )
+
+    app.get_session_log().flush()
+    shutil.rmtree(os.environ["LYCEUM_DATA_DIR"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Fault-injection run: turns against flaky stub backends.
+
+    python benchmarks/bench_faults.py
+    python benchmarks/bench_faults.py --turns 60 --llm-error 0.1 --llm-drop 0.1 --llm-stall 0.05
+    python benchmarks/bench_faults.py --tts-error 1.0          # ElevenLabs down: replies go out as text
+
+Fires audio-mode turns through fire_query with the stubs in stubs.py
+misbehaving at the given rates, and reports how each turn ended (answered,
+answered as text only, failed), the slowest turn from submission to commit
+(bounded by the route deadline, never a hang), the retries, resumed streams
+and hedges per route, and each provider's circuit breaker. Stall and
+deadline limits are shortened so a run takes seconds; the stubs honour
+request timeouts as the SDKs do.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ["LYCEUM_DATA_DIR"] = tempfile.mkdtemp(prefix="lyceum-bench-")   # never touch real sessions
+logging.disable(logging.WARNING)   # importing the app outside `streamlit run` warns on every st call
+
+import streamlit as st  # noqa: E402
+
+import lyceum_streamlit as app  # noqa: E402
+from stubs import Faults, StubChatAnthropic, StubElevenLabs, StubOpenAI  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--ttft", type=float, default=0.05, help="stub LLM time to first token, seconds")
+    parser.add_argument("--tps", type=float, default=400.0, help="stub LLM tokens per second")
+    parser.add_argument("--llm-error", type=float, default=0.1, help="share of LLM requests failing outright")
+    parser.add_argument("--llm-drop", type=float, default=0.1, help="share of LLM streams cut off part-way")
+    parser.add_argument("--llm-stall", type=float, default=0.05, help="share of LLM streams going silent")
+    parser.add_argument("--llm-slow", type=float, default=0.05, help="share of LLM requests with a slow first token")
+    parser.add_argument("--tts-error", type=float, default=0.05, help="share of ElevenLabs requests failing")
+    parser.add_argument("--stall-limit", type=float, default=1.0, help="STREAM_STALL_SECONDS for the run")
+    parser.add_argument("--deadline", type=float, default=10.0, help="turn route timeout for the run, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app.STREAM_STALL_SECONDS = args.stall_limit
+    app.UPSTREAM_BACKOFF_SECONDS = 0.05
+    app.UPSTREAM_DEADLINE_SECONDS['elevenlabs'] = args.deadline
+    app.HEDGE_MIN_SAMPLES = 10
+    app.MODEL_ROUTES['turn']['timeout'] = args.deadline
+    app.MODEL_ROUTES['turn']['ttft_budget'] = None      # measure recovery on one model, not fallback
+    llm_faults = Faults(error_rate=args.llm_error, drop_rate=args.llm_drop, stall_rate=args.llm_stall,
+                        slow_rate=args.llm_slow, stall=args.stall_limit * 3, slow_ttft=0.5, seed=args.seed)
+    tts_faults = Faults(error_rate=args.tts_error, seed=args.seed + 1)
+    st.session_state.llm = StubChatAnthropic(ttft=args.ttft, tokens_per_second=args.tps, response_tokens=60)
+    st.session_state.llm.faults = llm_faults
+    st.session_state.el_client = StubElevenLabs(bytes_per_char=10, faults=tts_faults)
+    st.session_state.oai_client = StubOpenAI()
+    st.session_state.history = []
+    st.session_state.audio_mode = True
+
+    runner = app.get_job_runner()
+    outcomes = {'answered': 0, 'text only': 0, 'failed': 0}
+    durations = []
+    for turn in range(args.turns):
+        spec = app.SPECIALIST_SEQUENCE[turn % len(app.SPECIALIST_SEQUENCE)]
+        start = time.perf_counter()
+        job = app.fire_query(spec, f"Question {turn}: where does your framework locate the constraint?")
+        runner.wait()
+        runner.commit_ready()
+        durations.append(time.perf_counter() - start)
+        stream = job.parts[spec]
+        if stream.error or not stream.text:
+            outcomes['failed'] += 1
+        elif stream.pipeline.degraded or not stream.pipeline.audio():
+            outcomes['text only'] += 1
+        else:
+            outcomes['answered'] += 1
+        runner.notices.clear()
+
+    print(f"{args.turns} turns · " + " · ".join(f"{count} {outcome}" for outcome, count in outcomes.items()))
+    print(f"turn time: p50 {np.percentile(durations, 50):.2f}s  p95 {np.percentile(durations, 95):.2f}s  "
+          f"max {max(durations):.2f}s (deadline {args.deadline:.0f}s)")
+    print("injected: LLM " + ", ".join(f"{kind} {n}" for kind, n in llm_faults.injected.items() if n)
+          + " · TTS " + (", ".join(f"{kind} {n}" for kind, n in tts_faults.injected.items() if n) or "none"))
+    for row in app.get_router().stats():
+        print(f"route {row['route']} ({row['model']}): {row['calls']} calls, {row['retries']} retried, "
+              f"{row['resumes']} resumed, {row['hedges']} hedged, {row['errors']} failed")
+    for provider, stats in app.get_gateway().stats().items():
+        if stats['granted']:
+            print(f"{provider}: circuit {stats['circuit']}, {stats['trips']} trips, {stats['rejected']} calls refused")
+
+    app.get_session_log().flush()
+    shutil.rmtree(os.environ["LYCEUM_DATA_DIR"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
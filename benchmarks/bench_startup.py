@@ -0,0 +1,88 @@
+"""
+Cold-start and new-session benchmark.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --script /tmp/lyceum_before.py    # compare another revision
+
+Each sample is a fresh interpreter (a cold process, as after a Railway deploy
+or restart) that runs the app once through AppTest and then opens a second
+session in the same process. Reported per sample:
+
+    first paint   process start -> st.set_page_config, i.e. module-level
+                  imports done and the page can start rendering
+    cold session  process start -> first session's run complete
+    new session   a further session's full run in the warm process
+
+Dummy API keys are set so the real SDK clients are constructed (no network
+calls are made on construction).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(script: str):
+    started = time.perf_counter()
+    import logging
+    logging.disable(logging.WARNING)
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    marks = {}
+    set_page_config = st.set_page_config
+
+    def timed_set_page_config(*args, **kwargs):
+        marks.setdefault('first_paint', time.perf_counter() - started)
+        return set_page_config(*args, **kwargs)
+
+    st.set_page_config = timed_set_page_config
+
+    AppTest.from_file(script, default_timeout=120).run()
+    marks['cold_session'] = time.perf_counter() - started
+    start = time.perf_counter()
+    at = AppTest.from_file(script, default_timeout=120).run()
+    marks['new_session'] = time.perf_counter() - start
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+    print(json.dumps(marks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--script", default=os.path.join(ROOT, "lyceum_streamlit.py"))
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.script)
+
+    env = dict(os.environ)
+    for key in ("ANTHROPIC_API_KEY", "OPENAI_API_KEY", "ELEVENLABS_API_KEY"):
+        env.setdefault(key, "benchmark")
+    samples = []
+    with tempfile.TemporaryDirectory(prefix="lyceum-bench-") as data_dir:
+        env["LYCEUM_DATA_DIR"] = data_dir
+        for _ in range(args.samples):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--script", os.path.abspath(args.script)],
+                env=env, cwd=os.path.dirname(os.path.abspath(args.script)),
+                capture_output=True, text=True, check=True,
+            )
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{os.path.relpath(args.script)} · {args.samples} cold processes")
+    for mark in ('first_paint', 'cold_session', 'new_session'):
+        values = [sample[mark] * 1000 for sample in samples]
+        print(f"  {mark.replace('_', ' '):<13} median {statistics.median(values):8.0f} ms   min {min(values):8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
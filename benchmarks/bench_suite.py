@@ -0,0 +1,184 @@
+"""
+Hot-path benchmark suite, run entirely offline against stub backends.
+
+    python benchmarks/bench_suite.py                 # app overhead only
+    python benchmarks/bench_suite.py --ttft 0.4 --tps 60 --tts-ms-per-char 2
+    python benchmarks/bench_suite.py --sizes 10 1000 --json results.json
+
+For each transcript size, times build_messages, find_drill_down_target,
+parse_agent_from_transcript, transcript search, transcribe_audio, fire_query
+(text and audio mode, submission through commit) and a full script rerun,
+reporting p50/p95 wall time and the peak traced memory of a single call. With the default zero-latency stubs the
+numbers are the app's own overhead, so growth across sizes is a scaling
+regression rather than API noise.
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ["LYCEUM_DATA_DIR"] = tempfile.mkdtemp(prefix="lyceum-bench-")   # never touch real sessions
+logging.disable(logging.WARNING)   # importing the app outside `streamlit run` warns on every st call
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import lyceum_streamlit as app  # noqa: E402
+from stubs import WORDS, StubChatAnthropic, StubElevenLabs, StubOpenAI  # noqa: E402
+
+SIZES = [10, 100, 1000, 2500, 5000]
+SPOKEN = [
+    "Robert, what does heritability tell us about the vocabulary spurt?",
+    "Linda, you said the phase transition was an attractor — go deeper on that.",
+    "Jackie, where do the three frameworks actually disagree?",
+    "Everyone: is prediction error enough to explain synaptic pruning?",
+    "what about the regulatory cascade then",
+]
+
+
+def synthetic_turn(rng: random.Random) -> str:
+    sentences = []
+    for _ in range(rng.randint(3, 6)):
+        sentences.append(" ".join(rng.choices(WORDS, k=rng.randint(10, 24))).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def synthetic_recording(rng: random.Random, seconds: float = 3.0) -> bytes:
+    """A voiced-looking 16-bit mono WAV; noise differs per call so transcripts are never cached."""
+    t = np.arange(int(app.SAMPLE_RATE * seconds)) / app.SAMPLE_RATE
+    signal = 0.3 * np.sin(2 * np.pi * 180 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    signal += 0.01 * np.random.default_rng(rng.getrandbits(32)).standard_normal(len(t))
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(app.SAMPLE_RATE)
+        wav.writeframes((signal * 32767).astype(np.int16).tobytes())
+    return out.getvalue()
+
+
+def measure(fn, repeats: int) -> dict:
+    """p50/p95 milliseconds over repeats, and peak KiB traced during one call."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times.sort()
+    return {
+        'p50_ms': statistics.median(times),
+        'p95_ms': times[min(len(times) - 1, int(0.95 * len(times)))],
+        'peak_kib': peak / 1024,
+    }
+
+
+def grow_history(rng: random.Random, size: int):
+    """Post synthetic turns through post_to_history so every index sees them as in a session."""
+    while len(st.session_state.history) < size:
+        n = len(st.session_state.history)
+        spec = 'human' if n % 2 == 0 else rng.choice(app.SPECIALIST_SEQUENCE + ['orchestrator'])
+        app.post_to_history(spec, synthetic_turn(rng))
+
+
+def rerun_app(history: list, backends: dict) -> callable:
+    def run():
+        at = AppTest.from_file(os.path.join(ROOT, "lyceum_streamlit.py"), default_timeout=300)
+        for key, value in backends.items():
+            at.session_state[key] = value
+        at.session_state.history = list(history)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--ttft", type=float, default=0.0, help="stub LLM time to first token, seconds")
+    parser.add_argument("--tps", type=float, default=0.0, help="stub LLM tokens per second (0 = instant)")
+    parser.add_argument("--whisper-ms", type=float, default=0.0, help="stub Whisper latency, milliseconds")
+    parser.add_argument("--tts-ms-per-char", type=float, default=0.0, help="stub ElevenLabs latency per character")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    backends = {
+        'llm': StubChatAnthropic(ttft=args.ttft, tokens_per_second=args.tps),
+        'oai_client': StubOpenAI(latency=args.whisper_ms / 1000),
+        'el_client': StubElevenLabs(seconds_per_char=args.tts_ms_per_char / 1000),
+    }
+    for key, value in backends.items():
+        st.session_state[key] = value
+    st.session_state.history = []
+    st.session_state.audio_mode = False
+
+    slow = args.repeats if args.ttft == args.tps == 0 else max(3, args.repeats // 5)
+    results = []
+    print(f"{'turns':>6}  {'operation':<28} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>9}")
+    for size in sorted(args.sizes):
+        grow_history(rng, size)
+        history = list(st.session_state.history)
+        query = synthetic_turn(rng)
+        references = [" ".join(rng.choice(history)['text'].split()[:10]) for _ in range(args.repeats)]
+        searches = ['"' + " ".join(rng.choice(history)['text'].split()[2:4]) + '" ' + rng.choice(WORDS)
+                    for _ in range(args.repeats)]
+
+        def fire(audio_mode: bool):
+            def run():
+                st.session_state.audio_mode = audio_mode
+                app.fire_query(rng.choice(app.SPECIALIST_SEQUENCE), query)
+                runner = app.get_job_runner()
+                runner.wait()
+                runner.commit_ready()
+                st.session_state.audio_mode = False
+            return run
+
+        operations = {
+            'build_messages': (lambda: app.build_messages(rng.choice(app.SPECIALIST_SEQUENCE), query), args.repeats),
+            'find_drill_down_target': (lambda: app.find_drill_down_target(rng.choice(references)), args.repeats),
+            'parse_agent_from_transcript': (lambda: app.parse_agent_from_transcript(rng.choice(SPOKEN)), args.repeats),
+            'search_transcript': (lambda: app.get_transcript_search().search(rng.choice(searches)), args.repeats),
+            'transcribe_audio': (lambda: app.transcribe_audio(synthetic_recording(rng)), slow),
+            'fire_query (text)': (fire(False), slow),
+            'fire_query (audio)': (fire(True), slow),
+            'script rerun': (rerun_app(history, backends), max(3, args.repeats // 5)),
+        }
+        for name, (fn, repeats) in operations.items():
+            row = {'turns': size, 'operation': name, **measure(fn, repeats)}
+            results.append(row)
+            print(f"{size:>6}  {name:<28} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['peak_kib']:>9.0f}")
+
+        # fire_query appends its turns; keep the next size's growth comparable.
+        app._replace_history(history)
+
+    app.get_session_log().flush()
+    shutil.rmtree(os.environ["LYCEUM_DATA_DIR"], ignore_errors=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Deterministic local stand-ins for the three external services.
+
+Each stub implements only the surface lyceum_streamlit.py calls, with latency
+shaped like the real API (time to first token, token rate, per-character
+synthesis time) so benchmarks can run offline, cost nothing and repeat
+exactly. Set any latency to 0 to measure the app's own overhead alone.
+
+Pass any stub a Faults schedule to have it misbehave like a flaky upstream:
+failed requests, stalls, connections dropped mid-stream and slow first
+tokens, all seeded (or scripted) so a failure run repeats exactly too.
+"""
+
+import itertools
+import random
+import threading
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+WORDS = (
+    "heritability attractor prediction error precision phase transition vocabulary "
+    "spurt synaptic pruning regulatory cascade embodiment coupling prior posterior "
+    "variance developmental trajectory gene expression constraint emergence model"
+).split()
+
+
+class InjectedFault(ConnectionError):
+    """A failure injected by Faults; carries an HTTP status like the SDKs' errors."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        if status_code is not None:
+            self.status_code = status_code
+
+
+class Faults:
+    """
+    Which fault, if any, each request meets. Every request draws
+    independently: 'error' fails it before any data (as an overloaded 529),
+    'stall' goes silent for `stall` seconds, 'drop' cuts a stream off
+    part-way, 'slow' adds `slow_ttft` seconds before the first token, and
+    'reject' fails it with a 400 that must not be retried. A script (a list
+    of fault names or None) is played first, one entry per request.
+
+    Stalls honour the request's timeout as the real SDKs do: a request whose
+    timeout is shorter than the stall raises TimeoutError when it runs out.
+    """
+
+    KINDS = ('error', 'stall', 'drop', 'slow')
+
+    def __init__(self, error_rate: float = 0.0, stall_rate: float = 0.0, drop_rate: float = 0.0,
+                 slow_rate: float = 0.0, stall: float = 60.0, slow_ttft: float = 2.0,
+                 script: list | None = None, seed: int = 0):
+        self.rates = dict(zip(self.KINDS, (error_rate, stall_rate, drop_rate, slow_rate)))
+        self.stall_seconds = stall
+        self.slow_ttft = slow_ttft
+        self.script = list(script or [])
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.injected = {kind: 0 for kind in self.KINDS + ('reject',)}
+
+    def draw(self) -> str | None:
+        with self.lock:
+            if self.script:
+                fault = self.script.pop(0)
+            else:
+                roll, fault = self.rng.random(), None
+                for kind, rate in self.rates.items():
+                    if roll < rate:
+                        fault = kind
+                        break
+                    roll -= rate
+            if fault:
+                self.injected[fault] += 1
+            return fault
+
+    def position(self, length: int) -> int:
+        """Where in a response of this many tokens a stall or drop strikes."""
+        with self.lock:
+            return self.rng.randrange(length)
+
+    def fail(self, fault: str | None):
+        if fault == 'error':
+            raise InjectedFault("injected fault: upstream overloaded", status_code=529)
+        if fault == 'reject':
+            raise InjectedFault("injected fault: bad request", status_code=400)
+
+    def stall(self, timeout: float | None):
+        if timeout is not None and timeout <= self.stall_seconds:
+            time.sleep(timeout)
+            raise TimeoutError("injected fault: read timed out")
+        time.sleep(self.stall_seconds)
+
+
+class StubChatAnthropic:
+    """
+    Streams a seeded pseudo-response: ttft seconds before the first chunk, then
+    tokens_per_second chunks of one word each. Each call produces a different
+    response (a call counter feeds the seed), so downstream caches keyed on
+    content behave as they would in a live session. With faults, a stall or
+    a drop strikes at a random point in the response.
+    """
+
+    def __init__(self, ttft: float = 0.0, tokens_per_second: float = 0.0,
+                 response_tokens: int = 120, seed: int = 0, faults: Faults | None = None):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.seed = seed
+        self.faults = faults
+        self.calls = itertools.count()
+
+    def _response(self) -> list[str]:
+        rng = random.Random(self.seed * 1_000_003 + next(self.calls))
+        words = []
+        for i in range(self.response_tokens):
+            word = rng.choice(WORDS)
+            words.append(word + ("." if i % 15 == 14 else ""))
+        return words
+
+    @staticmethod
+    def _prompt_tokens(messages: list) -> int:
+        chars = 0
+        for message in messages:
+            content = message.content
+            chars += len(content) if isinstance(content, str) else sum(len(b.get("text", "")) for b in content)
+        return chars // 4
+
+    def stream(self, messages: list, **kwargs):
+        words = self._response()
+        fault = self.faults.draw() if self.faults else None
+        strike = self.faults.position(len(words)) if fault in ('stall', 'drop') else None
+        time.sleep(self.ttft + (self.faults.slow_ttft if fault == 'slow' else 0))
+        if self.faults:
+            self.faults.fail(fault)
+        for i, word in enumerate(words):
+            if i == strike and fault == 'stall':
+                self.faults.stall(kwargs.get('timeout'))
+            if i == strike and fault == 'drop':
+                raise InjectedFault("injected fault: connection dropped mid-stream")
+            if i and self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            usage = {
+                'input_tokens': self._prompt_tokens(messages) if i == 0 else 0,
+                'output_tokens': 1,
+                'total_tokens': 1,
+            }
+            yield AIMessageChunk(content=(" " if i else "") + word, usage_metadata=usage)
+
+    def invoke(self, messages: list, **kwargs) -> AIMessage:
+        words = self._response()
+        fault = self.faults.draw() if self.faults else None
+        if fault in ('stall', 'drop'):
+            self.faults.stall(kwargs.get('timeout'))
+        time.sleep(self.ttft + (self.faults.slow_ttft if fault == 'slow' else 0))
+        if self.faults:
+            self.faults.fail(fault)
+        time.sleep(len(words) / self.tokens_per_second if self.tokens_per_second else 0)
+        prompt_tokens = self._prompt_tokens(messages)
+        return AIMessage(content=" ".join(words), usage_metadata={
+            'input_tokens': prompt_tokens,
+            'output_tokens': len(words),
+            'total_tokens': prompt_tokens + len(words),
+        })
+
+
+class _Transcription:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Transcriptions:
+    def __init__(self, latency: float, text: str, faults: Faults | None):
+        self.latency = latency
+        self.text = text
+        self.faults = faults
+
+    def create(self, model: str, file, language: str | None = None, **kwargs) -> _Transcription:
+        file.read()
+        fault = self.faults.draw() if self.faults else None
+        if fault in ('stall', 'drop'):
+            self.faults.stall(kwargs.get('timeout'))
+        time.sleep(self.latency + (self.faults.slow_ttft if fault == 'slow' else 0))
+        if self.faults:
+            self.faults.fail(fault)
+        return _Transcription(self.text)
+
+
+class _Audio:
+    def __init__(self, latency: float, text: str, faults: Faults | None):
+        self.transcriptions = _Transcriptions(latency, text, faults)
+
+
+class StubOpenAI:
+    """Whisper stand-in: fixed latency, fixed transcript."""
+
+    def __init__(self, latency: float = 0.0, text: str = "Robert, what does heritability tell us about language?",
+                 faults: Faults | None = None):
+        self.audio = _Audio(latency, text, faults)
+
+
+class _TextToSpeech:
+    def __init__(self, seconds_per_char: float, bytes_per_char: int, faults: Faults | None):
+        self.seconds_per_char = seconds_per_char
+        self.bytes_per_char = bytes_per_char
+        self.faults = faults
+
+    def convert(self, voice_id: str, text: str, **kwargs):
+        fault = self.faults.draw() if self.faults else None
+        timeout = (kwargs.get('request_options') or {}).get('timeout_in_seconds')
+        if fault == 'stall':
+            self.faults.stall(timeout)
+        time.sleep(self.seconds_per_char * len(text) + (self.faults.slow_ttft if fault == 'slow' else 0))
+        if self.faults:
+            self.faults.fail(fault)
+        # Roughly the size of 128 kbps speech, delivered in chunks like the real client.
+        audio = b"ID3" + bytes(self.bytes_per_char * len(text))
+        for start in range(0, len(audio), 4096):
+            if fault == 'drop' and start >= len(audio) // 2:
+                raise InjectedFault("injected fault: connection dropped mid-clip")
+            yield audio[start:start + 4096]
+
+
+class StubElevenLabs:
+    """ElevenLabs stand-in: latency and payload both scale with the text length."""
+
+    def __init__(self, seconds_per_char: float = 0.0, bytes_per_char: int = 1000, faults: Faults | None = None):
+        self.text_to_speech = _TextToSpeech(seconds_per_char, bytes_per_char, faults)
@@ -0,0 +1,20 @@
+"""
+PDF text extraction for anchor papers.
+
+Kept free of Streamlit so worker processes can import it without executing
+the app script.
+"""
+
+import io
+
+from pypdf import PdfReader
+
+
+def page_count(pdf_bytes: bytes) -> int:
+    return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+
+def extract_pages(pdf_bytes: bytes, start: int, stop: int) -> list[str]:
+    """Extract text for pages [start, stop). Each worker parses its own reader."""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
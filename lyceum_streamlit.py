@@ -6,26 +6,37 @@ Clean rewrite: April 2026
 """
 
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages.ai import add_usage
 from datetime import datetime
-from pypdf import PdfReader
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from contextlib import ExitStack, contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import bisect
+import functools
+import hashlib
+import html
 import io
+import json
+import logging
+import multiprocessing
+import queue
+import random
+import shutil
+import threading
+import uuid
+import zlib
+import wave
 import time
 import tempfile
 import os
 import re
 import numpy as np
 
-# Audio dependencies
-try:
-    import sounddevice as sd
-except (ImportError, OSError):
-    sd = None
-
-import openai
-from elevenlabs.client import ElevenLabs
-from elevenlabs import VoiceSettings
+# The Anthropic, OpenAI, ElevenLabs and PDF stacks are imported where first
+# used (see API CLIENTS and load_anchor_paper), keeping them off first paint.
 
 # =============================================================================
 # CONFIGURATION
@@ -43,9 +54,144 @@ ELEVENLABS_VOICE_IDS = {
 SAMPLE_RATE = 16000
 CHANNELS = 1
 MAX_RECORD_SECONDS = 60
+VAD_FRAME_SECONDS = 0.03       # energy VAD frame length
+VAD_PAD_SECONDS = 0.25         # audio kept either side of detected speech
+VAD_MIN_RMS = 0.004            # frames quieter than this are never speech
+TRANSCRIPT_CACHE_MAX_BYTES = 4 * 1024 * 1024
 
 # Semantic similarity threshold for drill-down reference matching
 SIMILARITY_THRESHOLD = 0.35
+DRILL_TOP_K = 3
+
+# Transcript entries rendered per page (most recent page first)
+TRANSCRIPT_PAGE_SIZE = 20
+
+# Transcript search (see TranscriptSearch)
+SEARCH_MAX_HITS = 20          # most recent matching turns listed
+SEARCH_SNIPPET_CHARS = 90     # context shown either side of the first match
+
+# Breach detection: local checks on every specialist turn (see BreachDetector)
+BREACH_SHINGLE_WORDS = 3              # content-word n-grams compared between turns
+BREACH_MINHASH_PERMUTATIONS = 64
+BREACH_RESTATEMENT_SIMILARITY = 0.5   # estimated Jaccard with one of the speaker's earlier turns
+BREACH_REPETITION_OVERLAP = 0.6       # share of the turn's n-grams the speaker has used before
+BREACH_MAX_SENTENCES = 4              # drill-down replies only: the prompts' RESPONSE DISCIPLINE, 3-4 sentences
+BREACH_MAX_WORDS = 250                # any turn: DEBATE_TURN_PROMPT's "under 250 words"
+MODERATION_THRESHOLD = 1.5            # breach score (measure / limit) at which Jackie steps in
+MODERATION_COOLDOWN_TURNS = 6         # history entries between automatic interventions
+
+STOPWORDS = {'the', 'a', 'an', 'is', 'it', 'of', 'to', 'in', 'and',
+             'that', 'this', 'was', 'for', 'on', 'are', 'with', 'you',
+             'your', 'but', 'not', 'what', 'how', 'do', 'does', 'by',
+             'at', 'be', 'have', 'has', 'from', 'or', 'their', 'its'}
+
+# Speech synthesis
+TTS_MODEL_ID = "eleven_turbo_v2_5"
+TTS_VOICE_SETTINGS = {
+    'stability': 0.42,
+    'similarity_boost': 0.72,
+    'style': 0.15,
+    'use_speaker_boost': True,
+}
+TTS_MAX_CONCURRENCY = 3        # ElevenLabs requests in flight per response
+TTS_MIN_SEGMENT_CHARS = 40     # very short sentences are merged with the next
+TTS_CACHE_MAX_BYTES = int(os.environ.get("LYCEUM_TTS_CACHE_MB", "512")) * 1024 * 1024
+TTS_BITRATE = 128_000          # bits/s of ElevenLabs' default MP3 output; estimates clip length
+
+# Upstream gateway: requests in flight per provider, across all sessions in the process
+UPSTREAM_MAX_IN_FLIGHT = {
+    'anthropic':  int(os.environ.get("LYCEUM_ANTHROPIC_MAX_IN_FLIGHT", "8")),
+    'openai':     int(os.environ.get("LYCEUM_OPENAI_MAX_IN_FLIGHT", "4")),
+    'elevenlabs': int(os.environ.get("LYCEUM_ELEVENLABS_MAX_IN_FLIGHT", "6")),
+}
+UPSTREAM_KEEPALIVE_SECONDS = 60
+
+# Upstream resilience (see RESILIENCE); LLM calls take their deadline from their route's timeout
+UPSTREAM_DEADLINE_SECONDS = {'openai': 30, 'elevenlabs': 30}   # per call, retries included
+UPSTREAM_MAX_ATTEMPTS = 3
+UPSTREAM_BACKOFF_SECONDS = 0.5     # full jitter: a retry waits uniform(0, base * 2**retry) seconds
+UPSTREAM_BACKOFF_MAX_SECONDS = 8.0
+STREAM_STALL_SECONDS = 30          # longest silence mid-stream before the attempt is abandoned
+HEDGE_REQUESTS = os.environ.get("LYCEUM_HEDGE_REQUESTS", "1") == "1"
+HEDGE_MIN_SAMPLES = 20             # TTFT samples a route needs before its slow requests are hedged
+BREAKER_FAILURE_THRESHOLD = 5      # consecutive failed attempts that open a provider's circuit
+BREAKER_COOLDOWN_SECONDS = 30      # an open circuit lets one trial request through after this long
+
+# Context compaction: per-agent input budget (estimated tokens) for build_messages
+CONTEXT_TOKEN_BUDGET = {
+    'genetics':     40_000,
+    'systems':      40_000,
+    'predictive':   40_000,
+    'orchestrator': 80_000,
+}
+VERBATIM_RECENT_TURNS = 8      # most recent history entries are always sent word for word
+SUMMARY_TRIGGER_RATIO = 0.75   # start summarising once a view reaches this share of its budget
+SUMMARY_MIN_NEW_TURNS = 6      # aged-out entries to accumulate before refreshing a summary
+CHARS_PER_TOKEN = 4            # rough estimate; good enough for budgeting
+
+# Model routing: every LLM call has a call type, and each type its own model, output cap and
+# timeout (seconds for the whole call, retries included). A route whose recent median time to first token exceeds ttft_budget
+# (seconds) sends its calls to the fallback model until the slow samples age out.
+MODEL_ROUTES = {
+    'turn':         {'model': 'claude-opus-4-7',   'max_tokens': 2048, 'timeout': 120, 'ttft_budget': 6.0,  'fallback': 'claude-sonnet-4-5'},
+    'drill_down':   {'model': 'claude-opus-4-7',   'max_tokens': 1024, 'timeout': 90,  'ttft_budget': 6.0,  'fallback': 'claude-sonnet-4-5'},
+    'intervention': {'model': 'claude-haiku-4-5',  'max_tokens': 300,  'timeout': 30,  'ttft_budget': None, 'fallback': None},
+    'paper':        {'model': 'claude-opus-4-7',   'max_tokens': 4096, 'timeout': 300, 'ttft_budget': None, 'fallback': None},
+    'summary':      {'model': 'claude-sonnet-4-5', 'max_tokens': 4096, 'timeout': 120, 'ttft_budget': None, 'fallback': None},
+}
+MODEL_ROUTE_OVERRIDES = {       # (agent, call type) -> fields replacing the call type's route
+    ('orchestrator', 'turn'): {'max_tokens': 4096},   # Jackie's syntheses run longer than a specialist's turn
+}
+ROUTE_TTFT_WINDOW_SECONDS = 300  # TTFT samples older than this no longer steer routing
+ROUTE_TTFT_MIN_SAMPLES = 3       # recent samples needed before a route can fall back
+
+# Estimated cost, USD per million tokens (update when the price list changes)
+MODEL_PRICE_PER_MTOK = {
+    'claude-opus-4-7':   {'input': 5.00, 'cache_creation': 6.25, 'cache_read': 0.50, 'output': 25.00},
+    'claude-sonnet-4-5': {'input': 3.00, 'cache_creation': 3.75, 'cache_read': 0.30, 'output': 15.00},
+    'claude-haiku-4-5':  {'input': 1.00, 'cache_creation': 1.25, 'cache_read': 0.10, 'output': 5.00},
+}
+
+ANCHOR_MARKER = "\n\n---\nANCHOR PAPER:\n\n"
+
+# Anchor paper extraction
+PDF_CACHE_MAX_ENTRIES = 4096             # PDF digest -> extracted paper's blob, for all sessions
+PDF_PARALLEL_MIN_PAGES = 16              # smaller papers are extracted in-process
+PDF_PAGES_PER_TASK = 8
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+# Document library: every uploaded paper, chunked and indexed once (see DocumentLibrary)
+LIBRARY_CHUNK_WORDS = 180       # words per retrievable chunk
+LIBRARY_CHUNK_OVERLAP = 30      # words shared with the previous chunk, so no passage is split blind
+LIBRARY_TOP_K = 4               # excerpts sent with each agent call
+LIBRARY_MIN_SCORE = 2.0         # BM25 score below which a chunk is not worth sending
+LIBRARY_TERM_BITS = 24          # term ids are CRC32 hashes folded to this many bits
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Durable session log (mount a volume here on Railway)
+DATA_DIR = os.environ.get("LYCEUM_DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "lyceum_data")
+SESSION_SEGMENT_RECORDS = 500   # records per JSONL segment before rotating
+SESSION_COMPACT_SEGMENTS = 4    # resumed sessions with more segments than this are compacted
+RESUME_WINDOW = 200             # turns loaded on resume; older turns load on demand
+
+# Session memory: large payloads live in files under DATA_DIR, referenced from state by ID
+BLOB_CACHE_MAX_BYTES = 64 * 1024 * 1024      # recently read document blobs, shared by all sessions
+PENDING_AUDIO_MAX_AGE_SECONDS = 24 * 3600    # a reply clip nobody released by then was abandoned
+SESSION_MEMORY_CAP_BYTES = int(float(os.environ.get("LYCEUM_SESSION_MEMORY_MB", "64")) * 1024 * 1024)
+SESSION_REPORT_IDLE_SECONDS = 3600           # sessions not seen for this long drop out of the report
+
+# Background jobs (queries and paper drafts run off the script thread)
+JOB_MAX_CONCURRENT = 4          # per session; upstream limits still apply across sessions
+JOB_POLL_SECONDS = 0.25         # how often the job fragment refreshes while jobs are pending
+
+# Debate mode (unattended rounds among the specialists)
+DEBATE_MAX_ROUNDS = 10
+DEBATE_LOOKAHEAD_TURNS = 1      # finished turns waiting to be heard before the next is generated
+
+# Per-turn latency tracing
+TRACE_HISTORY_MAX = 1000        # traces kept per session for the metrics panel and export
+TRACE_STAGES = ['transcribe', 'build_messages', 'ttft', 'generation', 'tts', 'playback']
 
 # =============================================================================
 # PAGE CONFIG & STYLES
@@ -107,6 +253,16 @@ DEFAULTS = {
     'drill_queue': [],
     'dd_pending': None,
     'flag_counter': 0,
+    'transcript_page': 0,
+    'library': [],               # digests of the library papers in play this session
+    'library_uploads': [],       # uploader file IDs already added to the library
+    # Durable log
+    'session_id': None,
+    'known_sessions': [],        # IDs this browser session started or resumed; the only ones it lists
+    'log_seq': 0,                # sequence number for the next history entry
+    'history_generation': 0,     # bumped whenever history is replaced rather than appended to
+    'older_turns': False,        # earlier turns exist in the log but are not loaded
+    'persisted_state': None,     # last drill_queue/dd_pending/library snapshot written to the log
     # UI state
     'clear_flag': False,
     'scroll_to_top': False,
@@ -120,13 +276,27 @@ DEFAULTS = {
     'parsed_drill_ref': None,
     'parsed_query': '',
     # Audio playback - THE CRITICAL STATE
-    'pending_audio': None,        # bytes to play
+    'pending_audio': None,        # blob ID of the clip to play (see get_audio_blobs)
     'pending_audio_agent': None,  # agent key for labelling
-    'auto_fire_ready': False,     # set after transcription to trigger auto-fire
-    'auto_fire_at': None,         # timestamp after which auto-fire executes
+    'speculative_job': None,      # id of the job started on transcription, until fired, cancelled or committed
     'audio_input_processed': False,  # prevents re-transcription on reruns
-    'last_audio_hash': None,         # prevents re-transcription of same audio on reruns
+    'last_audio_hash': None,         # SHA-256 of the last recording; prevents re-transcription on reruns
     'last_responding_agent': None,   # tracks who spoke last for follow-up routing
+    'pending_audio_start': 0.0,      # seconds already played live before the rerun
+    'traces': [],                    # finished TurnTrace records, oldest first
+    'pending_spans': [],             # spans taken before the turn they belong to (transcription)
+    'compactor': None,               # RollingSummaries, created on first use
+    'drill_index': None,             # DrillIndex over specialist sentences
+    'context_views': None,           # ContextViews, each agent's converted transcript
+    'breach_detector': None,         # BreachDetector over specialist turns
+    'transcript_search': None,       # TranscriptSearch over every entry
+    'transcript_blocks': None,       # TranscriptBlocks, each entry's rendered HTML
+    'transcript_focus': None,        # history index of the entry a search hit jumped to
+    'auto_moderate': False,          # let Jackie intervene on detected breaches
+    'last_intervention_seq': None,   # log_seq of the last automatic intervention
+    'paper_cache': {},               # paper part -> (input digest, drafted text)
+    'job_runner': None,              # JobRunner, created on first submission
+    'debate': None,                  # Debate in progress (or finished, until closed)
 }
 
 for key, default_value in DEFAULTS.items():
@@ -213,255 +383,3706 @@ Examples of legitimate interventions:
 - "DS Theorist: you have said this twice. The Predictive Cognitivist has not responded to it. Predictive Cognitivist — why not?"
 - "That response exceeded the scope of the question. Restate in two sentences."
 
-FUNCTION 2 — ACADEMIC SECRETARY
+FUNCTION 2 — ACADEMIC SECRETARY
+
+When the transcript provided to you begins with the instruction DRAFT OUTPUT PAPER, you step fully into the role of academic secretary. You will be given the full forum transcript. Your task is to write a conventional academic paper in prose throughout — no bullet points, no headers other than standard section titles, no lists. Structure it as follows: Abstract (100 words); Introduction presenting the theoretical question; a section on each specialist framework as revealed in the discussion; a section identifying the key points of genuine theoretical conflict; a Conclusion noting what empirical work would be needed to adjudicate between the frameworks. Write with scholarly precision. Do not declare winners. Preserve the incommensurabilities. When the instruction names a single part of the paper (a framework section, the front matter, or the synthesis), you will be given only the material for that part: write that part alone, as directed."""
+}
+
+SPECIALIST_SEQUENCE = ['genetics', 'systems', 'predictive']
+
+# Pseudo-target that fans a query out to every specialist at once
+PANEL = 'panel'
+
+SPEAKER_LABELS = {
+    'genetics':     ('', 'Robert',      'Genetics'),
+    'systems':      ('', 'Linda',       'Dynamic Systems'),
+    'predictive':   ('', 'Andy',        'Predictive Cognition'),
+    'orchestrator': ('', 'Jackie',      ''),
+    'human':        ('', 'Forum Chair', ''),
+}
+
+# Agent name aliases for speech parsing
+AGENT_NAME_MAP = {
+    'geneticist': 'genetics', 'genetics': 'genetics', 'genetic': 'genetics', 'crick': 'genetics',
+    'ds theorist': 'systems', 'systems': 'systems', 'dynamic systems': 'systems',
+    'systems theorist': 'systems', 'thelen': 'systems',
+    'predictive cognitivist': 'predictive', 'predictive': 'predictive',
+    'friston': 'predictive', 'cognitivist': 'predictive', 'bayesian': 'predictive',
+    'orchestrator': 'orchestrator', 'coordinator': 'orchestrator', 'chair': 'orchestrator',
+    'robert': 'genetics',
+    'linda': 'systems',
+    'andy': 'predictive',
+    'jackie': 'orchestrator',
+    'panel': PANEL, 'everyone': PANEL, 'all three': PANEL,
+}
+
+RECIPIENT_MAP = {
+    "Jackie (Orchestrator)": "orchestrator",
+    "Robert (Genetics)": "genetics",
+    "Linda (Dynamic Systems)": "systems",
+    "Andy (Predictive Cognition)": "predictive",
+    "All specialists (panel round)": PANEL,
+}
+
+# =============================================================================
+# PROCESS-WIDE CACHES
+# =============================================================================
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.items:
+                self.bytes -= self.sizeof(self.items.pop(key))
+            self.items[key] = value
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.items.popitem(last=False)
+                self.bytes -= self.sizeof(evicted)
+
+
+@st.cache_resource
+def get_pdf_cache() -> LRUCache:
+    """Extracted anchor papers keyed by SHA-256 of the PDF, shared by every session (text is in the blob store)."""
+    return LRUCache(PDF_CACHE_MAX_ENTRIES, sizeof=lambda paper: 1)
+
+
+class BlobStore:
+    """
+    Content-addressed text documents (anchor papers), referenced from history by ID.
+
+    A history entry keeps only the blob ID, so a paper is held once on disk
+    and at most once in memory (in a process-wide LRU of recently read blobs)
+    however many entries and sessions cite it. Blobs are never evicted: the
+    session log refers to them, and a resumed session must find them.
+    """
+
+    def __init__(self, root: str, cache_bytes: int):
+        self.root = root
+        self.cache = LRUCache(cache_bytes)
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, blob_id: str) -> str:
+        return os.path.join(self.root, blob_id + ".txt")
+
+    def put(self, text: str) -> str:
+        blob_id = hashlib.sha256(text.encode()).hexdigest()
+        if not os.path.exists(self.path(blob_id)):
+            staging = f"{self.path(blob_id)}.{threading.get_ident()}.tmp"
+            with open(staging, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(staging, self.path(blob_id))
+        self.cache.put(blob_id, text)
+        return blob_id
+
+    def get(self, blob_id: str) -> str | None:
+        text = self.cache.get(blob_id)
+        if text is None:
+            try:
+                with open(self.path(blob_id), encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                return None
+            self.cache.put(blob_id, text)
+        return text
+
+
+class AudioCache:
+    """
+    Content-addressed on-disk cache of synthesised speech, shared by every session.
+
+    Files are named by the SHA-256 of everything that determines the audio
+    (voice, text, preceding text, voice settings, model). Recency is tracked
+    by file mtime, so the LRU order survives restarts; the oldest files are
+    deleted once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.chars_saved = 0
+        os.makedirs(root, exist_ok=True)
+        files = [os.path.join(root, n) for n in os.listdir(root) if n.endswith(".mp3")]
+        files.sort(key=os.path.getmtime)
+        self.sizes = OrderedDict((os.path.basename(f)[:-4], os.path.getsize(f)) for f in files)
+        self.bytes = sum(self.sizes.values())
+
+    @staticmethod
+    def key(voice_id: str, text: str, previous_text: str | None, settings: dict, model_id: str) -> str:
+        payload = json.dumps([voice_id, text, previous_text, settings, model_id], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".mp3")
+
+    def get(self, key: str, chars: int = 0) -> bytes | None:
+        with self.lock:
+            if key not in self.sizes:
+                self.misses += 1
+                return None
+            self.sizes.move_to_end(key)
+        try:
+            with open(self.path(key), "rb") as f:
+                audio = f.read()
+            os.utime(self.path(key))
+        except OSError:
+            with self.lock:
+                self.bytes -= self.sizes.pop(key, 0)
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+            self.chars_saved += chars
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        staging = f"{self.path(key)}.{threading.get_ident()}.tmp"
+        with open(staging, "wb") as f:
+            f.write(audio)
+        os.replace(staging, self.path(key))
+        with self.lock:
+            self.bytes += len(audio) - self.sizes.pop(key, 0)
+            self.sizes[key] = len(audio)
+            while self.bytes > self.max_bytes and len(self.sizes) > 1:
+                evicted, size = self.sizes.popitem(last=False)
+                self.bytes -= size
+                try:
+                    os.remove(self.path(evicted))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'lookups': lookups,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'files': len(self.sizes),
+                'bytes': self.bytes,
+                'chars_saved': self.chars_saved,
+            }
+
+
+@st.cache_resource
+def get_tts_cache() -> AudioCache:
+    return AudioCache(os.path.join(DATA_DIR, "tts_cache"), TTS_CACHE_MAX_BYTES)
+
+
+@st.cache_resource
+def get_blob_store() -> BlobStore:
+    return BlobStore(os.path.join(DATA_DIR, "blobs", "documents"), BLOB_CACHE_MAX_BYTES)
+
+
+class PendingClips:
+    """
+    Joined reply clips awaiting playback, keyed by their own SHA-256, shared
+    by every session; session state holds the key.
+
+    Unlike the speech cache nothing is evicted to make room: a clip is
+    deleted once every session that put it has released it (played through,
+    replaced, dismissed or dropped). The only exception is a clip older than
+    PENDING_AUDIO_MAX_AGE_SECONDS, whose session went away without releasing
+    it; those are swept when the store opens and on each put.
+    """
+
+    def __init__(self, root: str, max_age: float):
+        self.root = root
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.holders = {}      # key -> number of unreleased puts
+        self.sizes = {}        # key -> bytes
+        os.makedirs(root, exist_ok=True)
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if time.time() - os.path.getmtime(path) > max_age:
+                os.remove(path)
+            elif name.endswith(".mp3"):
+                self.sizes[name[:-4]] = os.path.getsize(path)
+                self.holders[name[:-4]] = 1
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".mp3")
+
+    def put(self, audio: bytes) -> str:
+        key = hashlib.sha256(audio).hexdigest()
+        with self.lock:
+            if key not in self.holders:
+                staging = f"{self.path(key)}.{threading.get_ident()}.tmp"
+                with open(staging, "wb") as f:
+                    f.write(audio)
+                os.replace(staging, self.path(key))
+                self.sizes[key] = len(audio)
+            else:
+                os.utime(self.path(key))    # held afresh, so not stale
+            self.holders[key] = self.holders.get(key, 0) + 1
+            cutoff = time.time() - self.max_age
+            for stale in [k for k in self.holders if k != key and self._mtime(k) < cutoff]:
+                self._delete(stale)
+        return key
+
+    def release(self, key: str | None):
+        if key is None:
+            return
+        with self.lock:
+            if key not in self.holders:
+                return
+            self.holders[key] -= 1
+            if self.holders[key] <= 0:
+                self._delete(key)
+
+    def _mtime(self, key: str) -> float:
+        try:
+            return os.path.getmtime(self.path(key))
+        except OSError:
+            return 0.0
+
+    def _delete(self, key: str):
+        self.holders.pop(key, None)
+        self.sizes.pop(key, None)
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'files': len(self.sizes), 'bytes': sum(self.sizes.values())}
+
+
+@st.cache_resource
+def get_audio_blobs() -> PendingClips:
+    return PendingClips(os.path.join(DATA_DIR, "blobs", "audio"), PENDING_AUDIO_MAX_AGE_SECONDS)
+
+
+def set_pending_audio(key: str | None, agent: str | None = None, start: float = 0.0):
+    """Make key the clip the page plays (None for none), releasing the clip it replaces."""
+    get_audio_blobs().release(st.session_state.pending_audio)
+    st.session_state.pending_audio = key
+    st.session_state.pending_audio_agent = agent
+    st.session_state.pending_audio_start = start
+
+
+@st.cache_resource
+def get_pdf_pool() -> ProcessPoolExecutor:
+    # Never fork the threaded server: a forked worker can inherit a lock another
+    # thread held (logging, the gateway, the session log writer) and deadlock.
+    # Workers start from a clean interpreter and need only lyceum_pdf, which is
+    # free of Streamlit; under `streamlit run` __main__ is the Streamlit CLI, so
+    # nothing re-runs this script.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["lyceum_pdf"])
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=context)
+
+
+# =============================================================================
+# API CLIENTS
+# =============================================================================
+# One client per process, shared by every session (the SDK clients are
+# thread-safe and pool their HTTP connections). Tests and benchmarks can still
+# inject stand-ins through st.session_state.llm / oai_client / el_client.
+# The SDKs' own retries are off: RESILIENCE retries within each call's deadline.
+
+def _api_key(name: str) -> str | None:
+    return os.environ.get(name) or st.secrets.get(name, None)
+
+
+@st.cache_resource(show_spinner="Connecting to Claude…")
+def get_llm():
+    from langchain_anthropic import ChatAnthropic
+    # The model here is only a default: each request names its route's model (see MODEL ROUTING).
+    return ChatAnthropic(model=MODEL_ROUTES['turn']['model'], api_key=_api_key("ANTHROPIC_API_KEY"), max_retries=0)
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client():
+    import openai
+    return openai.OpenAI(api_key=_api_key("OPENAI_API_KEY"), max_retries=0)
+
+
+@st.cache_resource(show_spinner=False)
+def get_elevenlabs_client():
+    import httpx
+    from elevenlabs.client import ElevenLabs
+    # Keep-alive pool sized to the gateway's cap, so every permitted request reuses a warm connection.
+    limit = UPSTREAM_MAX_IN_FLIGHT['elevenlabs']
+    pool = httpx.Client(
+        timeout=240,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit,
+                            keepalive_expiry=UPSTREAM_KEEPALIVE_SECONDS),
+    )
+    return ElevenLabs(api_key=_api_key("ELEVENLABS_API_KEY"), httpx_client=pool)
+
+
+class SlotUnavailable(RuntimeError):
+    """No upstream slot came free before the call's deadline, or the call was cancelled while queued."""
+
+
+class FairLimiter:
+    """
+    Caps the requests in flight to one provider and hands out free slots
+    round-robin across sessions, so one session's burst (a panel round, a
+    paper draft, a long TTS queue) cannot starve everyone else's next turn.
+    Waiting sessions are served in the order they first queued; each grant
+    sends that session to the back of the line.
+
+    A wait is bounded by the caller's timeout (the time left before its
+    deadline) and abandoned as soon as its cancelled() check turns true;
+    either way the ticket leaves the queue and SlotUnavailable is raised.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.cond = threading.Condition()
+        self.queues = OrderedDict()     # session_id -> deque of waiting tickets
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.granted = 0
+        self.waits = deque(maxlen=500)  # seconds spent queued, recent grants
+
+    def _is_next(self, ticket) -> bool:
+        return self.in_flight < self.limit and next(iter(self.queues.values()))[0] is ticket
+
+    def _leave(self, session_id: str, ticket):
+        waiting = self.queues[session_id]
+        waiting.remove(ticket)
+        if not waiting:
+            del self.queues[session_id]
+        self.queued -= 1
+        self.cond.notify_all()
+
+    @contextmanager
+    def slot(self, session_id: str, timeout: float | None = None, cancelled=None):
+        ticket = object()
+        queued_at = time.perf_counter()
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            self.queues.setdefault(session_id, deque()).append(ticket)
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            while not self._is_next(ticket):
+                if cancelled is not None and cancelled():
+                    self._leave(session_id, ticket)
+                    raise SlotUnavailable("cancelled while waiting for an upstream slot")
+                wait = JOB_POLL_SECONDS if cancelled is not None else None
+                if give_up_at is not None:
+                    left = give_up_at - time.monotonic()
+                    if left <= 0:
+                        self._leave(session_id, ticket)
+                        raise SlotUnavailable(f"no upstream slot came free within {timeout:.1f}s")
+                    wait = left if wait is None else min(wait, left)
+                self.cond.wait(wait)
+            waiting = self.queues.pop(session_id)
+            waiting.popleft()
+            if waiting:
+                self.queues[session_id] = waiting
+            self.queued -= 1
+            self.in_flight += 1
+            self.granted += 1
+            self.waits.append(time.perf_counter() - queued_at)
+            self.cond.notify_all()
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+
+    def stats(self) -> dict:
+        with self.cond:
+            waits = sorted(self.waits)
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'sessions_waiting': len(self.queues),
+                'max_queued': self.max_queued,
+                'granted': self.granted,
+                'p95_wait': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            }
+
+
+class UpstreamGateway:
+    """
+    Process-wide FairLimiter and CircuitBreaker per provider; every LLM,
+    Whisper and TTS request passes through one of each.
+    """
+
+    def __init__(self, limits: dict):
+        self.limiters = {provider: FairLimiter(limit) for provider, limit in limits.items()}
+        self.breakers = {
+            provider: CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN_SECONDS) for provider in limits
+        }
+
+    def slot(self, provider: str, session_id: str, timeout: float | None = None, cancelled=None):
+        return self.limiters[provider].slot(session_id, timeout, cancelled)
+
+    def stats(self) -> dict:
+        return {
+            provider: {**limiter.stats(), **self.breakers[provider].stats()}
+            for provider, limiter in self.limiters.items()
+        }
+
+
+@st.cache_resource
+def get_gateway() -> UpstreamGateway:
+    return UpstreamGateway(UPSTREAM_MAX_IN_FLIGHT)
+
+
+def upstream_slot(provider: str):
+    """
+    This session's slot on a provider, as a factory: `with slot(timeout, cancelled):`
+    around each request, the wait bounded by the time left before the call's
+    deadline. Call in the script thread; the factory can be handed to workers.
+    """
+    return functools.partial(get_gateway().slot, provider, st.session_state.session_id)
+
+
+def upstream_breaker(provider: str) -> "CircuitBreaker":
+    """The provider's process-wide circuit breaker; safe to hand to worker threads."""
+    return get_gateway().breakers[provider]
+
+
+# =============================================================================
+# RESILIENCE
+# =============================================================================
+# Every upstream call has a deadline and is retried, with jittered backoff,
+# on failures that may pass (timeouts, dropped connections, rate limits,
+# server errors) while time and attempts remain. Streams are read on their
+# own thread so a stalled connection can be abandoned; see AgentStream for
+# resuming a reply that was cut off and for hedging a slow one.
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast for a provider that keeps failing, rather than have every turn
+    wait out its deadline. BREAKER_FAILURE_THRESHOLD consecutive failed
+    attempts open the circuit; after BREAKER_COOLDOWN_SECONDS one trial
+    request is let through, and its outcome closes or re-opens it. Only
+    failures that say something about the provider's health count (see
+    _retryable); a rejected request was still answered, and counts as a
+    success. Every allowed attempt must be settled, or a trial left in flight
+    would keep the circuit open for good.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None       # monotonic time the circuit last opened; None while closed
+        self.trial = False          # a trial request is in flight
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial and time.monotonic() - self.opened_at >= self.cooldown:
+                self.trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def is_open(self) -> bool:
+        """Open and still cooling down: a request now would be rejected."""
+        with self.lock:
+            return self.opened_at is not None and (self.trial or time.monotonic() - self.opened_at < self.cooldown)
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or (self.opened_at is None and self.failures >= self.threshold):
+                self.trips += self.opened_at is None
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+    def release(self):
+        """An allowed attempt ended with no verdict (cancelled, or never sent): let another trial through."""
+        with self.lock:
+            self.trial = False
+
+    def settle(self, healthy: bool | None):
+        """Record an allowed attempt's outcome: success, failure, or None for no verdict."""
+        if healthy is None:
+            self.release()
+        elif healthy:
+            self.success()
+        else:
+            self.failure()
+
+    def retry_in(self) -> float:
+        with self.lock:
+            return max(0.0, self.opened_at + self.cooldown - time.monotonic()) if self.opened_at is not None else 0.0
+
+    def stats(self) -> dict:
+        with self.lock:
+            state = 'closed' if self.opened_at is None else 'half-open' if self.trial else 'open'
+        return {'circuit': state, 'trips': self.trips, 'rejected': self.rejected}
+
+
+_TRANSIENT_ERRORS = {
+    'TimeoutError', 'ConnectionError',                       # builtins, and the stubs' injected faults
+    'APITimeoutError', 'APIConnectionError',                 # anthropic / openai SDKs
+    'TimeoutException', 'TransportError',                    # httpx, under the ElevenLabs SDK
+}
+
+
+def _retryable(error: Exception) -> bool:
+    """Timeouts, dropped connections, rate limits and server errors; not bad requests or auth failures."""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status in (408, 409, 429) or status >= 500
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+def _backoff(retry: int) -> float:
+    return random.uniform(0, min(UPSTREAM_BACKOFF_MAX_SECONDS, UPSTREAM_BACKOFF_SECONDS * 2 ** retry))
+
+
+def call_upstream(fn, deadline: float, slot=None, breaker: CircuitBreaker | None = None, stats: dict | None = None,
+                  cancelled=None):
+    """
+    fn(timeout) with retries: each attempt runs in the provider slot with the
+    time left before the deadline as its timeout, and transient failures are
+    retried after a jittered backoff while time and attempts remain. Queueing
+    for the slot counts against the deadline, and a cancelled() call leaves
+    the queue (SlotUnavailable). Raises CircuitOpen without calling if the
+    breaker is open. Retries are counted into stats['retries'] if given. Safe
+    off the script thread.
+    """
+    stop_at = time.monotonic() + deadline
+    for attempt in range(UPSTREAM_MAX_ATTEMPTS):
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpen(f"upstream unavailable after repeated failures; retrying in {breaker.retry_in():.0f}s")
+        error = healthy = None      # healthy: the breaker's verdict on this attempt, None if it has none
+        try:
+            with slot(max(stop_at - time.monotonic(), 0.0), cancelled) if slot else nullcontext():
+                result = fn(max(stop_at - time.monotonic(), 1.0))
+            healthy = True
+        except SlotUnavailable as e:
+            error = e               # never sent
+        except Exception as e:
+            error, healthy = e, not _retryable(e)
+        finally:
+            if breaker is not None:
+                breaker.settle(healthy)
+        if error is None:
+            return result
+        if healthy is not False:
+            raise error
+        delay = _backoff(attempt)
+        if attempt + 1 == UPSTREAM_MAX_ATTEMPTS or time.monotonic() + delay >= stop_at:
+            raise error
+        if stats is not None:
+            stats['retries'] = stats.get('retries', 0) + 1
+        time.sleep(delay)
+
+
+class StreamReader:
+    """
+    Drains one streaming request on its own thread into a queue, which a
+    hedged request for the same call may share, so the caller can watch the
+    clock, hedge or walk away from a stalled connection. A reader that has
+    been walked away from stops at its next chunk (or when its request times
+    out) and closes its stream, then releases whatever it holds (a hedge's
+    upstream slot).
+    """
+
+    END = object()
+
+    def __init__(self, llm, messages: list, kwargs: dict, out: queue.Queue, held: ExitStack | None = None):
+        self.cancelled = False
+        self.held = held
+        self.thread = threading.Thread(
+            target=self._run, args=(llm, messages, kwargs, out), name="llm-stream", daemon=True,
+        )
+        self.thread.start()
+
+    def _run(self, llm, messages, kwargs, out):
+        stream = None
+        try:
+            stream = llm.stream(messages, **kwargs)
+            for chunk in stream:
+                if self.cancelled:
+                    break
+                out.put((self, chunk))
+            out.put((self, self.END))
+        except Exception as e:
+            out.put((self, e))
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+            if self.held is not None:
+                self.held.close()
+
+    def cancel(self):
+        self.cancelled = True
+
+
+# =============================================================================
+# MODEL ROUTING
+# =============================================================================
+# The one Claude client serves every model: a route's model, max_tokens and
+# timeout travel with each request, so injected stand-ins need no changes.
+
+class Route:
+    """A call type resolved to a model for one agent; its requests report back to the router."""
+
+    def __init__(self, router: "ModelRouter", kind: str, agent: str, settings: dict, model: str):
+        self.router = router
+        self.kind = kind
+        self.agent = agent
+        self.model = model
+        self.fell_back = model != settings['model']
+        self.kwargs = {'model': model, 'max_tokens': settings['max_tokens'], 'timeout': settings['timeout']}
+
+    def record(self, started_at: float, finished_at: float, first_token_at: float | None = None,
+               usage_metadata: dict | None = None, error: Exception | None = None, resilience: dict | None = None):
+        """resilience: the call's retry, resume and hedge counts, as kept by call_upstream and AgentStream."""
+        self.router.record(self, started_at, finished_at, first_token_at, usage_metadata, error, resilience or {})
+
+
+class ModelRouter:
+    """
+    Picks each call's model from MODEL_ROUTES and keeps latency and cost per
+    route, for every session in the process.
+
+    A route with a ttft_budget and a fallback watches the time to first token
+    its primary model has shown over the last ROUTE_TTFT_WINDOW_SECONDS (a
+    request that failed before its first token counts its full wait). While
+    the median is over budget its calls go to the fallback; the primary then
+    gets no new samples, so the slow ones age out and the first call after
+    the window tries the primary again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}   # (call type, model) -> deque of (monotonic time, seconds to first token)
+        self.totals = {}    # (call type, model) -> counters and recent latencies
+
+    @staticmethod
+    def settings(kind: str, agent: str) -> dict:
+        return {**MODEL_ROUTES[kind], **MODEL_ROUTE_OVERRIDES.get((agent, kind), {})}
+
+    def recent_ttft(self, kind: str, model: str) -> float | None:
+        """Median TTFT of the model on this route within the window; None until there are enough samples."""
+        cutoff = time.monotonic() - ROUTE_TTFT_WINDOW_SECONDS
+        with self.lock:
+            samples = self.samples.get((kind, model), deque())
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            values = [ttft for _, ttft in samples]
+        return float(np.median(values)) if len(values) >= ROUTE_TTFT_MIN_SAMPLES else None
+
+    def resolve(self, kind: str, agent: str) -> Route:
+        settings = self.settings(kind, agent)
+        model = settings['model']
+        if settings['fallback'] and settings['ttft_budget'] is not None:
+            ttft = self.recent_ttft(kind, model)
+            if ttft is not None and ttft > settings['ttft_budget']:
+                model = settings['fallback']
+        return Route(self, kind, agent, settings, model)
+
+    def hedge_delay(self, route: Route) -> float | None:
+        """The route's p95 TTFT on its model, after which a request is hedged; None until well sampled."""
+        with self.lock:
+            totals = self.totals.get((route.kind, route.model))
+            ttft = list(totals['ttft']) if totals else []
+        return float(np.percentile(ttft, 95)) if len(ttft) >= HEDGE_MIN_SAMPLES else None
+
+    def record(self, route: Route, started_at: float, finished_at: float, first_token_at: float | None,
+               usage_metadata: dict | None, error: Exception | None, resilience: dict):
+        usage = summarise_usage(usage_metadata, route.model)
+        ttft = first_token_at - started_at if first_token_at is not None else None
+        if ttft is None and error is not None:
+            ttft = finished_at - started_at
+        with self.lock:
+            totals = self.totals.setdefault((route.kind, route.model), {
+                'calls': 0, 'fallbacks': 0, 'errors': 0, 'retries': 0, 'resumes': 0, 'hedges': 0,
+                'input_tokens': 0, 'output_tokens': 0, 'cost': 0.0,
+                'ttft': deque(maxlen=500), 'latency': deque(maxlen=500),
+            })
+            totals['calls'] += 1
+            for key in ('retries', 'resumes', 'hedges'):
+                totals[key] += resilience.get(key, 0)
+            totals['fallbacks'] += route.fell_back
+            if error is not None:
+                totals['errors'] += 1
+            else:
+                totals['latency'].append(finished_at - started_at)
+            if usage:
+                totals['input_tokens'] += usage['input_tokens']
+                totals['output_tokens'] += usage['output_tokens']
+                totals['cost'] += estimate_cost(usage)
+            if ttft is not None:
+                totals['ttft'].append(ttft)
+                self.samples.setdefault((route.kind, route.model), deque(maxlen=100)).append((time.monotonic(), ttft))
+
+    def stats(self) -> list[dict]:
+        """One row per (call type, model) used, in MODEL_ROUTES order."""
+        order = list(MODEL_ROUTES)
+        rows = []
+        with self.lock:
+            for (kind, model), totals in sorted(self.totals.items(), key=lambda item: (order.index(item[0][0]), item[0][1])):
+                ttft, latency = list(totals['ttft']), list(totals['latency'])
+                rows.append({
+                    'route': kind,
+                    'model': model,
+                    **{key: totals[key] for key in ('calls', 'fallbacks', 'errors', 'retries', 'resumes', 'hedges',
+                                                    'input_tokens', 'output_tokens', 'cost')},
+                    'p50_ttft': float(np.percentile(ttft, 50)) if ttft else None,
+                    'p95_ttft': float(np.percentile(ttft, 95)) if ttft else None,
+                    'p50_latency': float(np.percentile(latency, 50)) if latency else None,
+                })
+        return rows
+
+
+@st.cache_resource
+def get_router() -> ModelRouter:
+    return ModelRouter()
+
+
+# =============================================================================
+# TURN TRACING
+# =============================================================================
+
+def make_span(name: str, start: float, end: float, **attrs) -> dict:
+    """A finished span; start/end are perf_counter readings, stored as wall-clock time."""
+    return {
+        'name': name,
+        'span_id': uuid.uuid4().hex[:16],
+        'start': time.time() - (time.perf_counter() - start),
+        'duration': max(end - start, 0.0),
+        'attrs': attrs,
+    }
+
+
+class TurnTrace:
+    """
+    Timing spans for one forum turn: transcribe, build_messages, TTFT,
+    generation, TTS and playback handoff, each carrying its token and byte
+    counts. Stages that overlap (generation and TTS stream together) are
+    recorded as overlapping spans rather than forced into sequence.
+    Touches no Streamlit state.
+    """
+
+    def __init__(self, agent: str, spans: list[dict] | None = None):
+        self.trace_id = uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.agent = agent
+        self.started = time.perf_counter()
+        self.start = time.time()
+        self.spans = list(spans or [])
+
+    def add(self, name: str, start: float, end: float, **attrs):
+        self.spans.append(make_span(name, start, end, **attrs))
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time a block; the yielded dict can be filled with attributes as the block learns them."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.add(name, start, time.perf_counter(), **attrs)
+
+    def add_stream(self, stream, agent: str):
+        """TTFT, generation and TTS spans for a finished AgentStream."""
+        if stream.first_token_at:
+            model = {'model': stream.route.model} if stream.route else {}
+            self.add('ttft', stream.started_at, stream.first_token_at, agent=agent, **model)
+            usage = summarise_usage(stream.usage_metadata) or {}
+            elapsed = stream.finished_at - stream.first_token_at
+            self.add(
+                'generation', stream.first_token_at, stream.finished_at,
+                agent=agent,
+                input_tokens=usage.get('input_tokens', 0),
+                output_tokens=usage.get('output_tokens', 0),
+                cache_read=usage.get('cache_read', 0),
+                chars=len(stream.text),
+                tokens_per_second=usage.get('output_tokens', 0) / elapsed if elapsed > 0 else 0.0,
+            )
+        if stream.pipeline:
+            self.add_speech(stream.pipeline, agent)
+
+    def add_speech(self, pipeline, agent: str):
+        if pipeline.started_at is None:
+            return
+        audio = pipeline.audio() or b""
+        self.add(
+            'tts', pipeline.started_at, pipeline.finished_at or time.perf_counter(),
+            agent=agent,
+            segments=len(pipeline.segments),
+            chars=sum(len(segment) for segment in pipeline.segments),
+            bytes=len(audio),
+            errors=len(pipeline.errors),
+        )
+
+    def record(self) -> dict:
+        # Adopted spans (transcription) can begin before the turn itself.
+        start = min([self.start] + [span['start'] for span in self.spans])
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'agent': self.agent,
+            'start': start,
+            'duration': self.start - start + time.perf_counter() - self.started,
+            'spans': self.spans,
+        }
+
+
+def take_pending_spans() -> list[dict]:
+    """Spans recorded ahead of the next turn (e.g. transcription on an earlier rerun)."""
+    spans, st.session_state.pending_spans = st.session_state.pending_spans, []
+    return spans
+
+
+def finish_trace(trace: TurnTrace):
+    traces = st.session_state.traces
+    traces.append(trace.record())
+    del traces[:-TRACE_HISTORY_MAX]
+
+
+def stage_stats(traces: list[dict]) -> list[dict]:
+    """p50/p95 seconds per stage over the session, plus generation throughput."""
+    rows = []
+    for stage in TRACE_STAGES:
+        spans = [span for trace in traces for span in trace['spans'] if span['name'] == stage]
+        if not spans:
+            continue
+        durations = [span['duration'] for span in spans]
+        row = {
+            'stage': stage,
+            'count': len(spans),
+            'p50': float(np.percentile(durations, 50)),
+            'p95': float(np.percentile(durations, 95)),
+        }
+        if stage == 'generation':
+            rates = [span['attrs']['tokens_per_second'] for span in spans if span['attrs'].get('tokens_per_second')]
+            row['tokens_per_second'] = float(np.percentile(rates, 50)) if rates else None
+        rows.append(row)
+    return rows
+
+
+def traces_jsonl(traces: list[dict]) -> str:
+    return "".join(json.dumps(trace) + "\n" for trace in traces)
+
+
+def _otel_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def traces_otel(traces: list[dict]) -> str:
+    """OTLP/JSON export: one root 'turn' span per trace with the stage spans as children."""
+    def nanos(seconds: float) -> str:
+        return str(int(seconds * 1e9))
+
+    def attributes(attrs: dict) -> list[dict]:
+        return [{'key': f"lyceum.{key}", 'value': _otel_value(value)} for key, value in attrs.items()]
+
+    spans = []
+    for trace in traces:
+        spans.append({
+            'traceId': trace['trace_id'],
+            'spanId': trace['span_id'],
+            'name': 'turn',
+            'startTimeUnixNano': nanos(trace['start']),
+            'endTimeUnixNano': nanos(trace['start'] + trace['duration']),
+            'attributes': attributes({'agent': trace['agent']}),
+        })
+        spans.extend({
+            'traceId': trace['trace_id'],
+            'spanId': span['span_id'],
+            'parentSpanId': trace['span_id'],
+            'name': span['name'],
+            'startTimeUnixNano': nanos(span['start']),
+            'endTimeUnixNano': nanos(span['start'] + span['duration']),
+            'attributes': attributes(span['attrs']),
+        } for span in trace['spans'])
+    return json.dumps({'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'lyceum'}}]},
+        'scopeSpans': [{'scope': {'name': 'lyceum.turns'}, 'spans': spans}],
+    }]}, indent=1)
+
+
+# =============================================================================
+# AUDIO UTILITIES
+# =============================================================================
+
+@st.cache_resource
+def get_transcript_cache() -> LRUCache:
+    """Whisper transcripts keyed by SHA-256 of the preprocessed audio, shared by every session."""
+    return LRUCache(TRANSCRIPT_CACHE_MAX_BYTES)
+
+
+def _lowpass(samples: np.ndarray, cutoff: float, taps: int = 63) -> np.ndarray:
+    """Windowed-sinc FIR low-pass; cutoff is a fraction of the sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return np.convolve(samples, kernel / kernel.sum(), mode="same")
+
+
+def preprocess_audio(wav_bytes: bytes) -> bytes | None:
+    """
+    Prepare a recording for Whisper: downmix to CHANNELS, resample to
+    SAMPLE_RATE, trim leading and trailing silence with an energy VAD, cap at
+    MAX_RECORD_SECONDS, and re-encode as 16-bit PCM WAV.
+
+    Returns None when no speech is detected. Input that is not PCM WAV is
+    passed through unchanged for Whisper to decode.
+    """
+    try:
+        with wave.open(io.BytesIO(wav_bytes)) as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return wav_bytes
+    if width not in (1, 2, 4):
+        return wav_bytes
+
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+    samples = np.frombuffer(frames, dtype=dtype).astype(np.float32)
+    if width == 1:
+        samples -= 128
+    samples /= float(2 ** (8 * width - 1))
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+
+    if rate != SAMPLE_RATE and len(samples):
+        if rate > SAMPLE_RATE:
+            samples = _lowpass(samples, 0.5 * SAMPLE_RATE / rate)
+        duration = len(samples) / rate
+        target = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+        samples = np.interp(target, np.arange(len(samples)) / rate, samples).astype(np.float32)
+
+    frame = int(VAD_FRAME_SECONDS * SAMPLE_RATE)
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return None
+    rms = np.sqrt(np.mean(samples[:n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+    threshold = max(VAD_MIN_RMS, 3 * np.percentile(rms, 10), 0.05 * rms.max())
+    voiced = np.flatnonzero(rms > threshold)
+    if len(voiced) == 0:
+        return None
+    pad = int(VAD_PAD_SECONDS * SAMPLE_RATE)
+    start = max(voiced[0] * frame - pad, 0)
+    stop = min((voiced[-1] + 1) * frame + pad, len(samples))
+    samples = samples[start:stop][:MAX_RECORD_SECONDS * SAMPLE_RATE]
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    if CHANNELS > 1:
+        pcm = np.repeat(pcm, CHANNELS)
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(CHANNELS)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    return out.getvalue()
+
+
+def transcribe_audio(audio_bytes: bytes) -> str:
+    """
+    Send audio bytes to OpenAI Whisper API and return transcript.
+
+    The recording is preprocessed first (see preprocess_audio); silent
+    recordings never reach the API, and repeated audio is answered from the
+    transcript cache.
+    """
+    if st.session_state.oai_client is None:
+        return ""
+    if not audio_bytes:
+        return ""
+    started = time.perf_counter()
+    processed = preprocess_audio(audio_bytes)
+    if processed is None:
+        st.warning("No speech detected in the recording.")
+        return ""
+
+    def record(text: str, cached: bool) -> str:
+        st.session_state.pending_spans.append(make_span(
+            'transcribe', started, time.perf_counter(),
+            bytes_recorded=len(audio_bytes), bytes_sent=0 if cached else len(processed),
+            chars=len(text), cached=cached,
+        ))
+        return text
+
+    digest = hashlib.sha256(processed).hexdigest()
+    cache = get_transcript_cache()
+    cached = cache.get(digest)
+    if cached is not None:
+        return record(cached, cached=True)
+    client = st.session_state.oai_client
+
+    def request(timeout: float):
+        audio_file = io.BytesIO(processed)     # fresh per attempt: a failed upload has consumed the last one
+        audio_file.name = "recording.wav"
+        return client.audio.transcriptions.create(
+            model="whisper-1",
+            file=audio_file,
+            language="en",
+            timeout=timeout,
+        )
+
+    try:
+        transcript = call_upstream(request, UPSTREAM_DEADLINE_SECONDS['openai'],
+                                   upstream_slot('openai'), upstream_breaker('openai'))
+        cache.put(digest, transcript.text)
+        return record(transcript.text, cached=False)
+    except Exception as e:
+        st.error(f"Transcription error: {e}")
+        return ""
+
+
+def parse_agent_from_transcript(text: str) -> tuple[str | None, str]:
+    """Extract the intended agent from a spoken query. Returns (agent_key, cleaned_text)."""
+    text_lower = text.lower().strip()
+    sorted_aliases = sorted(AGENT_NAME_MAP.keys(), key=len, reverse=True)
+
+    for alias in sorted_aliases:
+        pattern = r'^' + re.escape(alias) + r'[\s,\-–—:\.]*'
+        match = re.match(pattern, text_lower)
+        if match:
+            agent_key = AGENT_NAME_MAP[alias]
+            cleaned = text[match.end():].strip()
+            st.toast(f"Agent parsed: '{alias}' → {agent_key}", icon="✅")
+            return agent_key, cleaned
+
+    st.toast(f"No agent detected. First 40 chars: '{text[:40]}'", icon="⚠️")
+    return None, text
+
+
+def content_tokens(text: str) -> list[str]:
+    return [w for w in re.findall(r'\b\w+\b', text.lower()) if w not in STOPWORDS and len(w) > 2]
+
+
+def split_sentences(text: str) -> list[str]:
+    splitter = SentenceSplitter(min_chars=0)
+    return splitter.feed(text + " ") + splitter.flush()
+
+
+class DrillIndex:
+    """
+    Incremental TF-IDF index over the sentences of specialist turns.
+
+    Sentences are tokenised once, when post_to_history appends their entry,
+    and stored as rows of a CSR matrix held in growable NumPy arrays (log term
+    frequencies), with a postings list per term. A query gathers only the rows
+    that share a term with it and scores them in one vectorised pass: IDF
+    weights are applied to the stored values, row dot products and norms are
+    reduced per row, and the top k cosines are selected with argpartition.
+    """
+
+    def __init__(self):
+        self.vocab = {}
+        self.postings = []        # term id -> row ids containing it
+        self.df = np.zeros(1024, dtype=np.float32)
+        self.indices = np.zeros(4096, dtype=np.int32)
+        self.data = np.zeros(4096, dtype=np.float32)
+        self.indptr = np.zeros(1024, dtype=np.int64)
+        self.nnz = 0
+        self.rows = []            # (entry_idx, spec, sentence) per matrix row
+        self.n_entries = 0
+        self.fingerprint = ""
+
+    @staticmethod
+    def _grow(array: np.ndarray, needed: int) -> np.ndarray:
+        if needed <= len(array):
+            return array
+        grown = np.zeros(max(needed, 2 * len(array)), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _term_ids(self, tokens: list[str], add: bool) -> dict[int, int]:
+        counts = {}
+        for token in tokens:
+            term = self.vocab.get(token)
+            if term is None:
+                if not add:
+                    continue
+                term = self.vocab[token] = len(self.vocab)
+                self.postings.append([])
+            counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def add(self, entry_idx: int, entry: dict):
+        if entry['spec'] in SPECIALIST_SEQUENCE:
+            for sentence in split_sentences(entry['text']):
+                counts = self._term_ids(content_tokens(sentence), add=True)
+                if not counts:
+                    continue
+                terms = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+                values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+                end = self.nnz + len(terms)
+                self.indices = self._grow(self.indices, end)
+                self.data = self._grow(self.data, end)
+                self.indices[self.nnz:end] = terms
+                self.data[self.nnz:end] = values
+                self.nnz = end
+                self.rows.append((entry_idx, entry['spec'], sentence))
+                self.indptr = self._grow(self.indptr, len(self.rows) + 1)
+                self.indptr[len(self.rows)] = end
+                self.df = self._grow(self.df, len(self.vocab))
+                self.df[terms] += 1
+                for term in counts:
+                    self.postings[term].append(len(self.rows) - 1)
+        self.n_entries = entry_idx + 1
+
+    def nbytes(self) -> int:
+        """Approximate memory held: the arrays, the sentence rows and the postings lists."""
+        arrays = self.df.nbytes + self.indices.nbytes + self.data.nbytes + self.indptr.nbytes
+        return arrays + sum(len(sentence) + 120 for _, _, sentence in self.rows) + 36 * self.nnz
+
+    def sync(self, history: list):
+        """Index entries appended since the last call; rebuild if the history was replaced."""
+        if _prefix_fingerprint(history, self.n_entries) != self.fingerprint:
+            self.__init__()
+        for idx in range(self.n_entries, len(history)):
+            self.add(idx, history[idx])
+        self.fingerprint = _prefix_fingerprint(history, self.n_entries)
+
+    def search(self, text: str, k: int = DRILL_TOP_K) -> list[dict]:
+        tokens = content_tokens(text)
+        counts = self._term_ids(tokens, add=False)
+        if not counts or not self.rows:
+            return []
+        n_docs = len(self.rows)
+        idf = np.log((1 + n_docs) / (1 + self.df[:len(self.vocab)])) + 1.0
+        query = np.zeros(len(self.vocab), dtype=np.float32)
+        for term, count in counts.items():
+            query[term] = np.log1p(count) * idf[term]
+        # Words never seen in the transcript still count towards the query's length.
+        unseen = {}
+        for token in tokens:
+            if token not in self.vocab:
+                unseen[token] = unseen.get(token, 0) + 1
+        unseen_weight = np.log(1 + n_docs) + 1.0
+        query_norm = np.sqrt(np.dot(query, query) + sum((np.log1p(c) * unseen_weight) ** 2 for c in unseen.values()))
+
+        candidates = np.unique(np.concatenate([
+            np.asarray(self.postings[term], dtype=np.int64) for term in counts
+        ]))
+        starts = self.indptr[candidates]
+        lengths = self.indptr[candidates + 1] - starts
+        segments = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - segments, lengths) + np.arange(lengths.sum())
+        terms = self.indices[positions]
+        weighted = self.data[positions] * idf[terms]
+        dots = np.add.reduceat(weighted * query[terms], segments)
+        norms = np.sqrt(np.add.reduceat(weighted * weighted, segments))
+        scores = dots / (norms * query_norm)
+
+        k = min(k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            {'entry': self.rows[row][0], 'spec': self.rows[row][1], 'text': self.rows[row][2], 'score': float(scores[i])}
+            for row, i in zip(candidates[best], best)
+        ]
+
+
+def get_drill_index() -> DrillIndex:
+    if st.session_state.drill_index is None:
+        st.session_state.drill_index = DrillIndex()
+    index = st.session_state.drill_index
+    index.sync(st.session_state.history)
+    return index
+
+
+def find_drill_down_target(reference_text: str) -> dict | None:
+    """
+    Find the specialist sentence most similar to the spoken reference.
+
+    Returns {'entry', 'spec', 'text', 'score'} where 'text' is the matching
+    sentence rather than the whole turn, or None below SIMILARITY_THRESHOLD.
+    """
+    if not st.session_state.history or not reference_text.strip():
+        return None
+    hits = get_drill_index().search(reference_text)
+    if hits and hits[0]['score'] >= SIMILARITY_THRESHOLD:
+        return hits[0]
+    return None
+
+
+def _tts_convert(client, voice_id: str, text: str, previous_text: str | None = None,
+                 cache: AudioCache | None = None, slot=None, breaker: CircuitBreaker | None = None,
+                 cancelled=None) -> bytes:
+    """
+    Single ElevenLabs request (retried within UPSTREAM_DEADLINE_SECONDS), served
+    from the speech cache when the same inputs were synthesised before. Touches
+    no Streamlit state, so it is safe in worker threads (pass the cache, upstream
+    slot and breaker in from the script thread).
+    """
+    key = AudioCache.key(voice_id, text, previous_text, TTS_VOICE_SETTINGS, TTS_MODEL_ID)
+    if cache is not None and (audio := cache.get(key, chars=len(text))) is not None:
+        return audio
+    from elevenlabs import VoiceSettings
+    extra = {'previous_text': previous_text} if previous_text else {}
+
+    def request(timeout: float) -> bytes:
+        # The clip is read in full inside the attempt, so a connection dropped mid-clip is retried too.
+        return b"".join(client.text_to_speech.convert(
+            text=text,
+            voice_id=voice_id,
+            voice_settings=VoiceSettings(**TTS_VOICE_SETTINGS),
+            model_id=TTS_MODEL_ID,
+            request_options={'timeout_in_seconds': max(1, int(timeout)), 'max_retries': 0},
+            **extra
+        ))
+
+    audio = call_upstream(request, UPSTREAM_DEADLINE_SECONDS['elevenlabs'], slot, breaker, cancelled=cancelled)
+    if cache is not None and audio:
+        cache.put(key, audio)
+    return audio
+
+
+# Sentence end: terminal punctuation, optional closing quote/bracket, then whitespace.
+SENTENCE_END = re.compile(r'[.!?…]+["\'”’)\]]*\s+')
+
+
+class SentenceSplitter:
+    """Accumulate streamed tokens and release complete sentences as they close."""
+
+    def __init__(self, min_chars: int = TTS_MIN_SEGMENT_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, token: str) -> list[str]:
+        self.buffer += token
+        segments = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            if match.end() - start >= self.min_chars:
+                segments.append(self.buffer[start:match.end()].strip())
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return segments
+
+    def flush(self) -> list[str]:
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+
+class SpeechPipeline:
+    """
+    Sentence-level TTS that runs alongside the LLM stream.
+
+    Each sentence is sent to ElevenLabs as soon as it is complete, with at most
+    TTS_MAX_CONCURRENCY requests in flight. Segments are reassembled in the order
+    they were spoken, so playback can begin on segment 0 while later sentences
+    are still being generated or synthesised. Nothing here touches st.*; the
+    script thread polls first_segment() and audio().
+
+    While ElevenLabs' circuit breaker is open, sentences are not sent at all
+    and the pipeline is marked degraded: the reply goes out as text rather
+    than waiting on a provider that is down.
+    """
+
+    def __init__(self, client, agent_key: str):
+        self.client = client
+        self.cache = get_tts_cache()
+        self.slot = upstream_slot('elevenlabs')
+        self.breaker = upstream_breaker('elevenlabs')
+        self.voice_id = ELEVENLABS_VOICE_IDS.get(agent_key)
+        self.splitter = SentenceSplitter()
+        self.executor = ThreadPoolExecutor(max_workers=TTS_MAX_CONCURRENCY, thread_name_prefix="tts")
+        self.futures = []
+        self.segments = []
+        self.errors = []
+        self.degraded = False      # sentences skipped because ElevenLabs' circuit was open
+        self.started_at = None     # perf_counter at the first request, for tracing
+        self.finished_at = None    # perf_counter when the latest request completed
+        self.cancelled = False
+
+    def _synthesise(self, text: str, previous_text: str | None) -> bytes | None:
+        try:
+            return _tts_convert(self.client, self.voice_id, text, previous_text,
+                                cache=self.cache, slot=self.slot, breaker=self.breaker,
+                                cancelled=lambda: self.cancelled)
+        except CircuitOpen:
+            self.degraded = True
+            return None
+        except Exception as e:
+            self.errors.append(e)
+            return None
+        finally:
+            self.finished_at = time.perf_counter()
+
+    def _submit(self, segments: list[str]):
+        if segments and (self.degraded or self.breaker.is_open()):
+            self.degraded = True
+            return
+        if segments and self.started_at is None:
+            self.started_at = time.perf_counter()
+        for segment in segments:
+            previous_text = self.segments[-1] if self.segments else None
+            self.segments.append(segment)
+            self.futures.append(self.executor.submit(self._synthesise, segment, previous_text))
+
+    def feed(self, token: str):
+        if self.voice_id and not self.cancelled:
+            self._submit(self.splitter.feed(token))
+
+    def cancel(self):
+        """Drop sentences not yet sent to ElevenLabs; requests already in flight complete."""
+        self.cancelled = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """Flush the trailing partial sentence; no more tokens will arrive."""
+        if self.voice_id and not self.cancelled:
+            self._submit(self.splitter.flush())
+        self.executor.shutdown(wait=False)
+
+    def first_segment(self) -> bytes | None:
+        """Audio for the opening sentence, or None if it has not arrived yet."""
+        if self.futures and self.futures[0].done():
+            return self.futures[0].result()
+        return None
+
+    def done(self) -> bool:
+        return all(f.done() for f in self.futures)
+
+    def audio(self) -> bytes | None:
+        """Block until every segment is synthesised and return them joined in order."""
+        parts = [f.result() for f in self.futures]
+        audio = b"".join(p for p in parts if p)
+        return audio or None
+
+
+def _extract_in_pool(pdf_bytes: bytes, n_pages: int, progress) -> list[str]:
+    import lyceum_pdf
+    pages = [""] * n_pages
+    futures = {
+        get_pdf_pool().submit(lyceum_pdf.extract_pages, pdf_bytes, start, min(start + PDF_PAGES_PER_TASK, n_pages)): start
+        for start in range(0, n_pages, PDF_PAGES_PER_TASK)
+    }
+    extracted = 0
+    for future in as_completed(futures):
+        start = futures[future]
+        texts = future.result()
+        pages[start:start + len(texts)] = texts
+        extracted += len(texts)
+        progress.progress(extracted / n_pages, text=f"Extracting text… {extracted}/{n_pages} pages")
+    return pages
+
+
+def load_anchor_paper(pdf_bytes: bytes) -> dict:
+    """
+    Return {'digest', 'pages', 'blob'} for an uploaded PDF, the extracted
+    text being stored in the blob store under 'blob'.
+
+    Results are cached by content hash for every session, so reruns and repeat
+    uploads of the same paper skip parsing entirely. First-time extraction of
+    longer papers is spread across a process pool, page range by page range.
+    """
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    cache = get_pdf_cache()
+    paper = cache.get(digest)
+    if paper is not None:
+        return paper
+
+    import lyceum_pdf
+    n_pages = lyceum_pdf.page_count(pdf_bytes)
+    progress = st.progress(0.0, text=f"Extracting text… 0/{n_pages} pages")
+    pages = None
+    if n_pages >= PDF_PARALLEL_MIN_PAGES:
+        try:
+            pages = _extract_in_pool(pdf_bytes, n_pages, progress)
+        except BrokenProcessPool:
+            get_pdf_pool.clear()
+    if pages is None:
+        pages = lyceum_pdf.extract_pages(pdf_bytes, 0, n_pages)
+    progress.empty()
+
+    # Form feeds keep the page breaks, for the library's citations.
+    paper = {'digest': digest, 'pages': n_pages, 'blob': get_blob_store().put("\f".join(pages))}
+    cache.put(digest, paper)
+    return paper
+
+
+# =============================================================================
+# DOCUMENT LIBRARY
+# =============================================================================
+
+class DocumentLibrary:
+    """
+    Every paper uploaded to the forum, chunked once and indexed for
+    retrieval, shared by all sessions and kept under DATA_DIR/library.
+
+    Each paper is cut into overlapping LIBRARY_CHUNK_WORDS windows, page by
+    page, and each chunk's term counts are appended to a sparse chunk-by-term
+    matrix in flat files (CSR: chunk ends, term ids, counts). Term ids are
+    CRC32 hashes, so there is no vocabulary to keep in step. The matrix is
+    inverted into postings (term-sorted chunk ids and counts), also on disk;
+    searches read the postings and chunk table through np.memmap, so the
+    process maps the corpus rather than loading it.
+
+    The CSR files are the source of truth and papers.json, written once a
+    paper's rows are appended, is the commit point: CSR rows beyond what it
+    records are a torn append and are cut off when reopened. Postings are
+    written after it and never trusted on their own; if they do not cover
+    exactly the committed rows (a crash mid-upload) they are rebuilt from the
+    matrix on open. An upload sorts only its own terms and merges that run
+    into the existing postings, but the merged files are still rewritten
+    whole, so each upload costs time linear in the library's size.
+
+    A search scores chunks by BM25 over the postings of its terms alone, so
+    its cost follows how often those terms occur, not the size of the
+    library. Chunk text is sliced from the paper's blob.
+    """
+
+    CHUNK_DTYPE = np.dtype([('paper', '<u4'), ('page', '<u4'), ('start', '<u8'), ('stop', '<u8'), ('words', '<u4')])
+    FILES = {       # name -> dtype; the CSR matrix is the source of truth, postings are derived from it
+        'chunks': CHUNK_DTYPE, 'ends': np.dtype('<u8'), 'terms': np.dtype('<u4'), 'counts': np.dtype('<u2'),
+        'post_terms': np.dtype('<u4'), 'post_chunks': np.dtype('<u4'), 'post_counts': np.dtype('<u2'),
+    }
+
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        try:
+            with open(self._path('papers.json'), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {'papers': [], 'chunks': 0, 'nnz': 0}
+        self.papers = manifest['papers']        # [{'digest', 'blob', 'title', 'pages', 'chunks': [first, stop]}]
+        self.by_digest = {paper['digest']: i for i, paper in enumerate(self.papers)}
+        self.n_chunks, self.nnz = manifest['chunks'], manifest['nnz']
+        self._cut_torn()
+        if self.nnz and not self._postings_current():
+            self._invert()
+        self._map()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name if '.' in name else name + ".bin")
+
+    def _sizes(self) -> dict:
+        return {'chunks': self.n_chunks, 'ends': self.n_chunks, 'terms': self.nnz, 'counts': self.nnz,
+                'post_terms': self.nnz, 'post_chunks': self.nnz, 'post_counts': self.nnz}
+
+    def _cut_torn(self):
+        """Cut the CSR files back to the committed rows. Postings are never cut: see _postings_current."""
+        for name in ('chunks', 'ends', 'terms', 'counts'):
+            path, size = self._path(name), self._sizes()[name] * self.FILES[name].itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _postings_current(self) -> bool:
+        """The postings cover exactly the committed rows; otherwise an upload died before writing them."""
+        return all(
+            os.path.exists(self._path(name)) and os.path.getsize(self._path(name)) == self.nnz * self.FILES[name].itemsize
+            for name in ('post_terms', 'post_chunks', 'post_counts')
+        )
+
+    def _read(self, name: str) -> np.ndarray:
+        count = self._sizes()[name]
+        if not count:
+            return np.zeros(0, dtype=self.FILES[name])
+        return np.memmap(self._path(name), dtype=self.FILES[name], mode='r', shape=(count,))
+
+    def _map(self):
+        """Point the search arrays at the committed files (replaced whole, so searches need no lock)."""
+        chunks = self._read('chunks')
+        self.arrays = {
+            'chunks': chunks,
+            'post_terms': self._read('post_terms'),
+            'post_chunks': self._read('post_chunks'),
+            'post_counts': self._read('post_counts'),
+            'mean_words': float(chunks['words'].mean()) if len(chunks) else 1.0,
+        }
+
+    def _invert(self):
+        """Rebuild the postings from the whole CSR matrix (recovery after a crash mid-upload)."""
+        ends, terms = self._read('ends'), self._read('terms')
+        lengths = np.diff(np.asarray(ends, dtype=np.int64), prepend=0)
+        order = np.argsort(terms, kind='stable')
+        self._write_postings({
+            'post_terms': np.asarray(terms)[order],
+            'post_chunks': np.repeat(np.arange(self.n_chunks, dtype=np.uint32), lengths)[order],
+            'post_counts': np.asarray(self._read('counts'))[order],
+        })
+
+    def _merge(self, first_chunk: int, previous_nnz: int, ends: np.ndarray, terms: np.ndarray, counts: np.ndarray):
+        """
+        Merge a new paper's rows (chunks from first_chunk, ends counted on from
+        previous_nnz) into the mapped postings. Its chunk ids exceed every
+        existing one, so inserting its term-sorted run after each term's
+        existing postings keeps them sorted by term, then chunk.
+        """
+        lengths = np.diff(np.asarray(ends, dtype=np.int64), prepend=previous_nnz)
+        order = np.argsort(terms, kind='stable')
+        run_terms = terms[order]
+        at = np.searchsorted(self.arrays['post_terms'], run_terms, side='right')
+        chunk_ids = np.repeat(np.arange(first_chunk, first_chunk + len(lengths), dtype=np.uint32), lengths)
+        self._write_postings({
+            'post_terms': np.insert(np.asarray(self.arrays['post_terms']), at, run_terms),
+            'post_chunks': np.insert(np.asarray(self.arrays['post_chunks']), at, chunk_ids[order]),
+            'post_counts': np.insert(np.asarray(self.arrays['post_counts']), at, counts[order]),
+        })
+
+    def _write_postings(self, derived: dict):
+        """Stage each postings file and swap it in."""
+        for name, array in derived.items():
+            staging = f"{self._path(name)}.{threading.get_ident()}.tmp"
+            array.astype(self.FILES[name]).tofile(staging)
+            os.replace(staging, self._path(name))
+
+    @staticmethod
+    def term_ids(text: str) -> np.ndarray:
+        mask = (1 << LIBRARY_TERM_BITS) - 1
+        return np.array([zlib.crc32(token.encode()) & mask for token in content_tokens(text)], dtype=np.uint32)
+
+    @staticmethod
+    def _chunk_spans(text: str) -> list[tuple[int, int, int, int]]:
+        """(page, start, stop, words) of each chunk; pages are separated by form feeds in the blob."""
+        spans, offset = [], 0
+        step = LIBRARY_CHUNK_WORDS - LIBRARY_CHUNK_OVERLAP
+        for page_no, page in enumerate(text.split("\f"), start=1):
+            words = [match.span() for match in re.finditer(r'\S+', page)]
+            for first in range(0, max(len(words) - LIBRARY_CHUNK_OVERLAP, 1), step):
+                window = words[first:first + LIBRARY_CHUNK_WORDS]
+                if window:
+                    spans.append((page_no, offset + window[0][0], offset + window[-1][1], len(window)))
+            offset += len(page) + 1
+        return spans
+
+    def add(self, paper: dict, title: str) -> str:
+        """Index a paper from load_anchor_paper once; returns its digest, the key sessions select it by."""
+        with self.lock:
+            if paper['digest'] in self.by_digest:
+                return paper['digest']
+            text = get_blob_store().get(paper['blob']) or ""
+            spans = self._chunk_spans(text)
+            chunks = np.zeros(len(spans), dtype=self.CHUNK_DTYPE)
+            ends, terms, counts = [], [], []
+            total = self.nnz
+            for i, (page, start, stop, words) in enumerate(spans):
+                ids, tf = np.unique(self.term_ids(text[start:stop]), return_counts=True)
+                chunks[i] = (len(self.papers), page, start, stop, words)
+                terms.append(ids)
+                counts.append(np.minimum(tf, np.iinfo(np.uint16).max))
+                total += len(ids)
+                ends.append(total)
+            appended = {
+                'chunks': chunks,
+                'ends': np.array(ends, dtype=self.FILES['ends']),
+                'terms': (np.concatenate(terms) if terms else np.zeros(0)).astype(self.FILES['terms']),
+                'counts': (np.concatenate(counts) if counts else np.zeros(0)).astype(self.FILES['counts']),
+            }
+            first, committed = self.n_chunks, self.nnz
+            record = {
+                'digest': paper['digest'], 'blob': paper['blob'], 'title': title, 'pages': paper['pages'],
+                'chunks': [first, first + len(spans)],
+            }
+            try:
+                for name, array in appended.items():
+                    with open(self._path(name), "ab") as f:
+                        f.write(array.astype(self.FILES[name]).tobytes())
+                staging = f"{self._path('papers.json')}.{threading.get_ident()}.tmp"
+                with open(staging, "w", encoding="utf-8") as f:
+                    json.dump({'papers': self.papers + [record], 'chunks': first + len(spans), 'nnz': total}, f)
+                os.replace(staging, self._path('papers.json'))
+            except OSError:
+                self._cut_torn()
+                raise
+            self.papers.append(record)
+            self.by_digest[paper['digest']] = len(self.papers) - 1
+            self.n_chunks, self.nnz = first + len(spans), total
+            self._merge(first, committed, appended['ends'], appended['terms'], appended['counts'])
+            self._map()
+            return paper['digest']
+
+    def title(self, digest: str) -> str:
+        return self.papers[self.by_digest[digest]]['title']
+
+    def search(self, text: str, digests: list[str], k: int = LIBRARY_TOP_K) -> list[dict]:
+        """Top-k chunks of the given papers for the text, best first: {'title', 'page', 'text', 'score'}."""
+        selected = [self.by_digest[digest] for digest in digests if digest in self.by_digest]
+        query = np.unique(self.term_ids(text))
+        arrays = self.arrays
+        chunks, post_terms = arrays['chunks'], arrays['post_terms']
+        if not selected or not len(query) or not len(chunks):
+            return []
+        lo = np.searchsorted(post_terms, query, side='left')
+        hi = np.searchsorted(post_terms, query, side='right')
+        found = hi > lo
+        if not found.any():
+            return []
+        lo, hi = lo[found], hi[found]
+        df = (hi - lo).astype(np.float64)
+        idf = np.log(1 + (len(chunks) - df + 0.5) / (df + 0.5))
+        positions = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])
+        ids = np.asarray(arrays['post_chunks'][positions], dtype=np.int64)
+        tf = np.asarray(arrays['post_counts'][positions], dtype=np.float64)
+        words = chunks['words'][ids]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * words / arrays['mean_words'])
+        weights = np.repeat(idf, hi - lo) * tf * (BM25_K1 + 1) / (tf + norm)
+        in_play = np.isin(chunks['paper'][ids], selected)
+        candidates, inverse = np.unique(ids[in_play], return_inverse=True)
+        scores = np.bincount(inverse, weights=weights[in_play])
+        keep = scores >= LIBRARY_MIN_SCORE
+        candidates, scores = candidates[keep], scores[keep]
+        best = np.argsort(-scores, kind='stable')[:k]
+        results = []
+        for i in best:
+            chunk = chunks[candidates[i]]
+            paper = self.papers[chunk['paper']]
+            text = get_blob_store().get(paper['blob']) or ""
+            results.append({
+                'title': paper['title'],
+                'page': int(chunk['page']),
+                'text': " ".join(text[chunk['start']:chunk['stop']].split()),
+                'score': float(scores[i]),
+            })
+        return results
+
+    def stats(self) -> dict:
+        return {'papers': len(self.papers), 'chunks': self.n_chunks,
+                'bytes': sum(os.path.getsize(self._path(name)) for name in self.FILES if os.path.exists(self._path(name)))}
+
+
+@st.cache_resource
+def get_library() -> DocumentLibrary:
+    return DocumentLibrary(os.path.join(DATA_DIR, "library"))
+
+
+def library_excerpts(query: str) -> str | None:
+    """The library passages that best match the query, labelled for citation, from the papers in play."""
+    if not st.session_state.library:
+        return None
+    hits = get_library().search(query, st.session_state.library)
+    if not hits:
+        return None
+    excerpts = "\n\n".join(f"[{hit['title']}, p. {hit['page']}] \"{hit['text']}\"" for hit in hits)
+    return f"[Library excerpts retrieved for this question — cite any you draw on by its bracketed label]:\n\n{excerpts}"
+
+
+# =============================================================================
+# BREACH DETECTION
+# =============================================================================
+# Jackie's FUNCTION 1 breaches, detected locally: no model call is needed to
+# notice that a specialist is repeating themselves or running long.
+
+class BreachDetector:
+    """
+    Per-speaker index of specialist turns for repetition and prolixity checks.
+
+    Each turn is reduced to its set of content-word shingles (n-grams,
+    BREACH_SHINGLE_WORDS long, hashed by rolling the words' CRC32s) and a
+    MinHash signature of that set (multiply-shift hashing, no modulus). A new turn
+    is compared with the speaker's earlier turns three ways: the highest
+    estimated Jaccard similarity with any one of them (restating a prior
+    claim), the share of its shingles the speaker has used before in any turn
+    (repetition), and its length (prolixity): its word count against
+    BREACH_MAX_WORDS and, for a reply to a drill-down, its sentence count
+    against the 3-4 sentence discipline the prompts set for those. Each check
+    is a few vectorised NumPy operations.
+    """
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.a = rng.integers(0, 2**63, BREACH_MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2**63, BREACH_MINHASH_PERMUTATIONS, dtype=np.uint64)
+        self.signatures = {spec: np.zeros((16, BREACH_MINHASH_PERMUTATIONS), np.uint64) for spec in SPECIALIST_SEQUENCE}
+        self.turns = {spec: [] for spec in SPECIALIST_SEQUENCE}      # history index of each filled signature row
+        self.shingles = {spec: set() for spec in SPECIALIST_SEQUENCE}
+        self.flagged = 0                                               # indexed turns carrying breaches
+        self.n_entries = 0
+        self.fingerprint = ""
+
+    @staticmethod
+    def _shingles(text: str) -> np.ndarray:
+        words = content_tokens(text)
+        hashes = np.fromiter((zlib.crc32(word.encode()) for word in words), dtype=np.uint64, count=len(words))
+        n = min(BREACH_SHINGLE_WORDS, len(hashes))
+        grams = hashes[:len(hashes) - n + 1].copy()
+        for k in range(1, n):
+            grams = grams * np.uint64(1_000_003) + hashes[k:len(hashes) - n + 1 + k]
+        return np.unique(grams)
+
+    def _signature(self, shingles: np.ndarray) -> np.ndarray:
+        if not len(shingles):
+            return np.full(BREACH_MINHASH_PERMUTATIONS, 2**32, np.uint64)
+        return ((np.outer(self.a, shingles) + self.b[:, None]) >> np.uint64(32)).min(axis=1)
+
+    def check(self, spec: str, text: str, drill_down: bool = False) -> list[dict]:
+        """Breaches in a new turn by spec, as [{'kind', 'score', 'detail', 'turn'?}]; score >= 1 is a breach."""
+        if spec not in SPECIALIST_SEQUENCE:
+            return []
+        breaches = []
+        sentences, words = len(split_sentences(text)), len(text.split())
+        score = words / BREACH_MAX_WORDS
+        if drill_down:
+            score = max(score, sentences / BREACH_MAX_SENTENCES)
+        if score > 1:
+            breaches.append({'kind': 'prolixity', 'score': round(score, 2),
+                             'detail': f"{sentences} sentences, {words} words"})
+
+        shingles = self._shingles(text)
+        if len(shingles) and len(self.turns[spec]):
+            signatures = self.signatures[spec][:len(self.turns[spec])]
+            similarity = np.count_nonzero(signatures == self._signature(shingles), axis=1) / BREACH_MINHASH_PERMUTATIONS
+            best = int(similarity.argmax())
+            score = similarity[best] / BREACH_RESTATEMENT_SIMILARITY
+            if score >= 1:
+                breaches.append({'kind': 'restatement', 'score': round(float(score), 2), 'turn': self.turns[spec][best],
+                                 'detail': f"~{similarity[best]:.0%} similar to an earlier turn"})
+            overlap = sum(1 for gram in shingles.tolist() if gram in self.shingles[spec]) / len(shingles)
+            score = overlap / BREACH_REPETITION_OVERLAP
+            if score >= 1:
+                breaches.append({'kind': 'repetition', 'score': round(score, 2),
+                                 'detail': f"{overlap:.0%} of its phrasing used before"})
+        return breaches
+
+    def add(self, entry_idx: int, entry: dict):
+        spec = entry['spec']
+        if spec in SPECIALIST_SEQUENCE:
+            shingles = self._shingles(entry['text'])
+            rows, count = self.signatures[spec], len(self.turns[spec])
+            if count == len(rows):
+                self.signatures[spec] = rows = np.vstack([rows, np.zeros_like(rows)])
+            rows[count] = self._signature(shingles)
+            self.turns[spec].append(entry_idx)
+            self.shingles[spec].update(shingles.tolist())
+            self.flagged += 1 if entry.get('breaches') else 0
+        self.n_entries = entry_idx + 1
+
+    def sync(self, history: list):
+        """Index entries appended since the last call; rebuild if the history was replaced."""
+        if _prefix_fingerprint(history, self.n_entries) != self.fingerprint:
+            self.__init__()
+        for idx in range(self.n_entries, len(history)):
+            self.add(idx, history[idx])
+        self.fingerprint = _prefix_fingerprint(history, self.n_entries)
+
+
+def get_breach_detector() -> BreachDetector:
+    if st.session_state.breach_detector is None:
+        st.session_state.breach_detector = BreachDetector()
+    detector = st.session_state.breach_detector
+    detector.sync(st.session_state.history)
+    return detector
+
+
+def describe_breaches(breaches: list[dict]) -> str:
+    return "; ".join(f"{breach['kind']} ({breach['detail']})" for breach in breaches)
+
+
+# =============================================================================
+# TRANSCRIPT RENDERING
+# =============================================================================
+
+def render_entry_html(spec: str, text: str, ts: str) -> str:
+    icon, label, _ = SPEAKER_LABELS.get(spec, ('❓', spec.title(), ''))
+    return (
+        f'<div class="speaker-{spec}">'
+        f'<strong>{icon} {label}</strong>'
+        f'<span style="color:#888;font-size:0.85em;"> {ts}</span>'
+        f'<br><br>{text}'
+        f'</div>'
+    )
+
+
+class TranscriptBlocks:
+    """
+    Each history entry's transcript HTML, rendered once when post_to_history
+    appends the entry. A rerun only joins the visible page's blocks, with no
+    hashing or copying of entry text. The timestamp line is filled in per
+    render because it also carries the search-result marker.
+    """
+
+    def __init__(self):
+        self.blocks = []          # per entry: (HTML before the timestamp line, HTML after it)
+        self.n_entries = 0
+        self.fingerprint = ""
+
+    def add(self, entry_idx: int, entry: dict):
+        head, _, tail = render_entry_html(entry['spec'], entry_text(entry, with_paper=False), "\0").partition("\0")
+        self.blocks.append((head, tail))
+        self.n_entries = entry_idx + 1
+
+    def html(self, entry_idx: int, ts: str) -> str:
+        head, tail = self.blocks[entry_idx]
+        return head + ts + tail
+
+    def nbytes(self) -> int:
+        return sum(len(head) + len(tail) + 100 for head, tail in self.blocks)
+
+    def sync(self, history: list):
+        """Render entries appended since the last call; start over if the history was replaced."""
+        if _prefix_fingerprint(history, self.n_entries) != self.fingerprint:
+            self.__init__()
+        for idx in range(self.n_entries, len(history)):
+            self.add(idx, history[idx])
+        self.fingerprint = _prefix_fingerprint(history, self.n_entries)
+
+
+def get_transcript_blocks() -> TranscriptBlocks:
+    if st.session_state.transcript_blocks is None:
+        st.session_state.transcript_blocks = TranscriptBlocks()
+    blocks = st.session_state.transcript_blocks
+    blocks.sync(st.session_state.history)
+    return blocks
+
+
+# =============================================================================
+# TRANSCRIPT SEARCH
+# =============================================================================
+
+class TranscriptSearch:
+    """
+    Positional inverted index over every history entry, for the transcript search box.
+
+    Each entry is tokenised once, when post_to_history appends it: its word
+    IDs and their character spans are kept as NumPy arrays, and each word's
+    postings list gains the entry's index, so postings stay sorted. A query
+    walks the postings of its rarest word from the newest entry back,
+    confirms the other words by bisecting their postings and each phrase by
+    matching consecutive word IDs in the entry's array, and stops at
+    SEARCH_MAX_HITS. Its cost follows the hits listed, not the transcript's
+    length.
+    """
+
+    def __init__(self):
+        self.vocab = {}
+        self.postings = []        # word id -> indices of the entries containing it, ascending
+        self.words = []           # per entry: its word ids in order
+        self.spans = []           # per entry: (start, end) character offsets of those words
+        self.specs = []
+        self.n_entries = 0
+        self.fingerprint = ""
+
+    def add(self, entry_idx: int, entry: dict):
+        matches = list(re.finditer(r'\w+', entry['text']))
+        ids = np.empty(len(matches), dtype=np.int32)
+        for i, match in enumerate(matches):
+            word = match.group().lower()
+            term = self.vocab.get(word)
+            if term is None:
+                term = self.vocab[word] = len(self.vocab)
+                self.postings.append([])
+            if not self.postings[term] or self.postings[term][-1] != entry_idx:
+                self.postings[term].append(entry_idx)
+            ids[i] = term
+        self.words.append(ids)
+        self.spans.append(np.array([match.span() for match in matches], dtype=np.int32).reshape(-1, 2))
+        self.specs.append(entry['spec'])
+        self.n_entries = entry_idx + 1
+
+    def nbytes(self) -> int:
+        """Approximate memory held: the per-entry arrays and the postings lists."""
+        arrays = sum(words.nbytes + spans.nbytes for words, spans in zip(self.words, self.spans))
+        return arrays + sum(8 * len(entries) + 120 for entries in self.postings)
+
+    def sync(self, history: list):
+        """Index entries appended since the last call; rebuild if the history was replaced."""
+        if _prefix_fingerprint(history, self.n_entries) != self.fingerprint:
+            self.__init__()
+        for idx in range(self.n_entries, len(history)):
+            self.add(idx, history[idx])
+        self.fingerprint = _prefix_fingerprint(history, self.n_entries)
+
+    @staticmethod
+    def parse(query: str) -> list[list[str]]:
+        """The query's phrases, each a list of lowercase words: "quoted" text, else single words."""
+        phrases = []
+        for quoted, word in re.findall(r'"([^"]*)"?|(\S+)', query):
+            if phrase := re.findall(r'\w+', (quoted or word).lower()):
+                phrases.append(phrase)
+        return phrases
+
+    def _contains(self, term: int, entry_idx: int) -> bool:
+        entries = self.postings[term]
+        i = bisect.bisect_left(entries, entry_idx)
+        return i < len(entries) and entries[i] == entry_idx
+
+    def _phrase_spans(self, entry_idx: int, phrases: list[list[int]]) -> list[tuple[int, int]] | None:
+        """Character spans of every occurrence of every phrase, or None if one does not occur."""
+        words, spans = self.words[entry_idx], self.spans[entry_idx]
+        found = []
+        for phrase in phrases:
+            starts = len(words) - len(phrase) + 1
+            if starts <= 0:
+                return None
+            at = np.ones(starts, dtype=bool)
+            for offset, term in enumerate(phrase):
+                at &= words[offset:offset + starts] == term
+            first = np.flatnonzero(at)
+            if not len(first):
+                return None
+            found.extend(zip(spans[first, 0].tolist(), spans[first + len(phrase) - 1, 1].tolist()))
+        return sorted(found)
+
+    def search(self, query: str, speakers: list[str] | None = None,
+               limit: int = SEARCH_MAX_HITS) -> tuple[list[dict], bool]:
+        """
+        The most recent entries containing every phrase of the query, newest
+        first, as {'entry', 'spec', 'spans'}; and whether older matches exist
+        beyond the limit.
+        """
+        phrases = [[self.vocab.get(word) for word in phrase] for phrase in self.parse(query)]
+        if not phrases or any(None in phrase for phrase in phrases):
+            return [], False
+        required = {term for phrase in phrases for term in phrase}
+        rarest = min(required, key=lambda term: len(self.postings[term]))
+        hits = []
+        for entry_idx in reversed(self.postings[rarest]):
+            if speakers and self.specs[entry_idx] not in speakers:
+                continue
+            if not all(self._contains(term, entry_idx) for term in required):
+                continue
+            spans = self._phrase_spans(entry_idx, phrases)
+            if spans is None:
+                continue
+            if len(hits) == limit:
+                return hits, True
+            hits.append({'entry': entry_idx, 'spec': self.specs[entry_idx], 'spans': spans})
+        return hits, False
+
+
+def get_transcript_search() -> TranscriptSearch:
+    if st.session_state.transcript_search is None:
+        st.session_state.transcript_search = TranscriptSearch()
+    index = st.session_state.transcript_search
+    index.sync(st.session_state.history)
+    return index
+
+
+def search_snippet(text: str, spans: list[tuple[int, int]]) -> str:
+    """HTML excerpt of text around the first match, every match inside it highlighted."""
+    start = max(spans[0][0] - SEARCH_SNIPPET_CHARS, 0)
+    stop = min(spans[0][1] + SEARCH_SNIPPET_CHARS, len(text))
+    if start:
+        start = text.find(" ", start, spans[0][0]) + 1 or start
+    if stop < len(text) and (boundary := text.rfind(" ", spans[0][1], stop)) > 0:
+        stop = boundary
+    parts, position = [], start
+    for first, last in spans:
+        if first < position or last > stop:
+            continue
+        parts.append(html.escape(text[position:first]) + f"<mark>{html.escape(text[first:last])}</mark>")
+        position = last
+    parts.append(html.escape(text[position:stop]))
+    return ("…" if start else "") + "".join(parts) + ("…" if stop < len(text) else "")
+
+
+def sentence_at(text: str, offset: int) -> str:
+    """The sentence of text that contains the character offset."""
+    position = 0
+    for sentence in split_sentences(text):
+        found = text.find(sentence, position)
+        if found < 0:
+            continue
+        position = found + len(sentence)
+        if position > offset:
+            return sentence
+    return text.strip()
+
+
+# =============================================================================
+# CORE AGENT CALL
+# =============================================================================
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _speaker_name(spec: str) -> str:
+    return SPEAKER_LABELS.get(spec, ('', spec.title(), ''))[1]
+
+
+def _reference_anchor_papers(text: str) -> str:
+    """Replace an embedded anchor paper with a short reference once its turn has aged out."""
+    if ANCHOR_MARKER not in text:
+        return text
+    query, paper = text.split(ANCHOR_MARKER, 1)
+    opening = " ".join(paper.split()[:25])
+    return (
+        f"{query}\n\n[Anchor paper supplied with this query; omitted from context "
+        f"({len(paper.split()):,} words). Opening: \"{opening}…\"]"
+    )
+
+
+def entry_text(entry: dict, with_paper: bool = True) -> str:
+    """
+    A history entry's text with its anchor paper, if any: attached in full
+    (with_paper) or reduced to a reference. Papers are held in the blob store
+    and cited by ID in entry['anchor']; older entries embed them inline.
+    """
+    text = entry['text']
+    if entry.get('anchor'):
+        text += ANCHOR_MARKER + (get_blob_store().get(entry['anchor']) or "(paper no longer available)")
+    return text if with_paper else _reference_anchor_papers(text)
+
+
+def _context_view(target_spec: str) -> str:
+    """Specialists share one view of the transcript (no Jackie); Jackie sees everything."""
+    return 'orchestrator' if target_spec == 'orchestrator' else 'specialist'
+
+
+def _visible_in_view(spec: str, view: str) -> bool:
+    return view == 'orchestrator' or spec != 'orchestrator'
+
+
+def _attributed_message(spec: str, text: str, target_spec: str):
+    """Convert one history entry into the target agent's view, or None if it is hidden from it."""
+    if spec == target_spec:
+        return AIMessage(content=text)
+    elif spec == 'orchestrator' and target_spec != 'orchestrator':
+        # Exclude Jackie's interventions from specialist context
+        return None
+    elif spec == 'human':
+        return HumanMessage(content=f"[Forum Chair]: {text}")
+    else:
+        # Another specialist's turn (or Jackie's, when target is Jackie)
+        label_tuple = SPEAKER_LABELS.get(spec, ('', spec.title(), ''))
+        _, name, framework = label_tuple
+        if framework:
+            attribution = f"[{name}, speaking from {framework}]"
+        else:
+            attribution = f"[{name}]"
+        return HumanMessage(content=f"{attribution}: {text}")
+
+
+def _prefix_fingerprint(history: list, count: int) -> str:
+    """
+    Identity for history[:count], in constant time; changes when the transcript
+    is cleared, trimmed or replaced.
+
+    History only grows by appending, except through _replace_history, which
+    bumps the session's history_generation. Within a generation a prefix is
+    therefore fixed by its length and its end entries, each identified by its
+    log sequence number (or, logged before those existed, timestamp and text).
+    Call on the script thread.
+    """
+    if count == 0 or count > len(history):
+        return ""
+    ends = [
+        str(entry['seq']) if entry.get('seq') is not None else f"{entry.get('timestamp')}|{entry['text']}"
+        for entry in (history[0], history[count - 1])
+    ]
+    key = f"{st.session_state.history_generation}|{count}|{ends[0]}|{ends[1]}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _replace_history(entries: list):
+    """Install a history that is not the old one plus appended entries (see _prefix_fingerprint)."""
+    st.session_state.history = entries
+    st.session_state.history_generation += 1
+
+
+SUMMARY_PROMPT = """You keep the running minutes of an academic forum in which three theorists (Robert, Genetics; Linda, Dynamic Systems; Andy, Predictive Cognition) debate under a Forum Chair, sometimes moderated by Jackie.
+
+You will be given the existing minutes (if any) and the next stretch of transcript. Return updated minutes that fold the new material into the old. Write compact prose, attribute every claim to its speaker by name, keep the specific evidence each cites (genes, studies, models, data), record questions the Chair put and who answered, and note points conceded or left unanswered. Where an anchor paper was supplied, keep its reference. Do not evaluate the arguments. Stay under 600 words."""
+
+
+class RollingSummaries:
+    """
+    Background-maintained summaries of the aged-out transcript, one per context view.
+
+    After each turn, once a view's transcript approaches its token budget, the
+    entries that have fallen out of the verbatim window are folded into that
+    view's summary on a worker thread. Each summary records how many history
+    entries it covers and a fingerprint of that prefix, so a cleared or
+    replaced transcript invalidates it on lookup.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        self.summaries = {}      # view -> (covered_count, fingerprint, text)
+        self.in_flight = set()
+        self.generation = 0
+        self.last_error = None
+
+    def reset(self):
+        with self.lock:
+            self.summaries.clear()
+            self.in_flight.clear()
+            self.generation += 1
+
+    def lookup(self, view: str, history: list) -> tuple[int, str] | None:
+        with self.lock:
+            found = self.summaries.get(view)
+        if found is None:
+            return None
+        covered, fingerprint, text = found
+        if _prefix_fingerprint(history, covered) != fingerprint:
+            with self.lock:
+                if self.summaries.get(view) is found:
+                    del self.summaries[view]
+            return None
+        return covered, text
+
+    def covered(self, history: list) -> int:
+        """Leading history entries folded into the minutes of both views (0 unless both have minutes)."""
+        counts = [found[0] if (found := self.lookup(view, history)) else 0 for view in ('specialist', 'orchestrator')]
+        return min(counts)
+
+    def drop_prefix(self, count: int, history: list):
+        """Re-key the summaries after the first count entries were evicted; history is what remains."""
+        with self.lock:
+            for view, (covered, _, text) in list(self.summaries.items()):
+                if covered >= count:
+                    self.summaries[view] = (covered - count, _prefix_fingerprint(history, covered - count), text)
+
+    def schedule(self, view: str, history: list, views: "ContextViews", llm, slot, breaker):
+        """
+        Queue a refresh of the view's summary if enough turns have aged out since
+        the last one. views must be synced to history; its running token totals
+        stand in for the view's transcript size.
+        """
+        aged_out = len(history) - VERBATIM_RECENT_TURNS
+        found = self.lookup(view, history)
+        covered, previous = found if found else (0, None)
+        if llm is None or aged_out - covered < SUMMARY_MIN_NEW_TURNS:
+            return
+
+        view_specs = SPECIALIST_SEQUENCE if view == 'specialist' else ['orchestrator']
+        budget = min(CONTEXT_TOKEN_BUDGET[spec] for spec in view_specs)
+        view_tokens = max(views.total_tokens(spec) for spec in view_specs)
+        if found is None and view_tokens < budget * SUMMARY_TRIGGER_RATIO:
+            return
+
+        lines = [
+            f"[{_speaker_name(entry['spec'])}]: {entry_text(entry, with_paper=False)}"
+            for entry in history[covered:aged_out]
+            if _visible_in_view(entry['spec'], view)
+        ]
+        fingerprint = _prefix_fingerprint(history, aged_out)
+        with self.lock:
+            if view in self.in_flight:
+                return
+            self.in_flight.add(view)
+            generation = self.generation
+        route = get_router().resolve('summary', 'orchestrator')
+        self.executor.submit(self._refresh, llm, slot, breaker, route, view, generation, previous, lines, aged_out, fingerprint)
+
+    def _refresh(self, llm, slot, breaker, route, view, generation, previous, lines, covered, fingerprint):
+        text = None
+        try:
+            minutes = previous or "(none yet)"
+            messages = [
+                SystemMessage(content=SUMMARY_PROMPT),
+                HumanMessage(content=f"EXISTING MINUTES:\n{minutes}\n\nNEXT STRETCH OF TRANSCRIPT:\n\n" + "\n\n".join(lines)),
+            ]
+            retries, started = {}, time.perf_counter()
+            try:
+                resp = call_upstream(lambda timeout: llm.invoke(messages, **{**route.kwargs, 'timeout': timeout}),
+                                     route.kwargs['timeout'], slot, breaker, retries)
+            except Exception as e:
+                route.record(started, time.perf_counter(), error=e, resilience=retries)
+                raise
+            route.record(started, time.perf_counter(), usage_metadata=resp.usage_metadata, resilience=retries)
+            text = resp.content
+        except Exception as e:
+            self.last_error = e
+        with self.lock:
+            self.in_flight.discard(view)
+            if text and generation == self.generation:
+                self.summaries[view] = (covered, fingerprint, text)
+
+
+def get_compactor() -> RollingSummaries:
+    if st.session_state.compactor is None:
+        st.session_state.compactor = RollingSummaries()
+    return st.session_state.compactor
+
+
+def _cache_breakpoint(message):
+    """
+    Return a copy of the message whose content carries an Anthropic prompt-cache
+    breakpoint. Everything up to and including a breakpoint is cached by the
+    provider, so the next call sharing that prefix skips re-prefilling it.
+    """
+    block = {"type": "text", "text": message.content, "cache_control": {"type": "ephemeral"}}
+    return type(message)(content=[block])
+
+
+def _message_text(message) -> str:
+    """Plain text of a message whose content may be a list of cache-annotated blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(block.get("text", "") for block in message.content)
+
+
+class ContextViews:
+    """
+    Every agent's view of the transcript, converted once as entries are posted.
+
+    Each appended entry is turned into a message once for the agent who spoke
+    it (an AIMessage) and once, attributed, for everyone else; the message
+    objects are shared between views, and Jackie's turns are left out of the
+    specialists' views. Anchor papers appear as references, as they do once
+    their turn has aged out. Per view, the number of visible entries before
+    each history index and the cumulative token estimate are kept alongside,
+    so build_messages slices and budgets its transcript without walking the
+    history. The session's token usage is totalled in the same pass.
+    """
+
+    TARGETS = SPECIALIST_SEQUENCE + ['orchestrator']
+
+    def __init__(self):
+        self.messages = {target: [] for target in self.TARGETS}    # visible entries, oldest first
+        self.tokens = {target: [0] for target in self.TARGETS}     # cumulative estimate over messages
+        self.visible = {target: [0] for target in self.TARGETS}    # visible entries among history[:i]
+        self.usage = {'turns': 0, 'hits': 0, 'input_tokens': 0, 'output_tokens': 0,
+                      'cache_read': 0, 'cache_creation': 0, 'cost': 0.0}
+        self.last_usage = None
+        self.chars = 0
+        self.n_entries = 0
+        self.fingerprint = ""
+
+    def add(self, entry: dict):
+        spec, text = entry['spec'], entry_text(entry, with_paper=False)
+        converted = {}   # 'own' / 'other' -> (message, tokens)
+        for target in self.TARGETS:
+            if spec == 'orchestrator' and target != 'orchestrator':
+                self.visible[target].append(self.visible[target][-1])
+                continue
+            role = 'own' if spec == target else 'other'
+            if role not in converted:
+                message = _attributed_message(spec, text, target)
+                converted[role] = (message, estimate_tokens(message.content))
+                self.chars += len(message.content) if role == 'other' else 0
+            message, tokens = converted[role]
+            self.messages[target].append(message)
+            self.tokens[target].append(self.tokens[target][-1] + tokens)
+            self.visible[target].append(self.visible[target][-1] + 1)
+        if usage := entry.get('usage'):
+            self.usage['turns'] += 1
+            self.usage['hits'] += 1 if usage['cache_read'] else 0
+            for key in ('input_tokens', 'output_tokens', 'cache_read', 'cache_creation'):
+                self.usage[key] += usage.get(key, 0)
+            self.usage['cost'] += estimate_cost(usage)
+            self.last_usage = usage
+        self.n_entries += 1
+
+    def sync(self, history: list):
+        """Convert entries appended since the last call; rebuild if the history was replaced."""
+        if _prefix_fingerprint(history, self.n_entries) != self.fingerprint:
+            self.__init__()
+        for idx in range(self.n_entries, len(history)):
+            self.add(history[idx])
+        self.fingerprint = _prefix_fingerprint(history, self.n_entries)
+
+    def span(self, target: str, start: int, stop: int) -> tuple[int, int]:
+        """Positions in the target's messages (and tokens) of the visible entries of history[start:stop]."""
+        return self.visible[target][start], self.visible[target][stop]
+
+    def total_tokens(self, target: str) -> int:
+        return self.tokens[target][-1]
+
+    def nbytes(self) -> int:
+        """Approximate memory held: attributed copies of entry text and the per-view arrays."""
+        rows = sum(len(messages) for messages in self.messages.values())
+        return self.chars + 600 * self.n_entries + 3 * 8 * rows
+
+
+def get_context_views() -> ContextViews:
+    if st.session_state.context_views is None:
+        st.session_state.context_views = ContextViews()
+    views = st.session_state.context_views
+    views.sync(st.session_state.history)
+    return views
+
+
+def estimate_cost(usage: dict) -> float:
+    """
+    USD for one call's usage at its model's MODEL_PRICE_PER_MTOK (turns logged
+    before routing carry no model and are priced as a full turn). input_tokens
+    includes cached reads and writes.
+    """
+    prices = MODEL_PRICE_PER_MTOK.get(usage.get('model'), MODEL_PRICE_PER_MTOK[MODEL_ROUTES['turn']['model']])
+    uncached = usage['input_tokens'] - usage['cache_read'] - usage['cache_creation']
+    return (
+        uncached * prices['input']
+        + usage['cache_read'] * prices['cache_read']
+        + usage['cache_creation'] * prices['cache_creation']
+        + usage['output_tokens'] * prices['output']
+    ) / 1e6
+
+
+def build_messages(
+    target_spec: str,
+    current_query: str,
+    drill_down_passage: str | None = None,
+    query_in_history: bool = True,
+) -> list:
+    """
+    Construct the full message list for an agent call.
+
+    The agent receives the running transcript as a sequence of attributed
+    messages, giving it visibility of the whole exchange rather than only
+    the most recent turn. The agent's own prior contributions are AIMessages;
+    everyone else's are HumanMessages with attribution prefixes.
+
+    Jackie's coordination turns are excluded from specialist context (her
+    interventions are meta-discursive and would clutter the deliberation),
+    but when Jackie herself is the target, her own prior turns are included.
+
+    Long transcripts are compacted to the agent's CONTEXT_TOKEN_BUDGET: the
+    last VERBATIM_RECENT_TURNS entries are always sent in full, anchor papers
+    older than that are reduced to a reference, and anything covered by the
+    view's rolling summary is replaced by it. If the budget is still exceeded
+    (the summary has not caught up yet) the oldest turns are dropped.
+
+    When library papers are in play, the passages that best match the query
+    (and any drill-down passage) go in just before it, labelled so the agent
+    can cite them; only the excerpts are sent, never whole papers.
+
+    Cache breakpoints sit on the persona prompt, the end of the transcript so
+    far, and the current query. Each agent's view of the transcript only ever
+    grows at the end, so its next turn finds this turn's prefix in the cache.
+    """
+    full_prompt = PROMPTS.get(target_spec, PROMPTS['orchestrator'])
+    history = st.session_state.history
+    aged_out = len(history) - VERBATIM_RECENT_TURNS
+
+    start, summary = 0, None
+    found = get_compactor().lookup(_context_view(target_spec), history)
+    if found:
+        start, summary = found
+
+    # The transcript excludes the most recently posted human turn, which is
+    # the current query and will be appended last with framing. Queued jobs
+    # build their messages before the chair's turn is posted. Aged-out turns
+    # come pre-converted from the agent's view; the verbatim window (at most
+    # VERBATIM_RECENT_TURNS entries) is converted here, anchor papers in full.
+    views = get_context_views()
+    stop = len(history) - 1 if query_in_history else len(history)
+    recent_start = min(max(start, aged_out), stop)
+    first, last = views.span(target_spec, start, recent_start)
+    cumulative = views.tokens[target_spec]
+    recent = [
+        message for idx in range(recent_start, stop)
+        if (message := _attributed_message(history[idx]['spec'], entry_text(history[idx]), target_spec)) is not None
+    ]
+    transcript = views.messages[target_spec][first:last] + recent
+
+    # Append the current query as the final HumanMessage.
+    if drill_down_passage:
+        final_content = (
+            f"[Forum Chair, drilling down on an earlier passage]: {current_query}\n\n"
+            f"The passage flagged for drill-down: \"{drill_down_passage}\""
+        )
+    else:
+        final_content = f"[Forum Chair]: {current_query}"
+    excerpts = library_excerpts(f"{current_query} {drill_down_passage or ''}")
+
+    budget = CONTEXT_TOKEN_BUDGET.get(target_spec, CONTEXT_TOKEN_BUDGET['orchestrator'])
+    total = sum(estimate_tokens(t) for t in (full_prompt, summary or "", excerpts or "", final_content))
+    total += cumulative[last] - cumulative[first] + sum(estimate_tokens(m.content) for m in recent)
+    dropped = 0
+    if total > budget:
+        # Fewest oldest turns whose tokens cover the excess; the recent window is never dropped.
+        limit = max(len(transcript) - VERBATIM_RECENT_TURNS, 0)
+        dropped = bisect.bisect_left(
+            range(limit + 1), total - budget, key=lambda count: cumulative[first + count] - cumulative[first]
+        )
+        dropped = min(dropped, limit)
+
+    messages = [_cache_breakpoint(SystemMessage(content=full_prompt))]
+    if summary:
+        messages.append(HumanMessage(content=f"[Forum minutes, summarising the earlier discussion]: {summary}"))
+    if dropped:
+        messages.append(HumanMessage(content="[Earlier discussion omitted to fit the context budget.]"))
+    messages.extend(transcript[dropped:])
+
+    if len(messages) > 1:
+        messages[-1] = _cache_breakpoint(messages[-1])
+
+    if excerpts:
+        messages.append(HumanMessage(content=excerpts))
+    messages.append(_cache_breakpoint(HumanMessage(content=final_content)))
+    return messages
+
+
+def summarise_usage(usage_metadata: dict | None, model: str | None = None) -> dict | None:
+    """Reduce LangChain usage metadata to the token counts shown per turn, noting the model that ran."""
+    if not usage_metadata:
+        return None
+    details = usage_metadata.get('input_token_details') or {}
+    usage = {
+        'input_tokens': usage_metadata.get('input_tokens', 0),
+        'output_tokens': usage_metadata.get('output_tokens', 0),
+        'cache_read': details.get('cache_read', 0) or 0,
+        'cache_creation': details.get('cache_creation', 0) or 0,
+    }
+    if model:
+        usage['model'] = model
+    return usage
+
+
+def post_to_history(spec: str, text: str, usage: dict | None = None, drill_down: bool = False):
+    """Add an entry to the conversation history (drill_down: it answers a drill-down passage)."""
+    entry = {
+        'spec': spec,
+        'text': text,
+        'timestamp': datetime.now().strftime("%H:%M"),
+    }
+    if usage:
+        entry['usage'] = usage
+    if breaches := get_breach_detector().check(spec, text, drill_down):
+        entry['breaches'] = breaches
+    entry['seq'] = st.session_state.log_seq
+    st.session_state.log_seq += 1
+    st.session_state.history.append(entry)
+    get_session_log().append(st.session_state.session_id, {'type': 'entry', **entry})
+    st.session_state.transcript_page = 0
+    st.session_state.transcript_focus = None
+    get_drill_index()
+    views = get_context_views()
+    get_breach_detector()
+    get_transcript_search()
+    get_transcript_blocks()
+    if breaches and st.session_state.auto_moderate:
+        moderate(entry)
+
+    # Each completed turn may push older turns out of the verbatim window.
+    if spec != 'human':
+        compactor = get_compactor()
+        for view in ('specialist', 'orchestrator'):
+            compactor.schedule(view, st.session_state.history, views, st.session_state.llm,
+                               upstream_slot('anthropic'), upstream_breaker('anthropic'))
+
+
+RESUME_PROMPT = (
+    "[Your reply above was cut off by a dropped connection. Continue it from exactly where it stops, "
+    "without repeating anything.]"
+)
+
+
+class AgentStream:
+    """
+    Stream one agent's response on a worker thread.
+
+    The script thread polls .text to render progress; tokens are also fed to
+    an optional SpeechPipeline as they arrive. No st.* calls happen here.
+    The route (resolved on the script thread) chooses the model, sets the
+    call's deadline and is told how the request went.
+
+    A stream that fails part-way, or goes quiet for STREAM_STALL_SECONDS, is
+    retried like any upstream call (see RESILIENCE). What had arrived is
+    kept up to the last sentence already handed to speech (or the last
+    sentence, without speech), and the retry is asked to continue from
+    there, so nothing is heard twice. Once the route has enough samples, a
+    request with no reply by the route's p95 TTFT is hedged: an identical
+    second request is sent and whichever answers first is kept. A hedge
+    takes its own upstream slot, and only if one is free at once, so hedging
+    never pushes a provider past its cap or ahead of queued sessions.
+    """
+
+    def __init__(self, llm, messages: list, pipeline: SpeechPipeline | None = None, slot=None,
+                 route: Route | None = None, breaker: CircuitBreaker | None = None):
+        self.llm = llm
+        self.messages = messages
+        self.pipeline = pipeline
+        self.route = route
+        # Pass slot and breaker in when constructing off the script thread.
+        self.slot = slot or upstream_slot('anthropic')
+        self.breaker = breaker or upstream_breaker('anthropic')
+        self.text = ""
+        self.usage_metadata = None
+        self.error = None
+        self.done = False
+        self.started_at = None       # perf_counter readings, for tracing
+        self.first_token_at = None
+        self.finished_at = None
+        self.cancelled = False
+        self.resilience = {'retries': 0, 'resumes': 0, 'hedges': 0}
+        self.rejoin = False          # the next token continues a resumed reply
+
+    def cancel(self):
+        """Stop at the next chunk; closing the stream ends the upstream request."""
+        self.cancelled = True
+        if self.pipeline:
+            self.pipeline.cancel()
+
+    def run(self):
+        try:
+            self._run_attempts()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.perf_counter()
+            if self.route and self.started_at is not None and not (self.cancelled and self.first_token_at is None):
+                self.route.record(self.started_at, self.finished_at, self.first_token_at,
+                                  self.usage_metadata, self.error, self.resilience)
+            if self.pipeline:
+                self.pipeline.close()
+            self.done = True
+
+    def _run_attempts(self):
+        deadline = self.route.kwargs['timeout'] if self.route else MODEL_ROUTES['turn']['timeout']
+        stop_at = time.monotonic() + deadline
+        for attempt in range(UPSTREAM_MAX_ATTEMPTS):
+            if not self.breaker.allow():
+                raise CircuitOpen(f"Claude unavailable after repeated failures; retrying in {self.breaker.retry_in():.0f}s")
+            messages = self._resume_messages()
+            error = healthy = None      # as in call_upstream; a cancelled attempt gives no verdict
+            try:
+                with self.slot(max(stop_at - time.monotonic(), 0.0), lambda: self.cancelled):
+                    kwargs = {**self.route.kwargs, 'timeout': max(stop_at - time.monotonic(), 1.0)} if self.route else {}
+                    if self.started_at is None:
+                        self.started_at = time.perf_counter()
+                    self._read(messages, kwargs, stop_at, deadline)
+                healthy = None if self.cancelled else True
+            except SlotUnavailable as e:
+                error = e
+            except Exception as e:
+                error, healthy = e, None if self.cancelled else not _retryable(e)
+            finally:
+                self.breaker.settle(healthy)
+            if error is None:
+                return
+            if healthy is not False:
+                raise error
+            delay = _backoff(attempt)
+            if attempt + 1 == UPSTREAM_MAX_ATTEMPTS or time.monotonic() + delay >= stop_at:
+                raise error
+            self.resilience['retries'] += 1
+            time.sleep(delay)
+
+    def _resume_messages(self) -> list:
+        """The next attempt's request: the original, or a continuation of what is kept of the reply."""
+        if not self.text:
+            return self.messages
+        if self.pipeline and self.pipeline.voice_id:
+            kept = len(self.text) - len(self.pipeline.splitter.buffer)
+            self.pipeline.splitter.buffer = ""
+        else:
+            kept = max((match.end() for match in SENTENCE_END.finditer(self.text)), default=0)
+        self.text = self.text[:kept]
+        if not self.text.strip():
+            self.text = ""
+            return self.messages
+        self.resilience['resumes'] += 1
+        self.rejoin = True
+        return self.messages + [AIMessage(content=self.text.rstrip()), HumanMessage(content=RESUME_PROMPT)]
+
+    def _read(self, messages: list, kwargs: dict, stop_at: float, deadline: float):
+        """One attempt, read through StreamReader so the deadline, a stall or a hedge can cut in."""
+        out = queue.Queue()
+        readers = [StreamReader(self.llm, messages, kwargs, out)]
+        hedge_after = self.route.router.hedge_delay(self.route) if HEDGE_REQUESTS and self.route else None
+        started = last_data = time.monotonic()
+        winner, held = None, {}     # held: each reader's usage-only chunks before its first token
+        try:
+            while not self.cancelled:
+                now = time.monotonic()
+                if now >= stop_at:
+                    raise TimeoutError(f"no complete reply within the {deadline:.0f}s deadline")
+                if now - last_data >= STREAM_STALL_SECONDS:
+                    raise TimeoutError(f"stream stalled: no data for {STREAM_STALL_SECONDS}s")
+                wait = JOB_POLL_SECONDS
+                if winner is None and hedge_after is not None and len(readers) == 1:
+                    if now - started >= hedge_after:
+                        hedge_slot = ExitStack()
+                        try:
+                            hedge_slot.enter_context(self.slot(0.0))
+                        except SlotUnavailable:
+                            hedge_after = None      # the provider is busy: no hedge for this attempt
+                        else:
+                            readers.append(StreamReader(self.llm, messages, kwargs, out, hedge_slot))
+                            self.resilience['hedges'] += 1
+                    else:
+                        wait = min(wait, started + hedge_after - now)
+                try:
+                    reader, item = out.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                if reader not in readers or (winner is not None and reader is not winner):
+                    continue
+                last_data = time.monotonic()
+                if isinstance(item, Exception):
+                    readers.remove(reader)
+                    if winner is None and readers:
+                        continue        # the other request may still answer
+                    raise item
+                if item is StreamReader.END:
+                    if winner is None:
+                        for chunk in held.get(reader, []):
+                            self._apply(chunk)
+                    return
+                if winner is None:
+                    if not item.content:
+                        held.setdefault(reader, []).append(item)
+                        continue
+                    winner = reader
+                    for other in readers:
+                        if other is not winner:
+                            other.cancel()
+                    for chunk in held.get(reader, []):
+                        self._apply(chunk)
+                self._apply(item)
+        finally:
+            for reader in readers:
+                reader.cancel()
+
+    def _apply(self, chunk):
+        if chunk.usage_metadata:
+            self.usage_metadata = add_usage(self.usage_metadata, chunk.usage_metadata)
+        content = chunk.content
+        if content:
+            if self.rejoin and self.text and not self.text[-1].isspace() and not content[0].isspace():
+                content = " " + content
+            self.rejoin = False
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.text += content
+            if self.pipeline:
+                self.pipeline.feed(content)
+
+
+def _traced_build_messages(trace: TurnTrace, spec: str, query_text: str, drill_down_passage: str | None) -> list:
+    with trace.span('build_messages', agent=spec) as attrs:
+        messages = build_messages(spec, query_text, drill_down_passage, query_in_history=False)
+        chars = sum(len(_message_text(message)) for message in messages)
+        attrs.update(messages=len(messages), chars=chars, input_tokens=chars // CHARS_PER_TOKEN)
+    return messages
+
+
+# =============================================================================
+# BACKGROUND JOBS
+# =============================================================================
+
+class StaticPart:
+    """A finished part of a job's output (e.g. a cached paper section), shown like a completed stream."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.done = True
+        self.error = None
+        self.usage_metadata = None
+        self.pipeline = None
+
+
+class Job(ABC):
+    """
+    One request from the chair, run off the script thread so the page stays
+    interactive while agents generate.
+
+    run() executes on the session's JobRunner pool and touches no Streamlit
+    state: it drives the job's AgentStreams, whose text the job fragment
+    renders as it grows. Anything that needs session state happens in the
+    script thread, when the job is built and in commit(), which the runner
+    calls once this job and every job submitted before it have finished.
+    """
+
+    def __init__(self, target: str, heading: str):
+        self.id = uuid.uuid4().hex[:8]
+        self.target = target
+        self.heading = heading
+        self.status = 'queued'      # queued -> running -> done | failed
+        self.error = None
+        self.parts = {}             # part key -> AgentStream or StaticPart
+        self.order = []             # part keys in display order
+        self.titles = {}            # part key -> label shown above its text
+        self.submitted_at = time.perf_counter()
+        self.playback_started = None
+        self.first_clip_seconds = 0.0   # length of the opening sentence played live
+        self.settled = threading.Event()
+        self.cancelled = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.submitted_at
+
+    def run(self):
+        self.status = 'running'
+        try:
+            self._run()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.status = 'failed' if self.error else 'done'
+            self.settled.set()
+
+    @staticmethod
+    def _run_streams(streams: list):
+        with ThreadPoolExecutor(max_workers=len(streams), thread_name_prefix="stream") as executor:
+            for stream in streams:
+                executor.submit(stream.run)
+
+    def cancel(self):
+        self.cancelled = True
+        for part in self.parts.values():
+            if hasattr(part, 'cancel'):
+                part.cancel()
+
+    @abstractmethod
+    def _run(self):
+        """Generate the job's parts; runs on the job pool and touches no Streamlit state."""
+
+    @abstractmethod
+    def commit(self, runner: "JobRunner"):
+        """Post the job's results to the session; runs in the script thread, in submission order."""
+
+
+class QueryJob(Job):
+    """A query to one agent, or to every specialist at once for a panel round."""
+
+    # Whether the chair's next unnamed follow-up goes to this job's target.
+    # After a panel round that is the panel again: the chair addressed all three.
+    routes_follow_ups = True
+
+    def __init__(self, target: str, query_text: str, drill_down_passage: str | None,
+                 posted_text: str, trace: TurnTrace):
+        _, label, _ = SPEAKER_LABELS.get(target, ('', 'The panel', ''))
+        super().__init__(target, f"Forum Chair → {label}")
+        self.query_text = query_text
+        self.drill_down_passage = drill_down_passage
+        self.posted_text = posted_text
+        self.trace = trace
+        self.speculative = False    # started from a transcription the chair has not yet fired
+
+    def _run(self):
+        self._run_streams([self.parts[key] for key in self.order])
+        for stream in self.parts.values():
+            if stream.pipeline and not self.cancelled:
+                stream.pipeline.audio()   # wait for the last segments, off the script thread
+
+    def lead_pipeline(self) -> SpeechPipeline | None:
+        return self.parts[self.order[0]].pipeline
+
+    def commit(self, runner: "JobRunner"):
+        if self.speculative:
+            # Nobody changed the transcription while it ran: it counts as fired.
+            clear_transcription()
+            if st.session_state.dd_pending and st.session_state.dd_pending['text'] == self.drill_down_passage:
+                st.session_state.dd_pending = None
+        if self.posted_text:
+            post_to_history('human', self.posted_text)
+        clips = []
+        for spec in self.order:
+            stream = self.parts[spec]
+            _, label, _ = SPEAKER_LABELS[spec]
+            if stream.error:
+                runner.notices.append(f"{label} could not respond: {stream.error}")
+            if stream.text:
+                model = stream.route.model if stream.route else None
+                post_to_history(spec, stream.text, usage=summarise_usage(stream.usage_metadata, model),
+                                drill_down=bool(self.drill_down_passage))
+            if stream.pipeline:
+                clips.append(stream.pipeline.audio())
+                if stream.pipeline.errors:
+                    runner.notices.append(f"ElevenLabs synthesis error: {stream.pipeline.errors[0]}")
+                if stream.pipeline.degraded:
+                    runner.notices.append(
+                        f"Speech paused while ElevenLabs is failing: {label}'s reply is text only "
+                        f"(retrying in {stream.pipeline.breaker.retry_in():.0f}s)."
+                    )
+            self.trace.add_stream(stream, spec)
+        if self.routes_follow_ups:
+            st.session_state.last_responding_agent = self.target
+        finish_trace(self.trace)
+
+        audio_bytes = b"".join(clip for clip in clips if clip)
+        if audio_bytes:
+            self.play(get_audio_blobs().put(audio_bytes), len(audio_bytes))
+
+    def play(self, key: str, size: int):
+        """
+        Hand the committed reply's clip (an audio blob key) to the page for
+        playback, picking up where the live opening sentence got to. Only that
+        sentence was played live, so the clip never skips past its end however
+        long the rest of the reply took to generate.
+        """
+        set_pending_audio(key, self.target, (
+            min(time.perf_counter() - self.playback_started, self.first_clip_seconds) if self.playback_started else 0.0
+        ))
+
+
+class JobRunner:
+    """
+    A session's background jobs. Up to JOB_MAX_CONCURRENT run at once (each
+    still subject to the upstream gateway); finished jobs are committed to
+    history strictly in submission order, so a quick reply never lands above
+    the answer to an earlier question.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=JOB_MAX_CONCURRENT, thread_name_prefix="job")
+        self.jobs = []       # submitted and not yet committed, oldest first
+        self.notices = []    # errors from committed jobs, shown until dismissed
+
+    def submit(self, job: Job) -> Job:
+        self.jobs.append(job)
+        self.executor.submit(job.run)
+        return job
+
+    def commit_ready(self) -> int:
+        """Commit the finished jobs at the head of the queue (script thread only)."""
+        committed = 0
+        while self.jobs and self.jobs[0].finished:
+            job = self.jobs.pop(0)
+            if job.error:
+                self.notices.append(f"{job.heading} failed: {job.error}")
+            else:
+                job.commit(self)
+            committed += 1
+        if committed:
+            enforce_memory_cap()
+        return committed
+
+    def find(self, job_id: str | None) -> Job | None:
+        return next((job for job in self.jobs if job.id == job_id), None)
+
+    def cancel(self, job: Job):
+        """Stop a pending job's upstream work and drop it without committing."""
+        job.cancel()
+        self.jobs.remove(job)
+
+    def discard(self):
+        """Forget every pending job; threads still running finish and are dropped."""
+        for job in self.jobs:
+            job.cancel()
+        self.jobs = []
+
+    def wait(self, timeout: float | None = None):
+        """Block until every submitted job has finished (for benchmarks and tests)."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for job in list(self.jobs):
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            if not job.settled.wait(remaining):
+                raise TimeoutError(f"job {job.id} still running")
+
+
+def get_job_runner() -> JobRunner:
+    if st.session_state.job_runner is None:
+        st.session_state.job_runner = JobRunner()
+    return st.session_state.job_runner
+
+
+def fire_query(target_spec: str, query_text: str, drill_down_passage: str | None = None,
+               posted_text: str | None = None) -> QueryJob:
+    """
+    Queue a query to an agent, or to every specialist for PANEL, and return the job.
+
+    Messages are built now, from the transcript as it stands, with excerpts
+    from the session's library papers that bear on the query. The chair's
+    turn (posted_text if given, else the query) and the replies are posted
+    together when the job commits. In audio mode speech is synthesised
+    sentence by sentence as the reply streams; the job fragment starts the
+    opening sentence as soon as it arrives, and pending_audio_start records
+    how far into it playback got so the full clip resumes from there after
+    the commit.
+    """
+    trace = TurnTrace(target_spec, take_pending_spans())
+    job = QueryJob(target_spec, query_text, drill_down_passage, posted_text or query_text, trace)
+    return _start_query_job(job, query_text)
+
+
+def _start_query_job(job: QueryJob, query_text: str) -> QueryJob:
+    """Build the job's messages from the transcript as it stands, attach speech if on, and submit it."""
+    specs = SPECIALIST_SEQUENCE if job.target == PANEL else [job.target]
+    audio_on = st.session_state.audio_mode and st.session_state.el_client
+    for spec in specs:
+        messages = _traced_build_messages(job.trace, spec, query_text, job.drill_down_passage)
+        pipeline = SpeechPipeline(st.session_state.el_client, spec) if audio_on else None
+        route = get_router().resolve('drill_down' if job.drill_down_passage else 'turn', spec)
+        job.parts[spec] = AgentStream(st.session_state.llm, messages, pipeline, route=route)
+        job.order.append(spec)
+        job.titles[spec] = SPEAKER_LABELS[spec][1]
+    return get_job_runner().submit(job)
+
+
+MODERATION_PROMPT = """[Breach detector]: {name}'s latest turn was flagged for {findings}.
+
+{name}'s latest turn:
+"{text}"{earlier}
+
+Intervene as traffic cop (FUNCTION 1): name the breach and direct the speaker, in 2-3 sentences."""
+
+
+class InterventionJob(QueryJob):
+    """
+    Jackie's automatic intervention; during a debate her clip queues behind
+    the speakers'. The chair did not question her, so a follow-up still goes
+    to whoever the chair last addressed.
+    """
+
+    routes_follow_ups = False
+
+    def play(self, key: str, size: int):
+        debate = st.session_state.debate
+        if debate is not None and debate.active:
+            round_index = min(debate.submitted // len(SPECIALIST_SEQUENCE), debate.rounds - 1)
+            debate.enqueue(key, self.target, size * 8 / TTS_BITRATE, round_index)
+        else:
+            super().play(key, size)
+
+
+def moderate(entry: dict) -> InterventionJob | None:
+    """
+    Queue Jackie's intervention on a flagged specialist turn if its worst
+    breach reaches MODERATION_THRESHOLD and none was made in the last
+    MODERATION_COOLDOWN_TURNS entries. She is shown only the offending turn
+    (and the earlier turn it restates), not the transcript, so the call stays
+    small and does not touch the agents' prompt caches.
+    """
+    last = st.session_state.last_intervention_seq
+    if st.session_state.llm is None or (last is not None and entry['seq'] - last < MODERATION_COOLDOWN_TURNS):
+        return None
+    if max(breach['score'] for breach in entry['breaches']) < MODERATION_THRESHOLD:
+        return None
+
+    history, name = st.session_state.history, _speaker_name(entry['spec'])
+    restated = next((b['turn'] for b in entry['breaches'] if b['kind'] == 'restatement'), None)
+    earlier = ""
+    if restated is not None and restated < len(history):
+        earlier = f"\n\nThe earlier turn it restates:\n\"{history[restated]['text']}\""
+    prompt = MODERATION_PROMPT.format(
+        name=name, findings=describe_breaches(entry['breaches']), text=entry['text'], earlier=earlier,
+    )
+    job = InterventionJob('orchestrator', prompt, None, None, TurnTrace('orchestrator'))
+    job.heading = f"Jackie on {name}'s turn"
+    messages = [_cache_breakpoint(SystemMessage(content=PROMPTS['orchestrator'])), HumanMessage(content=prompt)]
+    audio_on = st.session_state.audio_mode and st.session_state.el_client
+    pipeline = SpeechPipeline(st.session_state.el_client, 'orchestrator') if audio_on else None
+    route = get_router().resolve('intervention', 'orchestrator')
+    job.parts['orchestrator'] = AgentStream(st.session_state.llm, messages, pipeline, route=route)
+    job.order.append('orchestrator')
+    job.titles['orchestrator'] = SPEAKER_LABELS['orchestrator'][1]
+    st.session_state.last_intervention_seq = entry['seq']
+    return get_job_runner().submit(job)
+
+
+def clear_transcription():
+    """Reset the voice panel once its transcription has been fired or discarded."""
+    st.session_state.transcription = ''
+    st.session_state.parsed_agent = None
+    st.session_state.parsed_drill_ref = None
+    st.session_state.parsed_query = ''
+    st.session_state.speculative_job = None
+
+
+def speculate(target_spec: str, query_text: str) -> QueryJob:
+    """
+    Start answering a fresh transcription straight away, before the chair
+    fires it. The job commits like any other unless cancel_speculation() is
+    called first (the chair edited, re-addressed or cleared the transcription).
+    """
+    drill = st.session_state.dd_pending['text'] if st.session_state.dd_pending else None
+    job = fire_query(target_spec, query_text, drill_down_passage=drill)
+    job.speculative = True
+    st.session_state.speculative_job = job.id
+    return job
+
 
-When the transcript provided to you begins with the instruction DRAFT OUTPUT PAPER, you step fully into the role of academic secretary. You will be given the full forum transcript. Your task is to write a conventional academic paper in prose throughout — no bullet points, no headers other than standard section titles, no lists. Structure it as follows: Abstract (100 words); Introduction presenting the theoretical question; a section on each specialist framework as revealed in the discussion; a section identifying the key points of genuine theoretical conflict; a Conclusion noting what empirical work would be needed to adjudicate between the frameworks. Write with scholarly precision. Do not declare winners. Preserve the incommensurabilities."""
-}
+def cancel_speculation():
+    runner = get_job_runner()
+    job = runner.find(st.session_state.speculative_job)
+    if job is not None and job.speculative:
+        runner.cancel(job)
+        # The recording's transcription span belongs to whichever turn is fired next.
+        transcribed = [span for span in job.trace.spans if span['name'] == 'transcribe']
+        st.session_state.pending_spans = transcribed + st.session_state.pending_spans
+    st.session_state.speculative_job = None
 
-SPECIALIST_SEQUENCE = ['genetics', 'systems', 'predictive']
 
-SPEAKER_LABELS = {
-    'genetics':     ('', 'Robert',      'Genetics'),
-    'systems':      ('', 'Linda',       'Dynamic Systems'),
-    'predictive':   ('', 'Andy',        'Predictive Cognition'),
-    'orchestrator': ('', 'Jackie',      ''),
-    'human':        ('', 'Forum Chair', ''),
-}
+PAPER_SECTION_PROMPT = """DRAFT OUTPUT PAPER — FRAMEWORK SECTION
 
-# Agent name aliases for speech parsing
-AGENT_NAME_MAP = {
-    'geneticist': 'genetics', 'genetics': 'genetics', 'genetic': 'genetics', 'crick': 'genetics',
-    'ds theorist': 'systems', 'systems': 'systems', 'dynamic systems': 'systems',
-    'systems theorist': 'systems', 'thelen': 'systems',
-    'predictive cognitivist': 'predictive', 'predictive': 'predictive',
-    'friston': 'predictive', 'cognitivist': 'predictive', 'bayesian': 'predictive',
-    'orchestrator': 'orchestrator', 'coordinator': 'orchestrator', 'chair': 'orchestrator',
-    'robert': 'genetics',
-    'linda': 'systems',
-    'andy': 'predictive',
-    'jackie': 'orchestrator',
-}
+Below are the contributions of {name}, speaking for the {framework} framework, each preceded by the Forum Chair's question that prompted it. Write only the section of the output paper on this framework as revealed in the discussion: its central claims, the evidence offered, how it handled challenges, and where it conceded or evaded. Scholarly prose throughout, no lists, no section title, 300-500 words.
 
-RECIPIENT_MAP = {
-    "Jackie (Orchestrator)": "orchestrator",
-    "Robert (Genetics)": "genetics",
-    "Linda (Dynamic Systems)": "systems",
-    "Andy (Predictive Cognition)": "predictive",
-}
+{material}"""
 
-# =============================================================================
-# AUDIO UTILITIES
-# =============================================================================
+PAPER_SYNTHESIS_PROMPT = """DRAFT OUTPUT PAPER — SYNTHESIS
 
-def transcribe_audio(audio_bytes: bytes) -> str:
-    """Send audio bytes to OpenAI Whisper API and return transcript."""
-    if st.session_state.oai_client is None:
-        return ""
-    if not audio_bytes:
-        return ""
-    try:
-        import io
-        audio_file = io.BytesIO(audio_bytes)
-        audio_file.name = "recording.wav"
-        transcript = st.session_state.oai_client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            language="en"
-        )
-        return transcript.text
-    except Exception as e:
-        st.error(f"Transcription error: {e}")
-        return ""
+Below are the drafted framework sections of the output paper. Write the two closing sections in scholarly prose, each introduced by a markdown heading exactly as given: "## Key Points of Theoretical Conflict", identifying where the frameworks genuinely conflict rather than talk past each other, and "## Conclusion", noting what empirical work would be needed to adjudicate between them. Do not declare winners. Preserve the incommensurabilities.
 
+{sections}"""
 
-def parse_agent_from_transcript(text: str) -> tuple[str | None, str]:
-    """Extract the intended agent from a spoken query. Returns (agent_key, cleaned_text)."""
-    text_lower = text.lower().strip()
-    sorted_aliases = sorted(AGENT_NAME_MAP.keys(), key=len, reverse=True)
+PAPER_FRONT_MATTER_PROMPT = """DRAFT OUTPUT PAPER — FRONT MATTER
 
-    for alias in sorted_aliases:
-        pattern = r'^' + re.escape(alias) + r'[\s,\-–—:\.]*'
-        match = re.match(pattern, text_lower)
-        if match:
-            agent_key = AGENT_NAME_MAP[alias]
-            cleaned = text[match.end():].strip()
-            st.toast(f"Agent parsed: '{alias}' → {agent_key}", icon="✅")
-            return agent_key, cleaned
+Below are the questions the Forum Chair put to the forum and the drafted framework sections of the output paper. Write the opening of the paper in scholarly prose, each part introduced by a markdown heading exactly as given: "## Abstract" (100 words) and "## Introduction", presenting the theoretical question the forum addressed.
 
-    st.toast(f"No agent detected. First 40 chars: '{text[:40]}'", icon="⚠️")
-    return None, text
+QUESTIONS PUT BY THE CHAIR:
+{questions}
 
+{sections}"""
 
-def find_drill_down_target(reference_text: str) -> dict | None:
-    """Find the most semantically similar passage in history to the spoken reference."""
-    if not st.session_state.history or not reference_text.strip():
-        return None
 
-    def token_overlap(a: str, b: str) -> float:
-        stopwords = {'the', 'a', 'an', 'is', 'it', 'of', 'to', 'in', 'and',
-                     'that', 'this', 'was', 'for', 'on', 'are', 'with', 'you',
-                     'your', 'but', 'not', 'what', 'how', 'do', 'does', 'by',
-                     'at', 'be', 'have', 'has', 'from', 'or', 'their', 'its'}
-        tokens_a = {w for w in re.findall(r'\b\w+\b', a.lower()) if w not in stopwords and len(w) > 2}
-        tokens_b = {w for w in re.findall(r'\b\w+\b', b.lower()) if w not in stopwords and len(w) > 2}
-        if not tokens_a or not tokens_b:
-            return 0.0
-        return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+def _paper_material(spec: str) -> str:
+    """One specialist's turns, each with the Chair's question before it, newest kept if over budget."""
+    pairs, question = [], None
+    for entry in st.session_state.history:
+        if entry['spec'] == 'human':
+            question = entry_text(entry, with_paper=False)
+        elif entry['spec'] == spec:
+            pairs.append(f"[Forum Chair]: {question or '(no question recorded)'}\n[{_speaker_name(spec)}]: {entry['text']}")
+    budget = CONTEXT_TOKEN_BUDGET['orchestrator']
+    kept, total = [], 0
+    for pair in reversed(pairs):
+        total += estimate_tokens(pair)
+        if total > budget:
+            break
+        kept.append(pair)
+    return "\n\n---\n\n".join(reversed(kept))
 
-    best_score = 0.0
-    best_item = None
 
-    for item in st.session_state.history:
-        if item['spec'] not in SPECIALIST_SEQUENCE:
-            continue
-        score = token_overlap(reference_text, item['text'])
-        if score > best_score:
-            best_score = score
-            best_item = item
+def _paper_stream(llm, slot, breaker: CircuitBreaker, route: Route, prompt: str) -> AgentStream:
+    messages = [SystemMessage(content=PROMPTS['orchestrator']), HumanMessage(content=prompt)]
+    return AgentStream(llm, messages, slot=slot, route=route, breaker=breaker)
 
-    if best_score >= SIMILARITY_THRESHOLD and best_item:
-        return best_item
-    return None
 
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
 
-def synthesise_speech(text: str, agent_key: str) -> bytes | None:
-    """Call ElevenLabs to synthesise the agent's response. Returns audio bytes or None."""
-    if st.session_state.el_client is None:
-        return None
 
-    voice_id = ELEVENLABS_VOICE_IDS.get(agent_key)
-    if not voice_id:
-        return None
+class PaperJob(Job):
+    """
+    Draft the output paper map-reduce style.
+
+    Map: each framework section is drafted in parallel from that specialist's
+    own turns. Reduce: the front matter (abstract, introduction) and the
+    synthesis (conflicts, conclusion) are drafted in parallel from the
+    section drafts rather than the full transcript. Every part is cached in
+    session state by a digest of its inputs, so re-drafting after a few more
+    turns only regenerates the sections whose specialist has spoken since.
+    """
 
-    try:
-        st.toast(f"Synthesising {agent_key} | model: eleven_turbo_v2_5 | chars: {len(text)}", icon="🔊")
-        audio = st.session_state.el_client.text_to_speech.convert(
-            text=text,
-            voice_id=voice_id,
-            voice_settings=VoiceSettings(
-                stability=0.42,
-                similarity_boost=0.72,
-                style=0.15,
-                use_speaker_boost=True
-            ),
-            model_id="eleven_turbo_v2_5"
+    def __init__(self, materials: dict, questions: str, cache: dict):
+        super().__init__('orchestrator', "Jackie is drafting the output paper")
+        self.materials = materials          # spec -> that specialist's turns, with the Chair's questions
+        self.questions = questions
+        self.cache = dict(cache)            # snapshot; new drafts are written back in commit()
+        self.drafted = {}                   # part key -> (input digest, text) drafted by this job
+        self.order = ['front'] + [spec for spec in SPECIALIST_SEQUENCE if spec in materials] + ['synthesis']
+        self.titles = {spec: f"The {SPEAKER_LABELS[spec][2]} Framework" for spec in materials}
+        self.paper_text = None
+        self.usage = None
+        self.llm = st.session_state.llm              # captured here: streams are created on the job thread
+        self.slot = upstream_slot('anthropic')
+        self.breaker = upstream_breaker('anthropic')
+        self.route = get_router().resolve('paper', 'orchestrator')
+
+    def _draft(self, prompts: dict) -> dict:
+        """Draft each {key: (digest, prompt)} not already cached; returns {key: text}."""
+        streams = {}
+        for key, (digest, prompt) in prompts.items():
+            cached = self.cache.get(key)
+            if cached and cached[0] == digest:
+                self.parts[key] = StaticPart(cached[1])
+            else:
+                self.parts[key] = streams[key] = _paper_stream(self.llm, self.slot, self.breaker, self.route, prompt)
+        if streams:
+            self._run_streams(list(streams.values()))
+        for key, stream in streams.items():
+            if stream.error:
+                raise RuntimeError(f"could not draft {self.titles.get(key, key)}: {stream.error}")
+            self.drafted[key] = (prompts[key][0], stream.text)
+            if stream.usage_metadata:
+                self.usage = add_usage(self.usage, stream.usage_metadata)
+        return {key: self.parts[key].text for key in prompts}
+
+    def _run(self):
+        sections = self._draft({
+            spec: (_digest(spec, material), PAPER_SECTION_PROMPT.format(
+                name=SPEAKER_LABELS[spec][1], framework=SPEAKER_LABELS[spec][2], material=material))
+            for spec, material in self.materials.items()
+        })
+        section_text = "\n\n".join(
+            f"## {self.titles[spec]}\n\n{sections[spec]}" for spec in SPECIALIST_SEQUENCE if spec in sections
         )
-        return b"".join(audio)
-    except Exception as e:
-        st.error(f"ElevenLabs synthesis error: {e}")
+        prompts = {
+            'front': PAPER_FRONT_MATTER_PROMPT.format(questions=self.questions, sections=section_text),
+            'synthesis': PAPER_SYNTHESIS_PROMPT.format(sections=section_text),
+        }
+        reduced = self._draft({key: (_digest(prompt), prompt) for key, prompt in prompts.items()})
+        self.paper_text = "\n\n".join([reduced['front'], section_text, reduced['synthesis']])
+
+    def commit(self, runner: "JobRunner"):
+        st.session_state.paper_cache.update(self.drafted)
+        post_to_history('orchestrator', self.paper_text, usage=summarise_usage(self.usage, self.route.model))
+
+
+def submit_paper_draft() -> PaperJob | None:
+    """Queue an output-paper draft from the transcript as it stands; None if no specialist has spoken."""
+    materials = {spec: material for spec in SPECIALIST_SEQUENCE if (material := _paper_material(spec))}
+    if not materials:
         return None
+    questions = "\n".join(
+        f"- {entry_text(entry, with_paper=False)[:300]}"
+        for entry in st.session_state.history if entry['spec'] == 'human'
+    )
+    return get_job_runner().submit(PaperJob(materials, questions, st.session_state.paper_cache))
 
 
 # =============================================================================
-# CORE AGENT CALL
+# DEBATE MODE
 # =============================================================================
 
-def build_messages(
-    target_spec: str,
-    current_query: str,
-    drill_down_passage: str | None = None,
-) -> list:
-    """
-    Construct the full message list for an agent call.
+DEBATE_TURN_PROMPT = """The forum is in open debate on the question: "{question}". {previous} has just spoken. Respond directly to the strongest point made since you last spoke, from your own framework: concede what you must and press where you disagree. Address the other speakers rather than the Chair, in under 250 words."""
 
-    The agent receives the running transcript as a sequence of attributed
-    messages, giving it visibility of the whole exchange rather than only
-    the most recent turn. The agent's own prior contributions are AIMessages;
-    everyone else's are HumanMessages with attribution prefixes.
 
-    Jackie's coordination turns are excluded from specialist context (her
-    interventions are meta-discursive and would clutter the deliberation),
-    but when Jackie herself is the target, her own prior turns are included.
-    """
-    full_prompt = PROMPTS.get(target_spec, PROMPTS['orchestrator'])
-    messages = [SystemMessage(content=full_prompt)]
+class DebateTurnJob(QueryJob):
+    """One specialist's turn in a debate; its clip joins the debate's playlist rather than pending_audio."""
 
-    # Walk the history excluding the most recently posted human turn,
-    # which is the current query and will be appended last with framing.
-    for entry in st.session_state.history[:-1]:
-        spec = entry['spec']
-        text = entry['text']
+    def __init__(self, debate: "Debate", spec: str, query_text: str, posted_text: str | None, round_index: int):
+        super().__init__(spec, query_text, None, posted_text, TurnTrace(spec))
+        self.debate = debate
+        self.round_index = round_index
+        self.heading = f"Debate round {round_index + 1}/{debate.rounds} · {SPEAKER_LABELS[spec][1]}"
 
-        if spec == target_spec:
-            messages.append(AIMessage(content=text))
-        elif spec == 'orchestrator' and target_spec != 'orchestrator':
-            # Exclude Jackie's interventions from specialist context
-            continue
-        elif spec == 'human':
-            messages.append(HumanMessage(content=f"[Forum Chair]: {text}"))
+    def commit(self, runner: "JobRunner"):
+        stream = self.parts[self.target]
+        if stream.error or not stream.text.strip():
+            # Nothing is posted, not even the chair question: the retry posts it.
+            reason = f"could not respond: {stream.error}" if stream.error else "returned an empty reply"
+            self.debate.failed(f"{self.heading} {reason}. Resume to retry the turn.")
+            return
+        super().commit(runner)
+        self.debate.committed(self)
+
+    def play(self, key: str, size: int):
+        self.debate.enqueue(key, self.target, size * 8 / TTS_BITRATE, self.round_index)
+
+
+class Debate:
+    """
+    An unattended debate: rounds in which each specialist answers the others in turn.
+
+    Turns are generated one at a time, since each must see the one before it
+    in build_messages, but generation runs ahead of playback: while turn k is
+    heard, turn k+1 is generated and synthesised, and its clip queues behind
+    k's (clip lengths estimated from TTS_BITRATE) so speakers never overlap.
+    Generation waits once DEBATE_LOOKAHEAD_TURNS finished clips are queued
+    unheard. step() runs on the script thread, on every job-fragment tick.
+    """
+
+    def __init__(self, question: str, rounds: int):
+        self.question = question
+        self.rounds = rounds
+        self.total_turns = rounds * len(SPECIALIST_SEQUENCE)
+        self.submitted = 0
+        self.status = 'running'          # running | paused | stopped | finished
+        self.job_id = None               # the turn being generated
+        self.chair_question = question   # posted with the next turn, which answers it
+        self.turn_question = None        # the chair question taken by the turn in flight
+        self.playlist = deque()          # (clip key, agent, seconds, round) waiting to be heard
+        self.now_playing = None          # (clip key, agent, seconds, round, started)
+        self.idle_since = None           # playback ran dry while a turn was still generating
+        self.notice = None
+        self.stats = [
+            {'turns': 0, 'output_tokens': 0, 'generation': 0.0, 'audio': 0.0, 'stall': 0.0,
+             'started': None, 'finished': None}
+            for _ in range(rounds)
+        ]
+
+    @property
+    def active(self) -> bool:
+        """Turns still to generate, or clips still to hear."""
+        return self.status in ('running', 'paused') or self.now_playing is not None or bool(self.playlist)
+
+    def step(self, runner: "JobRunner"):
+        """Advance playback by the clock and start the next turn once it is due."""
+        now = time.perf_counter()
+        if self.now_playing and now >= self.now_playing[4] + self.now_playing[2]:
+            get_audio_blobs().release(self.now_playing[0])
+            self.now_playing = None
+            if not self.playlist and self.status == 'running' and self.job_id:
+                self.idle_since = now
+        if self.now_playing is None and self.playlist:
+            key, agent, seconds, round_index = self.playlist.popleft()
+            if self.idle_since is not None:
+                self.stats[round_index]['stall'] += now - self.idle_since
+                self.idle_since = None
+            self.now_playing = (key, agent, seconds, round_index, now)
+
+        if self.job_id and runner.find(self.job_id) is None:
+            # Failed (the runner reports why) or discarded: retry it on resume.
+            self.failed("A debate turn did not complete; resume to retry it.")
+        if (self.status == 'running' and self.job_id is None and self.submitted < self.total_turns
+                and len(self.playlist) < DEBATE_LOOKAHEAD_TURNS):
+            self._submit()
+        if self.status == 'running' and self.job_id is None and self.submitted == self.total_turns:
+            self.status = 'finished'
+
+    def _submit(self):
+        n = len(SPECIALIST_SEQUENCE)
+        spec, round_index = SPECIALIST_SEQUENCE[self.submitted % n], self.submitted // n
+        if self.chair_question:
+            query = posted = self.chair_question
         else:
-            # Another specialist's turn (or Jackie's, when target is Jackie)
-            label_tuple = SPEAKER_LABELS.get(spec, ('', spec.title(), ''))
-            _, name, framework = label_tuple
-            if framework:
-                attribution = f"[{name}, speaking from {framework}]"
-            else:
-                attribution = f"[{name}]"
-            messages.append(HumanMessage(content=f"{attribution}: {text}"))
+            previous = _speaker_name(SPECIALIST_SEQUENCE[(self.submitted - 1) % n])
+            query, posted = DEBATE_TURN_PROMPT.format(question=self.question, previous=previous), None
+        self.turn_question, self.chair_question = self.chair_question, None
+        stats = self.stats[round_index]
+        stats['started'] = stats['started'] or time.perf_counter()
+        self.job_id = _start_query_job(DebateTurnJob(self, spec, query, posted, round_index), query).id
+        self.submitted += 1
+
+    def failed(self, notice: str):
+        """Pause with the turn in flight unspent, so resuming retries it with the same chair question."""
+        self.submitted -= 1
+        questions = [q for q in (self.turn_question, self.chair_question) if q]
+        self.chair_question = "\n\n".join(questions) or None
+        self.job_id = self.turn_question = None
+        self.status = 'paused'
+        self.idle_since = None
+        self.notice = notice
+
+    def committed(self, job: DebateTurnJob):
+        self.job_id = self.turn_question = None
+        stream, stats = job.parts[job.target], self.stats[job.round_index]
+        stats['turns'] += 1
+        stats['output_tokens'] += (stream.usage_metadata or {}).get('output_tokens', 0)
+        if stream.started_at and stream.finished_at:
+            stats['generation'] += stream.finished_at - stream.started_at
+        stats['finished'] = time.perf_counter()
+
+    def enqueue(self, key: str, agent: str, seconds: float, round_index: int):
+        self.playlist.append((key, agent, seconds, round_index))
+        self.stats[round_index]['audio'] += seconds
+
+    def pause(self):
+        if self.status == 'running':
+            self.status = 'paused'
+            self.idle_since = None
+
+    def resume(self):
+        if self.status == 'paused':
+            self.status = 'running'
+            self.notice = None
+
+    def stop(self, runner: "JobRunner"):
+        if (job := runner.find(self.job_id)) is not None:
+            runner.cancel(job)
+        self.job_id = None
+        clips = get_audio_blobs()
+        for queued in self.playlist:
+            clips.release(queued[0])
+        if self.now_playing:
+            clips.release(self.now_playing[0])
+        self.playlist.clear()
+        self.now_playing = None
+        self.status = 'stopped'
+
+    def inject(self, question: str):
+        """Put a chair question to the debate; the next speaker answers it and the others follow on."""
+        self.chair_question = f"{self.chair_question}\n\n{question}" if self.chair_question else question
+
+    def round_stats(self) -> list[dict]:
+        rows = []
+        for index, stats in enumerate(self.stats):
+            if not stats['turns']:
+                continue
+            wall = stats['finished'] - stats['started']
+            rows.append({
+                'round': index + 1,
+                'turns': stats['turns'],
+                'wall': wall,
+                'turns_per_minute': 60 * stats['turns'] / wall if wall else 0.0,
+                'tokens_per_second': stats['output_tokens'] / stats['generation'] if stats['generation'] else 0.0,
+                'audio': stats['audio'],
+                'stall': stats['stall'],
+            })
+        return rows
+
+
+def _close_debate():
+    """Drop this session's debate, releasing any clips it has not yet played."""
+    if st.session_state.debate is not None:
+        st.session_state.debate.stop(get_job_runner())
+    st.session_state.debate = None
 
-    # Append the current query as the final HumanMessage.
-    if drill_down_passage:
-        final_content = (
-            f"[Forum Chair, drilling down on an earlier passage]: {current_query}\n\n"
-            f"The passage flagged for drill-down: \"{drill_down_passage}\""
-        )
-    else:
-        final_content = f"[Forum Chair]: {current_query}"
 
-    messages.append(HumanMessage(content=final_content))
-    return messages
+# =============================================================================
+# SESSION PERSISTENCE
+# =============================================================================
 
+class SessionLog:
+    """
+    Append-only JSONL log of every forum session, split into numbered segments.
+
+    Records are {'type': 'entry' | 'state' | 'clear', ...}. Appends go onto a
+    queue and are written by a single background thread, so post_to_history
+    never waits on disk. Compaction (also run on the writer thread) rewrites a
+    session's segments keeping only the entries after its last clear and its
+    latest state snapshot, into a staging directory swapped in for the live
+    one; opening the log finishes or rolls back a swap a crash interrupted.
+    Write failures are logged and the writer carries on.
+    """
 
-def call_agent(spec: str, user_message: str, drill_down_passage: str | None = None) -> str:
-    """Call the specified agent (non-streaming) and return the response text."""
-    messages = build_messages(spec, user_message, drill_down_passage)
-    resp = st.session_state.llm.invoke(messages)
-    return resp.content
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.segments = {}   # session_id -> (segment number, records in it)
+        os.makedirs(root, exist_ok=True)
+        self._recover()
+        threading.Thread(target=self._writer, name="session-log", daemon=True).start()
+
+    def _dir(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id)
+
+    def _recover(self):
+        """
+        Settle compactions a crash cut short. The live directory is moved to
+        .old only once .compact is fully written, so a session with no live
+        directory gets back .old (its untouched records); leftovers beside a
+        live directory are stale and removed.
+        """
+        for name in os.listdir(self.root):
+            live, suffix = os.path.splitext(os.path.join(self.root, name))
+            if suffix not in (".old", ".compact"):
+                continue
+            if not os.path.exists(live) and suffix == ".old":
+                os.replace(live + suffix, live)
+            elif os.path.exists(live + suffix):
+                shutil.rmtree(live + suffix, ignore_errors=True)
+
+    def _segment_files(self, session_id: str) -> list[str]:
+        try:
+            names = sorted(n for n in os.listdir(self._dir(session_id)) if n.endswith(".jsonl"))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self._dir(session_id), n) for n in names]
+
+    @staticmethod
+    def _read(path: str) -> list[dict]:
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue   # torn final line from an interrupted write
+        return records
+
+    # --- writer thread ---
+
+    def append(self, session_id: str, record: dict):
+        if session_id:
+            self.queue.put(('append', session_id, record))
+
+    def compact_later(self, session_id: str):
+        self.queue.put(('compact', session_id, None))
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        self.queue.join()
+
+    def _writer(self):
+        while True:
+            op, session_id, record = self.queue.get()
+            try:
+                with self.lock:
+                    if op == 'append':
+                        self._write(session_id, [record])
+                    else:
+                        self._compact(session_id)
+            except Exception:
+                logging.getLogger(__name__).exception("session log: %s failed for session %s", op, session_id)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, session_id: str, records: list[dict]):
+        if session_id not in self.segments:
+            files = self._segment_files(session_id)
+            if files:
+                number = int(os.path.basename(files[-1])[4:10])
+                self.segments[session_id] = (number, len(self._read(files[-1])))
+            else:
+                os.makedirs(self._dir(session_id), exist_ok=True)
+                self.segments[session_id] = (0, 0)
+        for record in records:
+            number, count = self.segments[session_id]
+            if count >= SESSION_SEGMENT_RECORDS:
+                number, count = number + 1, 0
+            path = os.path.join(self._dir(session_id), f"seg-{number:06d}.jsonl")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.segments[session_id] = (number, count + 1)
+
+    def _replay(self, session_id: str) -> tuple[list[dict], dict | None]:
+        entries, state = [], None
+        for path in self._segment_files(session_id):
+            for record in self._read(path):
+                if record['type'] == 'entry':
+                    entries.append(record)
+                elif record['type'] == 'state':
+                    state = record
+                elif record['type'] == 'clear':
+                    entries = []
+        return entries, state
+
+    def _compact(self, session_id: str):
+        entries, state = self._replay(session_id)
+        records = entries + ([state] if state else [])
+        live, staging = self._dir(session_id), self._dir(session_id) + ".compact"
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(live + ".old", ignore_errors=True)
+        os.makedirs(staging)
+        for number, start in enumerate(range(0, max(len(records), 1), SESSION_SEGMENT_RECORDS)):
+            with open(os.path.join(staging, f"seg-{number:06d}.jsonl"), "w", encoding="utf-8") as f:
+                for record in records[start:start + SESSION_SEGMENT_RECORDS]:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(live, live + ".old")
+        os.replace(staging, live)
+        shutil.rmtree(live + ".old", ignore_errors=True)
+        self.segments.pop(session_id, None)
+
+    # --- readers ---
+
+    def exists(self, session_id: str) -> bool:
+        return bool(re.fullmatch(r'[0-9a-f]{12}', session_id or "")) and bool(self._segment_files(session_id))
+
+    def segment_count(self, session_id: str) -> int:
+        return len(self._segment_files(session_id))
+
+    def load(self, session_id: str, before_seq: int | None = None, limit: int = RESUME_WINDOW) -> tuple[list[dict], dict | None, bool]:
+        """
+        Return (entries, latest state, older_exist) reading segments newest first.
+
+        At most `limit` entries are returned, oldest first, all with seq below
+        before_seq when given. Entries preceding a clear are never returned.
+        """
+        newest_first, state, older = [], None, False
+        with self.lock:
+            files = self._segment_files(session_id)
+            for path in reversed(files):
+                for record in reversed(self._read(path)):
+                    if record['type'] == 'clear':
+                        return newest_first[::-1], state, False
+                    if record['type'] == 'state':
+                        state = state or record
+                    elif before_seq is None or record['seq'] < before_seq:
+                        if len(newest_first) == limit:
+                            older = True
+                            break
+                        newest_first.append(record)
+                if older:
+                    break
+        return newest_first[::-1], state, older
+
+
+@st.cache_resource
+def get_session_log() -> SessionLog:
+    return SessionLog(os.path.join(DATA_DIR, "sessions"))
+
+
+def _history_entry(record: dict) -> dict:
+    return {k: v for k, v in record.items() if k != 'type'}
+
+
+def resume_session(session_id: str):
+    """Replace this browser session's forum state with the tail of a logged session."""
+    get_job_runner().discard()
+    _close_debate()
+    log = get_session_log()
+    log.flush()
+    entries, state, older = log.load(session_id)
+    st.session_state.session_id = session_id
+    _replace_history([_history_entry(r) for r in entries])
+    st.session_state.log_seq = entries[-1]['seq'] + 1 if entries else 0
+    st.session_state.older_turns = older
+    st.session_state.drill_queue = state['drill_queue'] if state else []
+    st.session_state.dd_pending = state['dd_pending'] if state else None
+    st.session_state.library = state.get('library', []) if state else []
+    st.session_state.persisted_state = _forum_state()
+    st.session_state.transcript_page = 0
+    st.session_state.transcript_focus = None
+    st.query_params["session"] = session_id
+    _remember_session(session_id)
+    if log.segment_count(session_id) > SESSION_COMPACT_SEGMENTS:
+        log.compact_later(session_id)
+
+
+def load_older_turns():
+    """Prepend the next RESUME_WINDOW logged turns that precede the loaded history."""
+    history = st.session_state.history
+    before = history[0]['seq'] if history else None
+    entries, _, older = get_session_log().load(st.session_state.session_id, before_seq=before)
+    _replace_history([_history_entry(r) for r in entries] + history)
+    st.session_state.older_turns = older
+
+
+def _forum_state() -> dict:
+    """Detached copy of the non-history forum state that the log snapshots."""
+    return json.loads(json.dumps({
+        'drill_queue': st.session_state.drill_queue,
+        'dd_pending': st.session_state.dd_pending,
+        'library': st.session_state.library,
+    }))
+
+
+def _remember_session(session_id: str):
+    if session_id not in st.session_state.known_sessions:
+        st.session_state.known_sessions.append(session_id)
+
+
+def start_new_session():
+    st.session_state.session_id = uuid.uuid4().hex[:12]
+    st.session_state.log_seq = 0
+    st.session_state.persisted_state = _forum_state()
+    st.query_params["session"] = st.session_state.session_id
+    _remember_session(st.session_state.session_id)
+
+
+if st.session_state.session_id is None:
+    requested = st.query_params.get("session")
+    if requested and get_session_log().exists(requested):
+        resume_session(requested)
+    else:
+        start_new_session()
 
+# Drill queue and pending drill-down change all over the script; snapshot them
+# at the top of each run, which follows every interaction.
+if (forum_state := _forum_state()) != st.session_state.persisted_state:
+    st.session_state.persisted_state = forum_state
+    get_session_log().append(st.session_state.session_id, {'type': 'state', **forum_state})
 
-def post_to_history(spec: str, text: str):
-    """Add an entry to the conversation history."""
-    st.session_state.history.append({
-        'spec': spec,
-        'text': text,
-        'timestamp': datetime.now().strftime("%H:%M"),
-    })
+# =============================================================================
+# SESSION MEMORY
+# =============================================================================
+# Audio and anchor papers live in the blob stores, so what a session holds in
+# st.session_state is its transcript, traces, drill index and paper drafts.
+# These are estimated after every run and reported across sessions; once a
+# session passes SESSION_MEMORY_CAP_BYTES the cheapest state is shed first.
+
+ENTRY_OVERHEAD_BYTES = 1024   # dict, timestamp, usage and seq of a history entry
+SPAN_OVERHEAD_BYTES = 1024
+TRACE_OVERHEAD_BYTES = 512
+
+
+def session_memory() -> dict:
+    """Estimated bytes this session holds in session state, by category."""
+    state = st.session_state
+    return {
+        'history': sum(len(entry['text']) + ENTRY_OVERHEAD_BYTES for entry in state.history),
+        'traces': sum(len(trace['spans']) * SPAN_OVERHEAD_BYTES + TRACE_OVERHEAD_BYTES for trace in state.traces),
+        'drill_index': state.drill_index.nbytes() if state.drill_index else 0,
+        'search_index': state.transcript_search.nbytes() if state.transcript_search else 0,
+        'transcript_html': state.transcript_blocks.nbytes() if state.transcript_blocks else 0,
+        'context_views': state.context_views.nbytes() if state.context_views else 0,
+        'paper_drafts': sum(len(text) for _, text in state.paper_cache.values()),
+        'input': len(state.transcription) + len(state.get('query_box') or ""),
+    }
 
 
-def fire_query(target_spec: str, query_text: str, drill_down_passage: str | None = None) -> tuple[str, bytes | None]:
+class MemoryReport:
     """
-    Unified query firing: call agent, post to history, synthesise audio if in audio mode.
-    Returns (response_text, audio_bytes_or_None).
+    Latest memory estimate of every session in the process, for the sidebar
+    report. Only totals leave it: session IDs are enough to resume a session,
+    so no visitor is shown anyone else's.
     """
-    _, label, _ = SPEAKER_LABELS[target_spec]
-    post_to_history('human', query_text)
 
-    messages = build_messages(target_spec, query_text, drill_down_passage)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}   # session_id -> (bytes by category, last seen)
 
-    if target_spec == 'orchestrator':
-        with st.spinner(f"{label} is responding…"):
-            resp = st.session_state.llm.invoke(messages)
-            response_text = resp.content
-    else:
-        response_text = ""
-        placeholder = st.empty()
-        for chunk in st.session_state.llm.stream(messages):
-            if chunk.content:
-                response_text += chunk.content
-                placeholder.markdown(f"**{label}:** {response_text}▌")
-        placeholder.markdown(f"**{label}:** {response_text}")
+    def update(self, session_id: str, usage: dict):
+        with self.lock:
+            self.sessions[session_id] = (usage, time.time())
+
+    def totals(self) -> dict:
+        """Count, combined and largest bytes of the sessions seen within SESSION_REPORT_IDLE_SECONDS."""
+        cutoff = time.time() - SESSION_REPORT_IDLE_SECONDS
+        with self.lock:
+            for session_id in [sid for sid, (_, seen) in self.sessions.items() if seen < cutoff]:
+                del self.sessions[session_id]
+            held = [sum(usage.values()) for usage, _ in self.sessions.values()]
+        return {'sessions': len(held), 'bytes': sum(held), 'largest': max(held, default=0)}
 
-    post_to_history(target_spec, response_text)
-    st.session_state.last_responding_agent = target_spec
 
-    audio_bytes = None
-    if st.session_state.audio_mode and st.session_state.el_client:
-        with st.spinner(f"Synthesising {label}'s voice…"):
-            audio_bytes = synthesise_speech(response_text, target_spec)
+@st.cache_resource
+def get_memory_report() -> MemoryReport:
+    return MemoryReport()
 
 
-    return response_text, audio_bytes
+def enforce_memory_cap() -> dict:
+    """
+    Shed state until the session fits SESSION_MEMORY_CAP_BYTES, and return its usage.
 
+    In order: the older half of the latency traces (repeatedly), the cached
+    paper drafts (redrafted on demand), and finally the oldest transcript
+    turns, but only those both views' rolling minutes already cover, so no
+    agent loses context. Evicted turns stay in the session log and come back
+    with "Load older turns". The verbatim window is never evicted.
+    """
+    state = st.session_state
+    usage = session_memory()
+    while sum(usage.values()) > SESSION_MEMORY_CAP_BYTES and len(state.traces) > 1:
+        state.traces = state.traces[len(state.traces) // 2:]
+        usage = session_memory()
+    if sum(usage.values()) > SESSION_MEMORY_CAP_BYTES and state.paper_cache:
+        state.paper_cache = {}
+        usage = session_memory()
+
+    excess = sum(usage.values()) - SESSION_MEMORY_CAP_BYTES
+    evictable = min(get_compactor().covered(state.history), len(state.history) - VERBATIM_RECENT_TURNS)
+    count = 0
+    while excess > 0 and count < evictable:
+        excess -= len(state.history[count]['text']) + ENTRY_OVERHEAD_BYTES
+        count += 1
+    if count:
+        _replace_history(state.history[count:])
+        get_compactor().drop_prefix(count, state.history)
+        state.drill_index = None   # these are rebuilt over the remaining turns on next use
+        state.context_views = None
+        state.transcript_search = None
+        state.transcript_blocks = None
+        state.older_turns = True
+        usage = session_memory()
+    return usage
+
+
+get_memory_report().update(st.session_state.session_id, session_memory())
 
 # =============================================================================
 # PAGE HEADER
@@ -476,75 +4097,231 @@ st.markdown("*A Platform for Theoretical Framework Integration through Artificia
 
 with st.sidebar:
 
-    # --- API connections ---
+    # Audio mode toggle
+    st.session_state.audio_mode = st.toggle(
+                "Audio mode",
+        value=st.session_state.audio_mode,
+        help="Enable voice input (Whisper) and spoken agent responses (ElevenLabs)"
+    )
+    st.session_state.auto_moderate = st.toggle(
+        "Auto-moderate",
+        value=st.session_state.auto_moderate,
+        help="Let Jackie intervene when a specialist repeats earlier claims, runs well past 250 words, or "
+             "overruns the 3-4 sentence discipline on a drill-down. Every turn is checked locally; Jackie is "
+             "only called once a breach is clear."
+    )
+
+    # --- API connections (audio clients only once audio mode is on) ---
     if st.session_state.llm is None:
         try:
-            anthropic_key = os.environ.get("ANTHROPIC_API_KEY") or st.secrets.get("ANTHROPIC_API_KEY", None)
-            st.session_state.llm = ChatAnthropic(
-                model="claude-opus-4-7",
-                api_key=anthropic_key
-            )
+            st.session_state.llm = get_llm()
         except Exception:
             st.error("Anthropic API key not configured.")
 
-    if st.session_state.oai_client is None:
+    if st.session_state.audio_mode and st.session_state.oai_client is None:
         try:
-            oai_key = os.environ.get("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY", None)
-            st.session_state.oai_client = openai.OpenAI(api_key=oai_key)
+            st.session_state.oai_client = get_openai_client()
         except Exception:
             st.warning("OpenAI key not set — voice input disabled.")
 
-    if st.session_state.el_client is None:
+    if st.session_state.audio_mode and st.session_state.el_client is None:
         try:
-            el_key = os.environ.get("ELEVENLABS_API_KEY") or st.secrets.get("ELEVENLABS_API_KEY", None)
-            st.session_state.el_client = ElevenLabs(api_key=el_key)
+            st.session_state.el_client = get_elevenlabs_client()
         except Exception as e:
             st.warning(f"ElevenLabs not connected: {e}")
 
     # Connection status
+    def status(client) -> str:
+        if client:
+            return "✅"
+        return "❌" if st.session_state.audio_mode else "—"
+
     col_a, col_b, col_c = st.columns(3)
     with col_a:
         st.caption("Claude " + ("✅" if st.session_state.llm else "❌"))
     with col_b:
-        st.caption("Whisper " + ("✅" if st.session_state.oai_client else "❌"))
+        st.caption("Whisper " + status(st.session_state.oai_client))
     with col_c:
-        st.caption("11L " + ("✅" if st.session_state.el_client else "❌"))
+        st.caption("11L " + status(st.session_state.el_client))
 
     st.markdown("---")
 
-    # Audio mode toggle
-    st.session_state.audio_mode = st.toggle(
-                "Audio mode",
-        value=st.session_state.audio_mode,
-        help="Enable voice input (Whisper) and spoken agent responses (ElevenLabs)"
-    )
+    if st.session_state.traces:
+        traces = st.session_state.traces
+        stats = stage_stats(traces)
+        playback = next((row for row in stats if row['stage'] == 'playback'), None)
+        if playback:
+            last = next(span for trace in reversed(traces) for span in trace['spans'] if span['name'] == 'playback')
+            st.caption(
+                f"Time to first audio: {last['duration']:.1f}s "
+                f"(median {playback['p50']:.1f}s over {playback['count']} turns)"
+            )
+        with st.expander("Turn latency"):
+            rows = ["| Stage | p50 | p95 | n |", "|---|---|---|---|"]
+            for row in stats:
+                rows.append(f"| {row['stage']} | {row['p50']:.2f}s | {row['p95']:.2f}s | {row['count']} |")
+            st.markdown("\n".join(rows))
+            rate = next((row['tokens_per_second'] for row in stats if row.get('tokens_per_second')), None)
+            if rate:
+                st.caption(f"Generation: median {rate:.0f} tokens/s")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            st.download_button(
+                "Download traces (JSONL)",
+                data=lambda: traces_jsonl(traces),
+                file_name=f"lyceum_traces_{timestamp}.jsonl",
+                mime="application/jsonl",
+            )
+            st.download_button(
+                "Download traces (OpenTelemetry JSON)",
+                data=lambda: traces_otel(traces),
+                file_name=f"lyceum_traces_{timestamp}.otlp.json",
+                mime="application/json",
+            )
+
+    views = get_context_views()
+    if views.usage['turns']:
+        usage, last = views.usage, views.last_usage
+        cached_share = usage['cache_read'] / max(usage['input_tokens'], 1)
+        st.caption(
+            f"Prompt cache: last turn {'hit' if last['cache_read'] else 'miss'} "
+            f"({last['cache_read']:,} of {last['input_tokens']:,} input tokens cached) · "
+            f"session {usage['hits']}/{usage['turns']} hits, {cached_share:.0%} of input from cache"
+        )
+        st.caption(
+            f"Tokens this session: {usage['input_tokens']:,} in · {usage['output_tokens']:,} out · "
+            f"est. ${usage['cost']:.2f}"
+        )
+    if st.session_state.history:
+        st.caption("Context held per agent: " + " · ".join(
+            f"{_speaker_name(target)} ~{views.total_tokens(target) / 1000:.1f}k tokens" for target in views.TARGETS
+        ))
+
+    tts_stats = get_tts_cache().stats()
+    if tts_stats['lookups']:
+        st.caption(
+            f"Speech cache: {tts_stats['hits']}/{tts_stats['lookups']} hits ({tts_stats['hit_rate']:.0%}) · "
+            f"{tts_stats['bytes'] / 1e6:.1f} MB in {tts_stats['files']} clips · "
+            f"{tts_stats['chars_saved']:,} characters not re-synthesised"
+        )
+
+    upstream = {provider: stats for provider, stats in get_gateway().stats().items() if stats['granted']}
+    if upstream:
+        st.caption("Upstream (all sessions): " + " · ".join(
+            f"{provider} {stats['in_flight']}/{stats['limit']} in flight, {stats['queued']} queued "
+            f"(peak {stats['max_queued']}, p95 wait {stats['p95_wait']:.1f}s)"
+            + (f", circuit {stats['circuit']} ({stats['rejected']} calls refused)" if stats['circuit'] != 'closed' else "")
+            for provider, stats in upstream.items()
+        ))
+
+    if routes := get_router().stats():
+        with st.expander("Model routes (all sessions)"):
+            rows = ["| Route | Model | Calls | TTFT p50 / p95 | Total p50 | Est. $ |", "|---|---|---|---|---|---|"]
+            for row in routes:
+                ttft = f"{row['p50_ttft']:.2f}s / {row['p95_ttft']:.2f}s" if row['p50_ttft'] is not None else "—"
+                total = f"{row['p50_latency']:.1f}s" if row['p50_latency'] is not None else "—"
+                notes = ", ".join(
+                    f"{row[key]} {label}"
+                    for key, label in (('fallbacks', 'fallback'), ('retries', 'retried'), ('resumes', 'resumed'),
+                                       ('hedges', 'hedged'), ('errors', 'failed'))
+                    if row[key]
+                )
+                rows.append(
+                    f"| {row['route'].replace('_', ' ')} | `{row['model']}` | {row['calls']}"
+                    f"{f' ({notes})' if notes else ''} | {ttft} | {total} | {row['cost']:.3f} |"
+                )
+            st.markdown("\n".join(rows))
+            st.caption(
+                "Routes with a TTFT budget fall back to a faster model while their median time to first token "
+                f"over the last {ROUTE_TTFT_WINDOW_SECONDS // 60} minutes exceeds it."
+            )
+
+    minutes = {
+        view: found[0]
+        for view in ('specialist', 'orchestrator')
+        if (found := get_compactor().lookup(view, st.session_state.history))
+    }
+    if minutes:
+        st.caption(
+            "Context compaction: minutes cover "
+            + ", ".join(f"{count} earlier turns ({view} view)" for view, count in minutes.items())
+        )
+
+    if flagged := get_breach_detector().flagged:
+        st.caption(
+            f"Breaches flagged: {flagged} specialist turns"
+            + (" · auto-moderation on" if st.session_state.auto_moderate else "")
+        )
+
+    memory = session_memory()
+    with st.expander(f"Session memory: {sum(memory.values()) / 1e6:.1f} of {SESSION_MEMORY_CAP_BYTES / 1e6:.0f} MB"):
+        st.caption(" · ".join(f"{name.replace('_', ' ')} {size / 1e3:,.0f} kB" for name, size in memory.items()))
+        totals = get_memory_report().totals()
+        st.markdown("\n".join([
+            "| Sessions | Held | Largest |", "|---|---|---|",
+            f"| This session | {sum(memory.values()) / 1e6:.2f} MB | — |",
+            f"| All {totals['sessions']} active | {totals['bytes'] / 1e6:.2f} MB | {totals['largest'] / 1e6:.2f} MB |",
+        ]))
+        blobs = get_audio_blobs().stats()
+        st.caption(f"Audio blobs on disk (all sessions): {blobs['bytes'] / 1e6:.1f} MB in {blobs['files']} clips")
 
     st.markdown("---")
 
     # Session management
+    st.caption(f"Session `{st.session_state.session_id}` — bookmark this page to resume it.")
+    with st.expander("Resume a session"):
+        # Only sessions this browser session has held are listed: a session ID
+        # is all it takes to open a transcript, so other chairs' are never shown.
+        recent = [sid for sid in reversed(st.session_state.known_sessions) if sid != st.session_state.session_id]
+        resume_choice = st.selectbox("Earlier sessions in this browser", ["—"] + recent, key="resume_choice")
+        resume_typed = st.text_input("…or paste a session ID", key="resume_typed")
+        if st.button("Resume", key="resume_session"):
+            resume_id = resume_typed.strip() or (resume_choice if resume_choice != "—" else "")
+            if get_session_log().exists(resume_id):
+                get_compactor().reset()
+                resume_session(resume_id)
+                st.rerun()
+            else:
+                st.warning("No logged session with that ID.")
+
     if st.button("Clear transcript"):
-        st.session_state.history = []
+        get_job_runner().discard()
+        _close_debate()
+        get_compactor().reset()
+        _replace_history([])
+        st.session_state.drill_index = None
+        st.session_state.context_views = None
+        st.session_state.transcript_search = None
+        st.session_state.transcript_blocks = None
+        st.session_state.paper_cache = {}
+        st.session_state.older_turns = False
+        get_session_log().append(st.session_state.session_id, {'type': 'clear'})
+        get_session_log().compact_later(st.session_state.session_id)
         st.session_state.drill_queue = []
         st.session_state.dd_pending = None
-        st.session_state.pending_audio = None
+        set_pending_audio(None)
         st.rerun()
 
     st.markdown("---")
 
-    # Transcript download
+    # Transcript download (built only when clicked, with anchor papers in full)
     if st.session_state.history:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"lyceum_transcript_{timestamp}.txt"
-        lines = []
-        for item in st.session_state.history:
-            _, label, _ = SPEAKER_LABELS.get(item['spec'], ('', item['spec'].title(), ''))
-            ts = item.get('timestamp', '')
-            lines.append(f"[{label}] [{ts}]")
-            lines.append(item['text'])
-            lines.append("")
+        history = st.session_state.history
+
+        def transcript_text() -> str:
+            lines = []
+            for item in history:
+                _, label, _ = SPEAKER_LABELS.get(item['spec'], ('', item['spec'].title(), ''))
+                ts = item.get('timestamp', '')
+                lines.append(f"[{label}] [{ts}]")
+                lines.append(entry_text(item))
+                lines.append("")
+            return "\n".join(lines)
+
         st.download_button(
             label="Download transcript",
-            data="\n".join(lines),
+            data=transcript_text,
             file_name=filename,
             mime="text/plain"
         )
@@ -578,29 +4355,14 @@ with st.sidebar:
 
     st.markdown("---")
 
-    # Draft paper
+    # Draft paper (runs as a background job; progress streams into the main area)
     if st.button("Draft output paper", type="primary"):
         if not st.session_state.llm:
             st.warning("Not connected.")
         elif not st.session_state.history:
             st.warning("No transcript to work from.")
-        else:
-            transcript_lines = []
-            for item in st.session_state.history:
-                _, label, _ = SPEAKER_LABELS.get(item['spec'], ('', item['spec'].title(), ''))
-                ts = item.get('timestamp', '')
-                transcript_lines.append(f"[{label}] [{ts}]\n{item['text']}")
-            transcript_text = "\n\n---\n\n".join(transcript_lines)
-            paper_prompt = (
-                "DRAFT OUTPUT PAPER\n\n"
-                "Below is the full transcript of the forum discussion. "
-                "Please write the academic paper as instructed in your paper-writing mode.\n\n"
-                f"{transcript_text}"
-            )
-            with st.spinner("Jackie is drafting the paper…"):
-                paper_text = call_agent('orchestrator', paper_prompt)
-            post_to_history('orchestrator', paper_text)
-            st.rerun()
+        elif submit_paper_draft() is None:
+            st.warning("No specialist contributions to draft from yet.")
 
 
 # =============================================================================
@@ -617,18 +4379,96 @@ if not st.session_state.llm:
 # This is the critical fix: audio playback must happen early in the render cycle,
 # not buried inside conditional blocks that may not execute after st.rerun()
 
-if st.session_state.pending_audio is not None:
-    _, agent_label, _ = SPEAKER_LABELS.get(
-        st.session_state.pending_audio_agent or 'orchestrator', ('', 'Agent', '')
-    )
+pending_clip = st.session_state.pending_audio and get_audio_blobs().path(st.session_state.pending_audio)
+if pending_clip and os.path.exists(pending_clip):
+    if st.session_state.pending_audio_agent == PANEL:
+        agent_label = "The panel"
+    else:
+        _, agent_label, _ = SPEAKER_LABELS.get(
+            st.session_state.pending_audio_agent or 'orchestrator', ('', 'Agent', '')
+        )
     st.markdown(f"### 🔊 {agent_label} is speaking:")
-    st.audio(st.session_state.pending_audio, format="audio/mpeg", autoplay=True)
+    st.audio(
+        pending_clip,
+        format="audio/mpeg",
+        start_time=st.session_state.pending_audio_start,
+        autoplay=True,
+    )
     if st.button("✕ Dismiss audio", key="dismiss_audio_main"):
-        st.session_state.pending_audio = None
-        st.session_state.pending_audio_agent = None
+        set_pending_audio(None)
         st.rerun()
     st.markdown("---")
 
+# =============================================================================
+# JOBS IN PROGRESS
+# =============================================================================
+
+def _debate_active() -> bool:
+    return st.session_state.debate is not None and st.session_state.debate.active
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS if get_job_runner().jobs or _debate_active() else None)
+def render_jobs():
+    """
+    Poll the session's background jobs: commit finished ones to history (and
+    rerun the page to show them), and render the rest as they stream. The
+    oldest query job in audio mode starts speaking on its first sentence.
+    A running debate is stepped here, and its current clip played.
+    """
+    runner = get_job_runner()
+    if runner.commit_ready():
+        st.rerun()
+    for notice in runner.notices:
+        st.error(notice)
+    if runner.notices and st.button("✕ Dismiss errors", key="dismiss_job_notices"):
+        runner.notices = []
+        st.rerun()
+
+    debate = st.session_state.debate
+    if debate is not None and debate.active:
+        debate.step(runner)
+        if not debate.active:
+            st.rerun()
+        if debate.now_playing:
+            key, agent, _, round_index, _ = debate.now_playing
+            st.markdown(f"### 🔊 {_speaker_name(agent)} is speaking (debate round {round_index + 1}):")
+            st.audio(get_audio_blobs().path(key), format="audio/mpeg", autoplay=True)
+    if not runner.jobs:
+        return
+
+    for job in runner.jobs:
+        status = {'queued': "queued", 'running': "responding…"}.get(job.status, "finishing…")
+        if getattr(job, 'speculative', False):
+            status += " (not yet fired)"
+        with st.container(border=True):
+            st.markdown(f"**{job.heading}** · {status} · {job.elapsed():.0f}s")
+            if getattr(job, 'posted_text', None):
+                st.caption(job.posted_text[:300])
+            if job.target == PANEL:
+                slots = st.columns(len(job.order))
+            else:
+                slots = [st.container() for _ in job.order]
+            for key, slot in zip(job.order, slots):
+                part = job.parts.get(key)
+                title = f"**{job.titles[key]}:** " if key in job.titles else ""
+                if part is None:
+                    slot.caption(f"{job.titles.get(key, key.title())}: waiting for the framework sections…")
+                else:
+                    slot.markdown(f"{title}{part.text}{'' if part.done else '▌'}")
+
+    lead = runner.jobs[0]
+    # Debate turns are heard in order from the debate's playlist instead.
+    pipeline = lead.lead_pipeline() if hasattr(lead, 'lead_pipeline') and not hasattr(lead, 'debate') else None
+    if pipeline and (first := pipeline.first_segment()):
+        st.audio(first, format="audio/mpeg", autoplay=True)
+        if lead.playback_started is None:
+            lead.playback_started = time.perf_counter()
+            lead.first_clip_seconds = len(first) * 8 / TTS_BITRATE
+            lead.trace.add('playback', lead.trace.started, lead.playback_started, bytes=len(first))
+
+
+render_jobs()
+
 # =============================================================================
 # AUDIO INPUT PANEL (voice mode)
 # =============================================================================
@@ -640,14 +4480,13 @@ if st.session_state.audio_mode:
     if not st.session_state.oai_client:
         st.warning("OpenAI API key required for voice input (Whisper transcription).")
     else:
-        audio_input = st.audio_input("Press to record your query")
+        audio_input = st.audio_input("Press to record your query", sample_rate=SAMPLE_RATE)
 
         if audio_input is not None:
-            audio_hash = hash(audio_input.getvalue())
+            audio_hash = hashlib.sha256(audio_input.getvalue()).hexdigest()
             if audio_hash != st.session_state.get('last_audio_hash', None) and not st.session_state.transcription:
                 st.session_state.last_audio_hash = audio_hash
-                st.session_state.pending_audio = None
-                st.session_state.pending_audio_agent = None
+                set_pending_audio(None)
                 st.session_state.audio_status = 'transcribing'
                 with st.spinner("Transcribing…"):
                     transcript_text = transcribe_audio(audio_input.getvalue())
@@ -669,38 +4508,17 @@ if st.session_state.audio_mode:
                         break
                 st.session_state.parsed_drill_ref = drill_ref
 
-                if agent_key or st.session_state.last_responding_agent:
-                    st.session_state.auto_fire_ready = True
+                # Start the reply now rather than after a rerun and a click; it is
+                # cancelled below if the chair changes anything before it lands.
+                target = agent_key or st.session_state.last_responding_agent
+                if target and (cleaned_query.strip() or transcript_text.strip()):
+                    speculate(target, cleaned_query.strip() or transcript_text.strip())
 
                 st.rerun()
 
         # Show transcription and parsed intent
         if st.session_state.transcription:
 
-            # --- AUTO-FIRE BLOCK ---
-            if st.session_state.auto_fire_ready:
-                st.session_state.auto_fire_ready = False
-                final_agent = st.session_state.parsed_agent or st.session_state.last_responding_agent
-                query_to_fire = st.session_state.parsed_query.strip() or st.session_state.transcription.strip()
-                if not query_to_fire:
-                    st.error("Auto-fire aborted: query is empty after transcription.")
-                    st.rerun()
-                prior_text = None
-                if st.session_state.dd_pending:
-                    prior_text = st.session_state.dd_pending['text']
-                    st.session_state.dd_pending = None
-                response_text, audio_bytes = fire_query(final_agent, query_to_fire, drill_down_passage=prior_text)
-                st.session_state.transcription = ''
-                st.session_state.parsed_agent = None
-                st.session_state.parsed_drill_ref = None
-                st.session_state.parsed_query = ''
-                st.session_state.audio_input_processed = False
-                if audio_bytes:
-                    st.session_state.pending_audio = audio_bytes
-                    st.session_state.pending_audio_agent = final_agent
-                st.rerun()
-            # --- END AUTO-FIRE BLOCK ---
-
             st.markdown("**Transcription:**")
             edited_transcript = st.text_area(
                 "Transcription (editable):",
@@ -715,6 +4533,7 @@ if st.session_state.audio_mode:
                 'systems':      'Linda',
                 'predictive':   'Andy',
                 'orchestrator': 'Jackie',
+                PANEL:          'the whole panel',
             }
             if st.session_state.parsed_agent:
                 detected_name = agent_names.get(st.session_state.parsed_agent, 'Unknown')
@@ -742,10 +4561,22 @@ if st.session_state.audio_mode:
 
             manual_agent = st.selectbox(
                 "Address to (override):",
-                ["— auto-detected —", "Robert (Genetics)", "Linda (Dynamic Systems)", "Andy (Predictive Cognition)", "Jackie (Orchestrator)"],
+                ["— auto-detected —", "Robert (Genetics)", "Linda (Dynamic Systems)", "Andy (Predictive Cognition)", "Jackie (Orchestrator)", "All specialists (panel round)"],
                 key="manual_agent_select"
             )
 
+            speculative = get_job_runner().find(st.session_state.speculative_job)
+            if speculative is not None:
+                override = RECIPIENT_MAP.get(manual_agent)
+                drill = st.session_state.dd_pending['text'] if st.session_state.dd_pending else None
+                if (edited_transcript != st.session_state.transcription
+                        or (override and override != speculative.target)
+                        or drill != speculative.drill_down_passage):
+                    cancel_speculation()
+                    st.rerun()
+                st.caption("Already answering this — edit the transcription, change the addressee "
+                           "or clear to cancel.")
+
             col_fire, col_clear = st.columns([1, 1])
             with col_fire:
                 fire_btn = st.button("🔊 Fire query", type="primary", key="voice_fire")
@@ -753,10 +4584,15 @@ if st.session_state.audio_mode:
                 clear_btn = st.button("✕ Clear", key="voice_clear")
 
             if clear_btn:
-                st.session_state.transcription = ''
-                st.session_state.parsed_agent = None
-                st.session_state.parsed_drill_ref = None
-                st.session_state.parsed_query = ''
+                cancel_speculation()
+                clear_transcription()
+                st.rerun()
+
+            if fire_btn and speculative is not None:
+                # Adopt the reply already under way instead of starting a second one.
+                speculative.speculative = False
+                clear_transcription()
+                st.session_state.dd_pending = None
                 st.rerun()
 
             if fire_btn:
@@ -778,21 +4614,8 @@ if st.session_state.audio_mode:
                     prior_text = st.session_state.dd_pending['text']
                     st.session_state.dd_pending = None
 
-                st.session_state.audio_status = 'generating'
-                response_text, audio_bytes = fire_query(final_agent, query_to_fire, drill_down_passage=prior_text)
-                st.session_state.audio_status = 'idle'
-
-                # Clear transcription state
-                st.session_state.transcription = ''
-                st.session_state.parsed_agent = None
-                st.session_state.parsed_drill_ref = None
-                st.session_state.parsed_query = ''
-
-                # Store audio for playback
-                if audio_bytes:
-                    st.session_state.pending_audio = audio_bytes
-                    st.session_state.pending_audio_agent = final_agent
-
+                fire_query(final_agent, query_to_fire, drill_down_passage=prior_text)
+                clear_transcription()
                 st.rerun()
 
     st.markdown('</div>', unsafe_allow_html=True)
@@ -825,35 +4648,13 @@ if st.session_state.dd_pending:
             if not dd_instruction.strip():
                 st.warning("Please provide an instruction for the drill-down.")
             else:
-                target_spec = RECIPIENT_MAP[dd_recipient]
-                post_to_history(
-                    'human',
-                    f"[Drill-down to {dd_recipient}] Re: \"{pending['text'][:50]}...\"\n\n{dd_instruction.strip()}"
+                fire_query(
+                    RECIPIENT_MAP[dd_recipient],
+                    dd_instruction.strip(),
+                    drill_down_passage=pending['text'],
+                    posted_text=f"[Drill-down to {dd_recipient}] Re: \"{pending['text'][:50]}...\"\n\n{dd_instruction.strip()}",
                 )
-
-                st.session_state.audio_status = 'generating'
-                _, label, _ = SPEAKER_LABELS[target_spec]
-                with st.spinner(f"{label} is responding…"):
-                    response_text = call_agent(
-                        target_spec,
-                        dd_instruction.strip(),
-                        drill_down_passage=pending['text']
-                    )
-                post_to_history(target_spec, response_text)
-                st.session_state.last_responding_agent = target_spec
-
-                audio_bytes = None
-                if st.session_state.audio_mode and st.session_state.el_client:
-                    with st.spinner(f"Synthesising {label}'s voice…"):
-                        audio_bytes = synthesise_speech(response_text, target_spec)
-
-                st.session_state.audio_status = 'idle'
                 st.session_state.dd_pending = None
-
-                if audio_bytes:
-                    st.session_state.pending_audio = audio_bytes
-                    st.session_state.pending_audio_agent = target_spec
-
                 st.rerun()
 
     with col_cancel:
@@ -863,6 +4664,84 @@ if st.session_state.dd_pending:
 
     st.markdown("---")
 
+# =============================================================================
+# DEBATE PANEL
+# =============================================================================
+
+# Controls act in callbacks: they run before the script, so a job committing
+# (and rerunning the page) during the same run cannot swallow the click.
+
+def _start_debate():
+    question = st.session_state.get("debate_question", "").strip()
+    if not question:
+        st.session_state.debate_warning = "Please enter an opening question first."
+        return
+    st.session_state.debate = Debate(question, int(st.session_state.debate_rounds))
+    st.session_state.debate.step(get_job_runner())
+
+
+def _control_debate(action: str):
+    debate = st.session_state.debate
+    if action == 'pause':
+        debate.pause()
+    elif action == 'resume':
+        debate.resume()
+    elif action == 'stop':
+        debate.stop(get_job_runner())
+    elif action == 'close':
+        _close_debate()
+
+
+def _inject_debate_question():
+    question = st.session_state.get("debate_inject", "").strip()
+    if question and st.session_state.debate is not None:
+        st.session_state.debate.inject(question)
+        st.session_state.debate_inject = ""
+
+
+debate = st.session_state.debate
+with st.expander("Debate mode", expanded=debate is not None):
+    if debate is None or not debate.active:
+        st.caption("The three specialists debate an opening question unattended, each answering the others in turn.")
+        st.text_area("Opening question:", height=80, key="debate_question")
+        st.number_input("Rounds", min_value=1, max_value=DEBATE_MAX_ROUNDS, value=3, key="debate_rounds")
+        st.button("Start debate", type="primary", key="debate_start", on_click=_start_debate)
+        if warning := st.session_state.pop('debate_warning', None):
+            st.warning(warning)
+    else:
+        round_now = min(debate.submitted // len(SPECIALIST_SEQUENCE) + 1, debate.rounds)
+        st.markdown(
+            f"**{debate.question}** · round {round_now} of {debate.rounds} · "
+            f"turn {debate.submitted} of {debate.total_turns} · {debate.status}"
+        )
+        if debate.notice:
+            st.warning(debate.notice)
+        col_pause, col_stop = st.columns(2)
+        with col_pause:
+            if debate.status == 'paused':
+                st.button("▶ Resume", key="debate_resume", on_click=_control_debate, args=('resume',))
+            else:
+                st.button("⏸ Pause", key="debate_pause", disabled=debate.status != 'running',
+                          on_click=_control_debate, args=('pause',))
+        with col_stop:
+            st.button("■ Stop", key="debate_stop", on_click=_control_debate, args=('stop',))
+        st.text_input("Put a question to the debate:", key="debate_inject",
+                      placeholder="The next speaker answers it; the others follow on.")
+        st.button("Ask", key="debate_ask", on_click=_inject_debate_question)
+        if debate.chair_question:
+            st.caption(f"Queued for the next speaker: {debate.chair_question[:200]}")
+
+    if debate is not None and (rows := debate.round_stats()):
+        table = ["| Round | Turns | Wall | Turns/min | Tokens/s | Speech | Silent gaps |", "|---|---|---|---|---|---|---|"]
+        for row in rows:
+            table.append(
+                f"| {row['round']} | {row['turns']} | {row['wall']:.1f}s | {row['turns_per_minute']:.1f} | "
+                f"{row['tokens_per_second']:.0f} | {row['audio']:.0f}s | {row['stall']:.1f}s |"
+            )
+        st.markdown("\n".join(table))
+    if debate is not None and not debate.active:
+        st.button("Close debate", key="debate_close", on_click=_control_debate, args=('close',))
+
 # =============================================================================
 # TEXT INPUT PANEL
 # =============================================================================
@@ -871,23 +4750,39 @@ with st.expander("Text input", expanded=True):
 
     recipient = st.selectbox(
         "Address to:",
-        ["Robert (Genetics)", "Linda (Dynamic Systems)", "Andy (Predictive Cognition)", "Jackie (Orchestrator)"],
+        ["Robert (Genetics)", "Linda (Dynamic Systems)", "Andy (Predictive Cognition)", "Jackie (Orchestrator)", "All specialists (panel round)"],
         key="text_recipient"
     )
 
-    uploaded_pdf = st.file_uploader(
-        "Upload anchor paper (PDF):",
+    uploaded_pdfs = st.file_uploader(
+        "Add papers to the library (PDF):",
         type="pdf",
-        help="Paper text will be appended to your query automatically."
+        accept_multiple_files=True,
+        help="Papers are indexed once and kept. Each query is sent the passages that best match it."
     )
-    pdf_text = ""
-    if uploaded_pdf is not None:
+    library = get_library()
+    for uploaded_pdf in uploaded_pdfs or []:
+        if uploaded_pdf.file_id in st.session_state.library_uploads:
+            continue
+        st.session_state.library_uploads.append(uploaded_pdf.file_id)
         try:
-            reader = PdfReader(io.BytesIO(uploaded_pdf.read()))
-            pdf_text = "\n\n".join(page.extract_text() or "" for page in reader.pages)
-            st.success(f"Paper loaded: {uploaded_pdf.name} ({len(reader.pages)} pages)")
+            paper = load_anchor_paper(uploaded_pdf.getvalue())
+            digest = library.add(paper, title=uploaded_pdf.name.removesuffix(".pdf"))
+            if digest not in st.session_state.library:
+                st.session_state.library.append(digest)
+            st.success(f"Paper added: {uploaded_pdf.name} ({paper['pages']} pages)")
         except Exception as e:
             st.error(f"Could not read PDF: {e}")
+    if library.papers:
+        st.session_state.library = st.multiselect(
+            "Papers in play:",
+            [paper['digest'] for paper in library.papers],
+            default=[digest for digest in st.session_state.library if digest in library.by_digest],
+            format_func=library.title,
+        )
+        stats = library.stats()
+        st.caption(f"Library: {stats['papers']} papers · {stats['chunks']:,} passages · "
+                   f"{stats['bytes'] / 1e6:.1f} MB on disk")
 
     if st.session_state.clear_flag:
         st.session_state.query_box = ""
@@ -902,18 +4797,8 @@ with st.expander("Text input", expanded=True):
 
     if st.button("Submit", type="primary", key="text_submit"):
         if query.strip():
-            full_query = query.strip()
-            if pdf_text:
-                full_query = full_query + "\n\n---\nANCHOR PAPER:\n\n" + pdf_text
-
-            target_spec = RECIPIENT_MAP[recipient]
-            response_text, audio_bytes = fire_query(target_spec, full_query)
+            fire_query(RECIPIENT_MAP[recipient], query.strip())
             st.session_state.clear_flag = True
-
-            if audio_bytes:
-                st.session_state.pending_audio = audio_bytes
-                st.session_state.pending_audio_agent = target_spec
-
             st.rerun()
         else:
             st.warning("Please enter a query first.")
@@ -922,43 +4807,143 @@ with st.expander("Text input", expanded=True):
 # TRANSCRIPT
 # =============================================================================
 
-st.markdown("---")
-st.markdown("### Forum Transcript")
-st.caption("Most recent exchange shown first. Use Ctrl+F to search.")
 
-if st.session_state.history:
-    for idx, item in reversed(list(enumerate(st.session_state.history))):
-        icon, label, _ = SPEAKER_LABELS.get(item['spec'], ('❓', item['spec'].title(), ''))
-        ts = item.get('timestamp', '')
+def _queue_flagged_passage(flag_key: str, label: str):
+    flag_text = st.session_state.get(flag_key, "").strip()
+    if flag_text:
+        st.session_state.drill_queue.append({
+            'speaker': label,
+            'text': flag_text
+        })
+        st.session_state.flag_counter += 1
+        st.session_state.flag_queued_notice = True
 
-        st.markdown(
-            f'<div class="speaker-{item["spec"]}">'
-            f'<strong>{icon} {label}</strong>'
-            f'<span style="color:#888;font-size:0.85em;"> {ts}</span>'
-            f'<br><br>{item["text"]}'
-            f'</div>',
-            unsafe_allow_html=True
-        )
+
+def _turn_transcript_page(page: int):
+    st.session_state.transcript_page = page
+
+
+def _jump_to_entry(idx: int):
+    st.session_state.transcript_page = (len(st.session_state.history) - 1 - idx) // TRANSCRIPT_PAGE_SIZE
+    st.session_state.transcript_focus = idx
+
+
+def _queue_search_hit(idx: int, offset: int):
+    item = st.session_state.history[idx]
+    st.session_state.drill_queue.append({
+        'speaker': _speaker_name(item['spec']),
+        'text': sentence_at(item['text'], offset),
+    })
+    st.session_state.flag_queued_notice = True
+
+
+def render_search(history: list):
+    """Search box over the whole transcript; each hit can be jumped to or queued for drill-down."""
+    col_query, col_speakers = st.columns([3, 2])
+    with col_query:
+        query = st.text_input("Search transcript:", key="transcript_query",
+                              placeholder='Words, or "an exact phrase"')
+    with col_speakers:
+        speakers = st.multiselect("Speakers:", list(SPEAKER_LABELS), key="transcript_speakers",
+                                  format_func=_speaker_name, placeholder="Everyone")
+    if not query.strip():
+        return
+    hits, more = get_transcript_search().search(query, speakers)
+    if not hits:
+        st.caption("No matching turns.")
+        return
+    st.caption(f"{len(hits)} most recent matching turns" if more else
+               f"{len(hits)} matching turn{'s' if len(hits) > 1 else ''}")
+    for hit in hits:
+        item = history[hit['entry']]
+        ts = f"entry {hit['entry'] + 1} · {item.get('timestamp', '')}"
+        st.markdown(render_entry_html(item['spec'], search_snippet(item['text'], hit['spans']), ts),
+                    unsafe_allow_html=True)
+        col_jump, col_queue, _ = st.columns([1, 2, 3])
+        with col_jump:
+            st.button("Go to turn", key=f"search_jump_{hit['entry']}",
+                      on_click=_jump_to_entry, args=(hit['entry'],))
+        if item['spec'] in SPECIALIST_SEQUENCE:
+            with col_queue:
+                st.button("➕ Queue for drill-down", key=f"search_queue_{hit['entry']}",
+                          on_click=_queue_search_hit, args=(hit['entry'], hit['spans'][0][0]))
+
+
+@st.fragment
+def render_transcript():
+    """
+    Render the search box and one page of the transcript, most recent first.
+
+    Only the visible page's entries are sent to the browser, and flagging
+    widgets exist only for them. As a fragment, searching, paging and
+    flagging rerun this function alone rather than the whole script.
+    """
+    history = st.session_state.history
+    if not history:
+        st.info("No exchanges yet. Address your first query above.")
+        return
+
+    if st.session_state.pop('flag_queued_notice', False):
+        st.toast(f"Queued for drill-down ({len(st.session_state.drill_queue)} in queue)", icon="➕")
+
+    with st.expander("🔍 Search transcript"):
+        render_search(history)
+
+    n_pages = (len(history) - 1) // TRANSCRIPT_PAGE_SIZE + 1
+    page = min(st.session_state.transcript_page, n_pages - 1)
+    newest = len(history) - 1 - page * TRANSCRIPT_PAGE_SIZE
+    oldest = max(newest - TRANSCRIPT_PAGE_SIZE + 1, 0)
+
+    if n_pages > 1:
+        col_newer, col_pos, col_older = st.columns([1, 3, 1])
+        with col_newer:
+            st.button("◀ Newer", key="transcript_newer", disabled=page == 0,
+                      on_click=_turn_transcript_page, args=(page - 1,))
+        with col_pos:
+            st.caption(f"Page {page + 1} of {n_pages} · entries {oldest + 1}–{newest + 1} of {len(history)}")
+        with col_older:
+            st.button("Older ▶", key="transcript_older", disabled=page == n_pages - 1,
+                      on_click=_turn_transcript_page, args=(page + 1,))
+
+    flagging = not st.session_state.audio_mode
+    rendered = get_transcript_blocks()
+    blocks = []
+    for idx in range(newest, oldest - 1, -1):
+        item = history[idx]
+        ts = item.get('timestamp', '')
+        if usage := item.get('usage'):
+            ts += f" · {usage['cache_read']:,}/{usage['input_tokens']:,} input tokens cached"
+        if breaches := item.get('breaches'):
+            ts += f" · ⚑ {describe_breaches(breaches)}"
+        if idx == st.session_state.transcript_focus:
+            ts += " · ◆ search result"
+        blocks.append(rendered.html(idx, ts))
 
         # Drill-down flagging (text mode only)
-        if item['spec'] in SPECIALIST_SEQUENCE and not st.session_state.audio_mode:
+        if item['spec'] in SPECIALIST_SEQUENCE and flagging:
+            st.markdown("".join(blocks), unsafe_allow_html=True)
+            blocks = []
+            _, label, _ = SPEAKER_LABELS[item['spec']]
             flag_key = f"flag_{idx}_{st.session_state.flag_counter}"
-            flag_text = st.text_input(
+            st.text_input(
                 "Flag passage for drill-down:",
                 key=flag_key,
                 placeholder="Paste a phrase to queue for follow-up…",
                 label_visibility="collapsed"
             )
-            if st.button("➕ Add to queue", key=f"add_{idx}"):
-                if flag_text.strip():
-                    st.session_state.drill_queue.append({
-                        'speaker': label,
-                        'text': flag_text.strip()
-                    })
-                    st.session_state.flag_counter += 1
-                    st.rerun()
-else:
-    st.info("No exchanges yet. Address your first query above.")
+            st.button("➕ Add to queue", key=f"add_{idx}",
+                      on_click=_queue_flagged_passage, args=(flag_key, label))
+    if blocks:
+        st.markdown("".join(blocks), unsafe_allow_html=True)
+
+    if page == n_pages - 1 and st.session_state.older_turns:
+        st.button("Load older turns", key="load_older", on_click=load_older_turns)
+
+
+st.markdown("---")
+st.markdown("### Forum Transcript")
+st.caption("Most recent exchange shown first; older exchanges are paged. Search covers every loaded turn.")
+render_transcript()
 
 # =============================================================================
 # FOOTER